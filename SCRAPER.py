@@ -1,12 +1,27 @@
 import asyncio
-import pyppeteer as pyp
-from datetime import datetime
 import json
 import os
 import re
+import sys
 import atexit
+import logging
+from collections import Counter
+from urllib.parse import urlparse
+from profiler import perf
+from browser_session import get_browser_session
+from crawl_journal import CrawlJournal
+from course_catalog import CATALOG_PATH, CourseCatalog
+
+logger = logging.getLogger(__name__)
 
 browser = None
+resource_filter = None
+# 录制/回放(scraper_fixtures)
+active_fixture = None
+
+JOURNAL_PATH = "data/crawl_journal.json"
+
+BLOCKED_RESOURCE_TYPES = ("image", "media", "font", "stylesheet")
 
 async def antiAntiCrawler(page):
     await page.setUserAgent('Mozilla/5.0 (Windows NT 6.1; Win64; x64) '
@@ -16,87 +31,278 @@ async def antiAntiCrawler(page):
         "() =>{ Object.defineProperties(navigator, { webdriver:{ get: () => false } }) }"
     )
 
-async def parse_item(browser, item, assignments, depth=1, course_name=None):
-    icon_img = await item.querySelector("img.item_icon")
-    if not icon_img:
+class ResourceFilter:
+    """
+    拦截页面请求, 丢弃爬取时用不到的图片、媒体、字体和样式表
+
+    只读取 DOM 文本时这些资源没有用处, 拦截后每个页面少下载大部分数据,
+    networkidle2 也能更快满足。block_third_party 为真时, 不属于 first_party
+    域名的请求也会被拦截。
+    """
+
+    def __init__(self, block_types=BLOCKED_RESOURCE_TYPES, block_third_party=False, first_party=None):
+        self.block_types = frozenset(block_types)
+        self.block_third_party = block_third_party
+        self.first_party = tuple(first_party or ())
+        self.blocked = Counter()
+        self.allowed = Counter()
+
+    def is_first_party(self, url):
+        host = urlparse(url).hostname or ""
+        return not self.first_party or any(
+            host == domain or host.endswith("." + domain) for domain in self.first_party
+        )
+
+    def should_block(self, request):
+        if request.resourceType in self.block_types:
+            return True
+        url = request.url
+        return (self.block_third_party and url.startswith("http")
+                and not self.is_first_party(url))
+
+    async def attach(self, page):
+        await page.setRequestInterception(True)
+        page.on("request", lambda request: asyncio.ensure_future(self._handle(request)))
+
+    async def _handle(self, request):
+        try:
+            if self.should_block(request):
+                self.blocked[request.resourceType] += 1
+                await request.abort()
+            else:
+                self.allowed[request.resourceType] += 1
+                await request.continue_()
+        except Exception as e:
+            # 页面已关闭等情况下请求可能已经失效
+            logger.debug("处理请求出错: %s", e)
+
+    def log_stats(self):
+        total = sum(self.blocked.values())
+        details = ", ".join(f"{kind}={count}" for kind, count in self.blocked.most_common())
+        logger.info("资源过滤: 拦截 %s 个请求 (%s), 放行 %s 个", total, details or "无",
+                    sum(self.allowed.values()))
+        perf.count("scraper.blocked_requests", total)
+
+
+def make_resource_filter(config, login_url):
+    """
+    根据 config.json 中的 "scraper" 字段创建资源过滤器, 未启用时返回None
+
+        {"scraper": {"block_resources": true, "block_third_party": false,
+                     "first_party_domains": ["pku.edu.cn"]}}
+
+    first_party_domains 默认取登录地址去掉第一级后的域名。
+    """
+    scraper_config = config.get("scraper", {})
+    if not scraper_config.get("block_resources", False):
+        return None
+    first_party = scraper_config.get("first_party_domains")
+    if not first_party:
+        host = urlparse(login_url).hostname or ""
+        labels = host.split(".")
+        first_party = [".".join(labels[1:]) if len(labels) > 2 else host]
+    return ResourceFilter(
+        block_types=scraper_config.get("blocked_types", BLOCKED_RESOURCE_TYPES),
+        block_third_party=scraper_config.get("block_third_party", False),
+        first_party=first_party,
+    )
+
+
+def home_page_url(login_url):
+    parsed = urlparse(login_url)
+    return f"{parsed.scheme}://{parsed.netloc}{HOME_PATH}"
+
+
+async def open_page(browser, width=1400, height=800):
+    page = await browser.newPage()
+    await antiAntiCrawler(page)
+    await page.setViewport({'width': width, 'height': height})
+    if active_fixture is not None:
+        await active_fixture.attach(page)
+    if resource_filter is not None:
+        await resource_filter.attach(page)
+    return page
+
+
+async def settle(seconds):
+    """等待页面脚本执行完, 回放录制的页面时不需要等待"""
+    if active_fixture is not None and active_fixture.replaying:
         return
-    icon_alt = await (await icon_img.getProperty("alt")).jsonValue()
-    title_elem = await item.querySelector("h3")
-    title_text = (await (await title_elem.getProperty("textContent")).jsonValue()).strip()
-    
+    await asyncio.sleep(seconds)
+
+
+# 一次 evaluate 取出列表页所有条目需要的字段, 避免逐个元素来回调用 CDP
+LISTING_SCRIPT = """
+() => Array.from(document.querySelectorAll("ul.contentList > li"), li => {
+    const icon = li.querySelector("img.item_icon");
+    const title = li.querySelector("h3");
+    const link = li.querySelector("a");
+    const details = li.querySelector("div.details");
+    return {
+        icon: icon ? icon.alt : null,
+        title: title ? title.textContent.trim() : "",
+        href: link ? link.href : null,
+        details: details ? details.innerHTML : null
+    };
+})
+"""
+
+# Blackboard "我的主页"标签页, 已登录时直接显示课程列表
+HOME_PATH = "/webapps/portal/execute/tabs/tabAction?tab_tab_group_id=_1_1"
+COURSE_LIST_SELECTOR = "ul.portletList-img.courseListing.coursefakeclass > li > a"
+COURSE_LIST_SCRIPT = """
+(selector) => Array.from(document.querySelectorAll(selector),
+                         a => ({href: a.href, name: a.textContent.trim()}))
+"""
+
+HOMEWORK_LINK_XPATH = "//a[.//span[contains(@title,'课程作业') or contains(text(),'课程作业')]]"
+LINK_PATTERN = re.compile(r'href="(http[s]?://[^"]+)"')
+# 只取出截止时间的原文, 由 deadline.parse_deadline 解析
+DEADLINE_PATTERN = re.compile(
+    r'(?:提交截止时间|作业截止时间|截止时间)[:：]?\s*(?:北京时间)?\s*'
+    r'(\d{4}[-/.]\d{1,2}[-/.]\d{1,2}(?:[ T]\s*\d{1,2}:\d{2})?'
+    r'|(?:[\d〇零一二三四五六七八九]{4}\s*年\s*)?[\d一二两三四五六七八九十]{1,3}\s*月\s*'
+    r'[\d一二两三四五六七八九十]{1,3}\s*[日号]?(?:\s*\d{1,2}\s*[:：]\s*\d{2})?)'
+)
+
+
+async def extract_listing(page):
+    """
+    取出列表页中的所有条目
+
+    Returns:
+        list: [{"icon", "title", "href", "details"}, ...]
+    """
+    return await page.evaluate(LISTING_SCRIPT)
+
+
+def parse_homework(entry, course_name=None, indent=""):
+    """从列表条目中解析作业的标题、链接和截止时间"""
+    homework = {
+        "title": entry["title"],
+        "due_date": None,
+        "link": None,
+        "course_name": course_name
+    }
+    details = entry.get("details")
+    if details:
+        link_match = LINK_PATTERN.search(details)
+        time_match = DEADLINE_PATTERN.search(details)
+        if link_match:
+            homework["link"] = link_match.group(1)
+            logger.debug("%s链接: %s", indent, homework['link'])
+        if time_match:
+            homework["due_date"] = time_match.group(1).strip()
+            logger.debug("%s截止时间: %s", indent, homework['due_date'])
+    return homework
+
+
+async def parse_listing(browser, page, assignments, depth=1, course_name=None, journal=None):
+    """解析当前列表页, 文件夹在新页面中递归打开, 完成的文件夹记入 journal"""
+    with perf.measure("scraper.extract"):
+        entries = await extract_listing(page)
     indent = "  " * depth
-    
-    if "文件夹" in icon_alt:
-        link_elem = await item.querySelector("a")
-        if link_elem:
-            href = await (await link_elem.getProperty("href")).jsonValue()
-            new_page = await browser.newPage()
-            await antiAntiCrawler(new_page)
-            await new_page.setViewport({'width': 1400, 'height': 800})
-            await new_page.goto(href, waitUntil="networkidle2")
-            await asyncio.sleep(1)
+
+    for entry in entries:
+        icon_alt = entry.get("icon")
+        if not icon_alt:
+            continue
+
+        if "文件夹" in icon_alt:
+            href = entry.get("href")
+            if not href:
+                continue
+            done = journal.folder(href) if journal is not None else None
+            if done is not None:
+                logger.info("%s%s (上次已完成)", indent, entry["title"])
+                assignments.extend(done)
+                continue
+            folder_assignments = []
+            new_page = await open_page(browser)
             try:
-                await new_page.waitForSelector("ul.contentList > li", timeout=5000)
-                sub_items = await new_page.querySelectorAll("ul.contentList > li")
-                for sub_item in sub_items:
-                    await parse_item(browser, sub_item, assignments, depth + 1, course_name=course_name)
-            except asyncio.TimeoutError:
-                print(f"{indent}该文件夹页面没有内容或加载超时")
-            await new_page.close()
-    
-    elif "项目" in icon_alt or "文件" in icon_alt or "作业" in icon_alt:
-        print(f"{indent}{title_text}")
-        homework = {
-            "title": title_text,
-            "due_date": None,
-            "link": None,
-            "course_name": course_name
-        }
-        details = await item.querySelector("div.details")
-        if details:
-            inner_html = await (await details.getProperty("innerHTML")).jsonValue()
-            link_match = re.search(r'href="(http[s]?://[^"]+)"', inner_html)
-            time_match = re.search(
-            r'(?:提交截止时间|作业截止时间|截止时间)[:：]?\s*(?:北京时间)?\s*([\d]{4}年\d{1,2}月\d{1,2}日\d{1,2}:\d{2}|[一二三四五六七八九十0-9]{1,2}月\d{1,2}日\d{1,2}:\d{2})',
-            inner_html)
-            if link_match:
-                homework["link"] = link_match.group(1)
-                print(f"{indent}链接: {homework['link']}")
-            if time_match:
-                raw_time = time_match.group(1).strip()
-                if "年" not in raw_time:
-                    current_year = datetime.now().year
-                    raw_time = f"{current_year}年{raw_time}"
-                homework["due_date"] = raw_time
-                print(f"{indent}截止时间: {homework['due_date']}")
-   
-        assignments.append(homework)
+                with perf.measure("scraper.page_load"):
+                    await new_page.goto(href, waitUntil="networkidle2")
+                await settle(1)
+                try:
+                    await new_page.waitForSelector("ul.contentList > li", timeout=5000)
+                    await parse_listing(browser, new_page, folder_assignments, depth + 1,
+                                        course_name=course_name, journal=journal)
+                except asyncio.TimeoutError:
+                    logger.info("%s该文件夹页面没有内容或加载超时", indent)
+            finally:
+                await new_page.close()
+            assignments.extend(folder_assignments)
+            if journal is not None:
+                journal.mark_folder(href, folder_assignments)
+
+        elif "项目" in icon_alt or "文件" in icon_alt or "作业" in icon_alt:
+            logger.info("%s%s", indent, entry["title"])
+            assignments.append(parse_homework(entry, course_name, indent))
     
     
-async def WebScraper(loginUrl):
+async def WebScraper(loginUrl, on_course=None, fixture=None):
+    """
+    登录教学网并爬取本学期所有课程的作业
+
+    每完成一门课程就调用 on_course(课程名, 作业列表), 并写入断点记录;
+    中途失败后再次调用会跳过已完成的课程, 返回值包含这些课程的作业。
+    fixture 为 scraper_fixtures 中的 FixtureRecorder/FixtureReplayer 时录制或回放页面,
+    此时不使用断点记录, 回放时也不需要学号和密码。
+    """
     config_path = "config.json"
     if not os.path.exists(config_path):
-        print("未找到配置文件，请先设置学号、密码和Chrome地址")
+        logger.warning("未找到配置文件，请先设置学号、密码和Chrome地址")
         return []
     with open(config_path, "r", encoding="utf-8") as f:
         config = json.load(f)
     student_id = config.get("student_id")
     password = config.get("password")
     chrome_path = config.get("chrome_path")
-    if not student_id or not password or not chrome_path:
-        print("配置文件不完整，请检查学号、密码和Chrome地址")
+    replaying = fixture is not None and fixture.replaying
+    if not chrome_path or not replaying and (not student_id or not password):
+        logger.warning("配置文件不完整，请检查学号、密码和Chrome地址")
         return []
     
-    global browser
+    global browser, resource_filter, active_fixture
+    resource_filter = None if replaying else make_resource_filter(config, loginUrl)
+    active_fixture = fixture
+    scraper_config = config.get("scraper", {})
     width, height = 1400, 800
-    browser = await pyp.launch(headless=True,
-                               executablePath=chrome_path,
-                               userDataDir="c:/tmp",
-                               args=[f'--window-size={width},{height}'])
-    page = await browser.newPage()
-    await antiAntiCrawler(page)
-    await page.setViewport({'width': width, 'height': height})
-    await page.goto(loginUrl, waitUntil="networkidle2")
+    session = await get_browser_session(chrome_path, scraper_config, (width, height))
+    browser = await session.acquire()
+    try:
+        journal = CrawlJournal(None if fixture is not None else JOURNAL_PATH,
+                               f"{student_id}|{loginUrl}")
+        return await scrape_courses(session, journal, loginUrl, student_id, password,
+                                    scraper_config, width, height, on_course)
+    finally:
+        if fixture is not None:
+            await fixture.finish()
+            active_fixture = None
+        await session.release(browser)
+        if resource_filter is not None:
+            resource_filter.log_stats()
+
+
+async def login(session, page, loginUrl, student_id, password, home_url):
+    """
+    复用浏览器或恢复 cookie 后先打开课程主页检查登录状态, 失效时才输入学号密码登录
+    """
+    if session.has_session():
+        if not session.reused:
+            await session.restore_cookies(page)
+        with perf.measure("scraper.page_load"):
+            await page.goto(home_url, waitUntil="networkidle2")
+        try:
+            await page.waitForSelector(COURSE_LIST_SELECTOR, timeout=5000)
+            logger.info("登录状态有效, 跳过登录")
+            return
+        except asyncio.TimeoutError:
+            logger.info("登录状态已失效, 重新登录")
+            session.forget_cookies()
+
+    with perf.measure("scraper.page_load"):
+        await page.goto(loginUrl, waitUntil="networkidle2")
     await asyncio.sleep(2)
 
     await (await page.querySelector("#user_name")).type(student_id)
@@ -106,79 +312,169 @@ async def WebScraper(loginUrl):
         (await page.querySelector("#logon_button")).click()
     )
 
-    await page.waitForSelector("ul.portletList-img.courseListing.coursefakeclass > li > a", timeout=30000)
-    course_links = await page.querySelectorAll("ul.portletList-img.courseListing.coursefakeclass > li > a")
-    
+    await page.waitForSelector(COURSE_LIST_SELECTOR, timeout=30000)
+    await session.save_cookies(page)
+
+
+async def find_homework_url(course_page, href):
+    """打开课程主页查找"课程作业"页面的地址, 课程没有作业页面时返回空字符串"""
+    with perf.measure("scraper.page_load"):
+        await course_page.goto(href, waitUntil="networkidle2")
+    await settle(1)
+    try:
+        agree_button = await course_page.waitForSelector('#agree_button', timeout=3000)
+        if agree_button:
+            await agree_button.click()
+            await settle(1)
+            logger.info("点击了同意按钮")
+    except asyncio.TimeoutError:
+        pass
+
+    try:
+        homework_link_elem = await course_page.waitForXPath(HOMEWORK_LINK_XPATH, timeout=5000)
+    except asyncio.TimeoutError:
+        return ""
+    if not homework_link_elem:
+        return ""
+    return await course_page.evaluate("(a) => a.href", homework_link_elem) or ""
+
+
+async def open_homework_page(course_page, url):
+    """打开作业页面, 页面上有作业列表时返回True"""
+    with perf.measure("scraper.page_load"):
+        await course_page.goto(url, waitUntil="networkidle2")
+    try:
+        await course_page.waitForSelector("ul.contentList", timeout=5000)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+
+async def crawl_course(browser, course, journal, width, height):
+    """
+    解析课程的"课程作业"页面, 目录中还没有作业页面地址时先从课程主页查找,
+    找到的地址写回 course["homework_url"]; 缓存的地址打开后没有作业列表时重新查找
+    """
     assignments = []
+    course_page = await open_page(browser, width, height)
+    try:
+        cached = course.get("homework_url") is not None
+        if not cached:
+            course["homework_url"] = await find_homework_url(course_page, course["href"])
+        if not course["homework_url"]:
+            logger.info("课程 %s 没有作业页面", course["name"])
+            return assignments
+        logger.info("课程: %s", course["name"])
+        if not await open_homework_page(course_page, course["homework_url"]) and cached:
+            logger.info("缓存的作业页面没有作业列表, 重新查找")
+            course["homework_url"] = await find_homework_url(course_page, course["href"])
+            if not course["homework_url"]:
+                logger.info("课程 %s 没有作业页面", course["name"])
+                return assignments
+            await open_homework_page(course_page, course["homework_url"])
+
+        await parse_listing(browser, course_page, assignments, course_name=course["name"], journal=journal)
+    finally:
+        await course_page.close()
+    return assignments
+
 
-    for i, course_link_elem in enumerate(course_links):
-        course_page = None
+async def crawl_course_with_retry(browser, course, journal, width, height, scraper_config):
+    """
+    每门课程(包括所有重试)限时 course_timeout_s 秒, 失败后等待 retry_backoff_s * 2^n 秒重试,
+    重试 max_retries 次或超过时限后仍失败时返回None
+    """
+    timeout = scraper_config.get("course_timeout_s", 180)
+    retries = scraper_config.get("max_retries", 2)
+    backoff = scraper_config.get("retry_backoff_s", 2)
+    loop = asyncio.get_event_loop()
+    deadline = loop.time() + timeout
+    for attempt in range(retries + 1):
         try:
-            href = await (await course_link_elem.getProperty('href')).jsonValue()
-            full_course_name = await (await course_link_elem.getProperty('textContent')).jsonValue()
-            full_course_name = full_course_name.strip()
-            if not re.search(r"24-25学年第\s*2\s*学期", full_course_name):
-                continue
-            
-            parts = full_course_name.split(":")
-            if len(parts) >= 2:
-                course_name_raw = parts[1]
-            else:
-                course_name_raw = full_course_name
-            course_name = re.sub(r"\(.*\)", "", course_name_raw).strip()
-            
-            course_page = await browser.newPage()
-            await antiAntiCrawler(course_page)
-            await course_page.setViewport({'width': width, 'height': height})
-            await course_page.goto(href, waitUntil="networkidle2")
-            await asyncio.sleep(1)
-            try:
-                agree_button = await course_page.waitForSelector('#agree_button', timeout=3000)
-                if agree_button:
-                    await agree_button.click()
-                    await asyncio.sleep(1)
-                    print("点击了同意按钮")
-            except asyncio.TimeoutError:
-                pass
+            return await asyncio.wait_for(
+                crawl_course(browser, course, journal, width, height), max(deadline - loop.time(), 0))
+        except Exception as e:
+            reason = "超时" if isinstance(e, asyncio.TimeoutError) else e
+            delay = backoff * 2 ** attempt
+            if attempt == retries or loop.time() + delay >= deadline:
+                logger.error("课程 %s 爬取失败: %s", course["name"], reason)
+                return None
+            logger.warning("课程 %s 第 %s 次爬取失败: %s, %s 秒后重试", course["name"], attempt + 1, reason, delay)
+            await asyncio.sleep(delay)
 
-            try:
-                homework_link_elem = await course_page.waitForXPath(
-                    "//a[.//span[contains(@title,'课程作业') or contains(text(),'课程作业')]]", timeout=5000)
-                if homework_link_elem:
-                    print(f"课程: {course_name}")
-                    await asyncio.gather(
-                        course_page.waitForNavigation(waitUntil="networkidle2"),
-                        homework_link_elem.click()
-                    )
-                else:
-                    await course_page.close()
-                    continue
-            except asyncio.TimeoutError:
-                await course_page.close()
-                continue
 
-            items = await course_page.querySelectorAll("ul.contentList > li")
-            for item in items:
-                await parse_item(browser, item, assignments, course_name=course_name)
+async def scrape_courses(session, journal, loginUrl, student_id, password, scraper_config,
+                         width, height, on_course=None):
+    page = await open_page(browser, width, height)
+    home_url = scraper_config.get("home_url") or home_page_url(loginUrl)
+    if active_fixture is not None and active_fixture.replaying:
+        await page.goto(active_fixture.bundle.home_url, waitUntil="networkidle2")
+        await page.waitForSelector(COURSE_LIST_SELECTOR, timeout=5000)
+    else:
+        await login(session, page, loginUrl, student_id, password, home_url)
+        if active_fixture is not None:
+            active_fixture.bundle.home_url = page.url
 
-            await course_page.close()
+    # 录制/回放时不使用缓存的目录, 每次都从课程主页查找作业页面
+    catalog = CourseCatalog(None if active_fixture is not None else CATALOG_PATH,
+                            scraper_config.get("catalog_max_age_days", 7))
+    if catalog.needs_refresh():
+        catalog.refresh(await page.evaluate(COURSE_LIST_SCRIPT, COURSE_LIST_SELECTOR))
+    await page.close()
+    courses = catalog.select(scraper_config.get("terms"), scraper_config.get("courses"))
+    logger.info("选中了 %s 门课程", len(courses))
+    if journal.resumed:
+        logger.info("从上次中断的位置继续导入, 已完成 %s 门课程", len(journal.courses))
 
-        except Exception as e:
-            print(f"处理第 {i + 1} 门课程时出错: {e}")
-            if course_page:
-                try:
-                    await course_page.close()
-                except Exception:
-                    pass
+    assignments = []
+    failed = 0
+
+    for course in courses:
+        href = course["href"]
+        done = journal.course(href)
+        if done is not None:
+            logger.info("课程: %s (上次已完成)", course["name"])
+            assignments.extend(done)
+            continue
+
+        homework_url = course.get("homework_url")
+        course_assignments = await crawl_course_with_retry(
+            browser, course, journal, width, height, scraper_config)
+        if course.get("homework_url") != homework_url:
+            catalog.save()
+        if course_assignments is None:
+            failed += 1
             continue
+        if on_course is not None:
+            on_course(course["name"], course_assignments)
+        journal.mark_course(href, course["name"], course_assignments)
+        assignments.extend(course_assignments)
 
-    await browser.close()
+    if failed:
+        logger.warning("%s 门课程爬取失败, 下次导入时会从这些课程继续", failed)
+    else:
+        journal.finish()
     return assignments
 
 
 def main():
+    from log_setup import setup_logging
+    setup_logging()
     url = "https://course.pku.edu.cn/webapps/bb-sso-BBLEARN/login.html"
-    asyncio.run(WebScraper(url))
+    fixture = None
+    if len(sys.argv) == 3 and sys.argv[1] in ("--record", "--replay"):
+        from scraper_fixtures import FixtureRecorder, FixtureReplayer
+        fixture = FixtureRecorder(sys.argv[2]) if sys.argv[1] == "--record" else FixtureReplayer(sys.argv[2])
+        perf.enabled = True
+    elif len(sys.argv) != 1:
+        print("用法: python SCRAPER.py [--record|--replay 录制文件]")
+        sys.exit(1)
+    assignments = asyncio.run(WebScraper(url, fixture=fixture))
+    print(f"共 {len(assignments)} 个作业")
+    for name, entry in sorted(perf.stats().items()):
+        if entry["total"] is not None:
+            print(f"{name}: {entry['count']} 次, p50 {entry['p50']:.1f} ms, "
+                  f"p95 {entry['p95']:.1f} ms, 合计 {entry['total']:.1f} ms")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import os
+
+CONFIG_PATH = "config.json"
+
+logger = logging.getLogger(__name__)
+
+
+def load_config(config_path=CONFIG_PATH):
+    """读取 config.json, 文件不存在或损坏时返回空字典"""
+    if not os.path.exists(config_path):
+        return {}
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.error("读取配置文件出错: %s", e)
+        return {}
+
+
+def save_config(updates, config_path=CONFIG_PATH):
+    """把 updates 合并进 config.json, 保留其他字段"""
+    config = load_config(config_path)
+    config.update(updates)
+    with open(config_path, "w", encoding="utf-8") as f:
+        json.dump(config, f, ensure_ascii=False, indent=4)
+    return config
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+已完成任务的归档文件
+
+文件按月分区, 每个分区是一段独立的任务快照(见 snapshot.py):
+    MAGIC(8字节) | 版本(H) | 索引偏移(Q) | 索引长度(Q) | 分区数据... | 索引(JSON)
+索引记录每个分区的偏移、长度、任务数、任务ID以及按天的统计, 打开文件时只读取索引,
+分区数据通过 mmap 访问, 只有在查询落到该月份时才解码; 按ID查找时只解码任务所在的月份。
+"""
+
+import json
+import logging
+import mmap
+import os
+import struct
+from collections import OrderedDict
+from datetime import date
+
+import snapshot
+from timeline import task_day
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"SCHARCH\x00"
+VERSION = 2
+_HEADER = struct.Struct("<8sHQQ")
+
+
+def partition_key(day):
+    """日期序数 -> 月份分区键, 如 202504"""
+    d = date.fromordinal(day)
+    return d.year * 100 + d.month
+
+
+def _partition_range(key):
+    year, month = divmod(key, 100)
+    first = date(year, month, 1).toordinal()
+    if month == 12:
+        last = date(year + 1, 1, 1).toordinal() - 1
+    else:
+        last = date(year, month + 1, 1).toordinal() - 1
+    return first, last
+
+
+class TaskArchive:
+
+    def __init__(self, path, cache_size=6, priority_rank=None):
+        self.path = path
+        self.cache_size = cache_size
+        self.priority_rank = priority_rank or {}
+        self._file = None
+        self._map = None
+        self._index = {}
+        # 任务ID -> 分区键
+        self._ids = None
+        self._cache = OrderedDict()
+        self._open()
+
+    def __len__(self):
+        return sum(entry["count"] for entry in self._index.values())
+
+    def _open(self):
+        self.close()
+        self._index = {}
+        self._ids = None
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < _HEADER.size:
+            return
+        try:
+            self._file = open(self.path, "rb")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, index_offset, index_length = _HEADER.unpack_from(self._map)
+            if magic != MAGIC or version > VERSION:
+                raise ValueError("不是有效的归档文件")
+            raw = self._map[index_offset:index_offset + index_length]
+            self._index = {int(key): entry for key, entry in json.loads(raw.decode("utf-8")).items()}
+            if all("ids" in entry for entry in self._index.values()):
+                self._ids = {task_id: key for key, entry in self._index.items() for task_id in entry["ids"]}
+        except Exception as e:
+            logger.error("打开归档文件出错: %s", e)
+            self.close()
+            self._index = {}
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._cache.clear()
+
+    def months(self):
+        return sorted(self._index)
+
+    def day_summaries(self):
+        """
+        各天的统计, 供 Schedule 合并进 day_stats
+
+        Yields:
+            (日期序数, [总数, 已完成数, 低/中/高优先级未完成数...])
+        """
+        for entry in self._index.values():
+            for day, counts in entry["days"].items():
+                yield int(day), counts
+
+    def unfinished_ids(self):
+        """归档中未完成任务的ID, 只解码含有未完成任务的月份"""
+        ids = []
+        for key, entry in self._index.items():
+            if any(counts[0] > counts[1] for counts in entry["days"].values()):
+                ids.extend(task["id"] for task in self._partition(key) if not task.get("completed"))
+        return ids
+
+    def _raw_partition(self, key):
+        entry = self._index[key]
+        return self._map[entry["offset"]:entry["offset"] + entry["length"]]
+
+    def _partition(self, key):
+        tasks = self._cache.get(key)
+        if tasks is None:
+            tasks = snapshot.loads(self._raw_partition(key))
+            self._cache[key] = tasks
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(key)
+        return tasks
+
+    def get_range(self, first_day=None, last_day=None):
+        """取截止日期在 [first_day, last_day] 内的归档任务, 只解码相关月份"""
+        result = []
+        for key in sorted(self._index):
+            start, end = _partition_range(key)
+            if (last_day is not None and start > last_day) or (first_day is not None and end < first_day):
+                continue
+            for task in self._partition(key):
+                day = task_day(task)
+                if day is None:
+                    continue
+                if (first_day is None or day >= first_day) and (last_day is None or day <= last_day):
+                    result.append(task)
+        return result
+
+    def _id_index(self):
+        if self._ids is None:
+            # 版本 1 的索引没有任务ID, 解码全部分区建立一次
+            self._ids = {task["id"]: key for key in self._index for task in self._partition(key)}
+        return self._ids
+
+    def __contains__(self, task_id):
+        return task_id in self._id_index()
+
+    def find(self, task_id):
+        """按ID查找归档任务, 只解码任务所在的月份"""
+        key = self._id_index().get(task_id)
+        if key is None:
+            return None
+        for task in self._partition(key):
+            if task["id"] == task_id:
+                return task
+        return None
+
+    def add(self, tasks):
+        """把任务写入归档, 只有涉及的月份会被重新编码"""
+        grouped = {}
+        for task in tasks:
+            day = task_day(task)
+            if day is not None:
+                grouped.setdefault(partition_key(day), []).append(task)
+        if not grouped:
+            return 0
+        partitions = {}
+        for key, new_tasks in grouped.items():
+            existing = self._partition(key) if key in self._index else []
+            ids = {task["id"] for task in new_tasks}
+            partitions[key] = [task for task in existing if task["id"] not in ids] + new_tasks
+        self._write(partitions)
+        return sum(len(new_tasks) for new_tasks in grouped.values())
+
+    def remove(self, task_ids):
+        """从归档中移除任务, 返回被移除的任务"""
+        ids = self._id_index()
+        task_ids = {task_id for task_id in task_ids if task_id in ids}
+        removed = []
+        partitions = {}
+        for key in {ids[task_id] for task_id in task_ids}:
+            tasks = self._partition(key)
+            kept = [task for task in tasks if task["id"] not in task_ids]
+            removed.extend(task for task in tasks if task["id"] in task_ids)
+            partitions[key] = kept
+        if partitions:
+            self._write(partitions)
+        return removed
+
+    def _day_counts(self, tasks):
+        days = {}
+        for task in tasks:
+            day = task_day(task)
+            if day is None:
+                continue
+            counts = days.setdefault(str(day), [0, 0, 0, 0, 0, 0])
+            counts[0] += 1
+            if task.get("completed"):
+                counts[1] += 1
+            else:
+                counts[2 + self.priority_rank.get(task.get("priority"), 0)] += 1
+        return days
+
+    def _write(self, changed):
+        """
+        重写归档文件
+
+        未变化的分区直接从 mmap 复制原始字节, 变化的分区重新编码。
+        先写临时文件再替换, 中途出错不会破坏原文件。
+        """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        index = {}
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, 0, 0))
+            for key in sorted(set(self._index) | set(changed)):
+                if key in changed:
+                    tasks = changed[key]
+                    if not tasks:
+                        continue
+                    data = snapshot.dumps(tasks)
+                    entry = {"count": len(tasks), "days": self._day_counts(tasks),
+                             "ids": [task["id"] for task in tasks]}
+                else:
+                    data = self._raw_partition(key)
+                    entry = dict(self._index[key])
+                    if "ids" not in entry:
+                        entry["ids"] = [task["id"] for task in self._partition(key)]
+                entry["offset"] = f.tell()
+                entry["length"] = len(data)
+                f.write(data)
+                index[str(key)] = entry
+            index_bytes = json.dumps(index, separators=(",", ":")).encode("utf-8")
+            index_offset = f.tell()
+            f.write(index_bytes)
+            f.seek(0)
+            f.write(_HEADER.pack(MAGIC, VERSION, index_offset, len(index_bytes)))
+        self.close()
+        os.replace(tmp_path, self.path)
+        self._open()
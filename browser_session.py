@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+爬虫使用的浏览器会话
+
+Chrome 使用固定的配置目录(各平台的用户缓存目录下), 登录后的 cookie 另外保存到
+配置目录中的 cookies.json, 浏览器重启后恢复, 会话有效时不需要重新登录。
+keep_alive_s 大于 0 时导入结束后只断开连接, 浏览器继续运行, 下次导入直接连接;
+空闲 keep_alive_s 秒后自动关闭。config.json 中可配置:
+
+    {"scraper": {"profile_dir": null, "keep_alive_s": 0}}
+"""
+
+import asyncio
+import atexit
+import json
+import logging
+import os
+import sys
+import threading
+
+import pyppeteer as pyp
+
+from persistence import atomic_write
+
+logger = logging.getLogger(__name__)
+
+APP_DIR_NAME = "schedule-pet"
+
+# Network.setCookies 接受的字段
+COOKIE_FIELDS = ("name", "value", "domain", "path", "expires", "httpOnly", "secure", "sameSite")
+
+
+def default_profile_dir():
+    if sys.platform.startswith("win"):
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~\\AppData\\Local")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, APP_DIR_NAME, "chrome-profile")
+
+
+class BrowserSession:
+
+    def __init__(self, chrome_path, profile_dir=None, keep_alive_s=0, window_size=(1400, 800)):
+        self.chrome_path = chrome_path
+        self.profile_dir = profile_dir or default_profile_dir()
+        self.keep_alive_s = keep_alive_s
+        self.window_size = window_size
+        self.process = None
+        self.ws_endpoint = None
+        # 本次取得的是仍在运行的浏览器
+        self.reused = False
+        self._idle_timer = None
+        self._idle_generation = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cookie_path(self):
+        return os.path.join(self.profile_dir, "cookies.json")
+
+    def has_session(self):
+        """浏览器可能已经登录: 复用了运行中的浏览器或保存过 cookie"""
+        return self.reused or os.path.exists(self.cookie_path)
+
+    def is_running(self):
+        return self.process is not None and self.process.poll() is None
+
+    async def acquire(self):
+        """返回可用的浏览器, 优先连接仍在运行的浏览器"""
+        # 锁只保护状态, 不在持锁时 await, 空闲计时线程不会因此等待
+        with self._lock:
+            self._cancel_idle_timer()
+            ws_endpoint = self.ws_endpoint if self.is_running() else None
+        if ws_endpoint is not None:
+            try:
+                browser = await pyp.connect(browserWSEndpoint=ws_endpoint)
+                self.reused = True
+                logger.info("复用运行中的浏览器")
+                return browser
+            except Exception as e:
+                logger.warning("连接运行中的浏览器失败, 重新启动: %s", e)
+                _terminate(self._detach()[0])
+
+        os.makedirs(self.profile_dir, exist_ok=True)
+        width, height = self.window_size
+        browser = await pyp.launch(headless=True,
+                                   executablePath=self.chrome_path,
+                                   userDataDir=self.profile_dir,
+                                   autoClose=self.keep_alive_s <= 0,
+                                   args=[f'--window-size={width},{height}'])
+        with self._lock:
+            self.process = browser.process
+            self.ws_endpoint = browser.wsEndpoint
+        self.reused = False
+        return browser
+
+    async def release(self, browser):
+        """导入结束: 保持浏览器运行并开始空闲计时, 或直接关闭"""
+        if self.keep_alive_s > 0 and self.is_running():
+            await browser.disconnect()
+            with self._lock:
+                self._cancel_idle_timer()
+                self._idle_timer = threading.Timer(self.keep_alive_s, self.shutdown,
+                                                   (self._idle_generation,))
+                self._idle_timer.daemon = True
+                self._idle_timer.start()
+            return
+        await browser.close()
+        self._detach()
+
+    async def restore_cookies(self, page):
+        """把保存的 cookie 写入新启动的浏览器, 复用的浏览器本身还保留着 cookie"""
+        if not os.path.exists(self.cookie_path):
+            return 0
+        try:
+            with open(self.cookie_path, "r", encoding="utf-8") as f:
+                cookies = json.load(f)
+            if cookies:
+                await page.setCookie(*cookies)
+            return len(cookies)
+        except Exception as e:
+            logger.error("恢复登录状态出错: %s", e)
+            return 0
+
+    async def save_cookies(self, page):
+        try:
+            cookies = []
+            for cookie in await page.cookies():
+                cookie = {key: cookie[key] for key in COOKIE_FIELDS if key in cookie}
+                if cookie.get("expires", 0) < 0:
+                    # 会话 cookie 没有过期时间
+                    del cookie["expires"]
+                cookies.append(cookie)
+            atomic_write(self.cookie_path, json.dumps(cookies, ensure_ascii=False).encode("utf-8"))
+            if os.name == "posix":
+                os.chmod(self.cookie_path, 0o600)
+        except Exception as e:
+            logger.error("保存登录状态出错: %s", e)
+
+    def forget_cookies(self):
+        """会话已失效, 删除保存的 cookie"""
+        if os.path.exists(self.cookie_path):
+            os.remove(self.cookie_path)
+
+    def shutdown(self, idle_generation=None):
+        """关闭保持运行的浏览器, 在没有运行事件循环的线程中调用(空闲超时、程序退出)"""
+        process, ws_endpoint = self._detach(idle_generation)
+        if process is None or process.poll() is not None:
+            return
+        try:
+            asyncio.run(_close_remote(ws_endpoint))
+            process.wait(timeout=5)
+        except Exception as e:
+            logger.debug("关闭浏览器出错: %s", e)
+        _terminate(process)
+        logger.info("已关闭保持运行的浏览器")
+
+    async def aclose(self):
+        """在事件循环中关闭保持运行的浏览器"""
+        process, ws_endpoint = self._detach()
+        if process is None or process.poll() is not None:
+            return
+        try:
+            await _close_remote(ws_endpoint)
+            await asyncio.get_running_loop().run_in_executor(None, process.wait, 5)
+        except Exception as e:
+            logger.debug("关闭浏览器出错: %s", e)
+        _terminate(process)
+        logger.info("已关闭保持运行的浏览器")
+
+    def _detach(self, idle_generation=None):
+        """
+        取走浏览器进程和连接地址, 之后由调用方负责关闭
+
+        空闲计时器触发后、被取消前又开始了新的导入时(idle_generation 已过期), 不取走正在
+        使用的浏览器。
+        """
+        with self._lock:
+            if idle_generation is not None and idle_generation != self._idle_generation:
+                return None, None
+            self._cancel_idle_timer()
+            process, ws_endpoint = self.process, self.ws_endpoint
+            self.process = None
+            self.ws_endpoint = None
+        return process, ws_endpoint
+
+    def _cancel_idle_timer(self):
+        self._idle_generation += 1
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+
+
+async def _close_remote(ws_endpoint):
+    browser = await pyp.connect(browserWSEndpoint=ws_endpoint)
+    await browser.close()
+
+
+def _terminate(process):
+    if process is not None and process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=5)
+        except Exception:
+            process.kill()
+
+
+_session = None
+
+
+async def get_browser_session(chrome_path, config=None, window_size=(1400, 800)):
+    """全局浏览器会话, 配置变化(如更换 Chrome 地址)时关闭旧的浏览器并重新创建"""
+    global _session
+    config = config or {}
+    profile_dir = config.get("profile_dir") or default_profile_dir()
+    keep_alive_s = float(config.get("keep_alive_s", 0))
+    if (_session is None or _session.chrome_path != chrome_path
+            or _session.profile_dir != profile_dir):
+        if _session is not None:
+            await _session.aclose()
+        _session = BrowserSession(chrome_path, profile_dir, keep_alive_s, window_size)
+    _session.keep_alive_s = keep_alive_s
+    return _session
+
+
+@atexit.register
+def _shutdown_session():
+    if _session is not None:
+        _session.shutdown()
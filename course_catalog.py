@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+教学网课程目录
+
+缓存课程的ID、名称、学期、课程主页和"课程作业"页面地址, 导入时直接打开选中课程的
+作业页面, 不再逐个打开课程主页查找。目录超过 max_age_days 天或在设置中要求刷新时,
+下次导入重新读取课程列表; path 为None时只在内存中保存。文件格式:
+
+    {"refreshed_at": "2025-04-16 09:00:00", "stale": false,
+     "courses": [{"id": "_12345_1", "name": "...", "full_name": "...", "term": "24-25学年第2学期",
+                  "href": "<课程主页>", "homework_url": "<作业页面>"}]}
+
+homework_url 为None表示还没有查找过, 为空字符串表示课程没有作业页面。
+"""
+
+import json
+import logging
+import os
+import re
+from datetime import datetime, timedelta
+
+from persistence import atomic_write
+
+logger = logging.getLogger(__name__)
+
+CATALOG_PATH = "data/courses.json"
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+TERM_PATTERN = re.compile(r"(\d{2}-\d{2})\s*学年\s*第\s*(\d)\s*学期")
+COURSE_ID_PATTERN = re.compile(r"[?&]id=(_\d+_\d+)|course_id=(_\d+_\d+)")
+COURSE_SUFFIX_PATTERN = re.compile(r"\(.*\)")
+
+
+def parse_term(full_name):
+    """返回规范化的学期名, 如 "24-25学年第2学期", 没有学期时返回None"""
+    match = TERM_PATTERN.search(full_name)
+    if match is None:
+        return None
+    return f"{match.group(1)}学年第{match.group(2)}学期"
+
+
+def course_entry(link):
+    """把课程列表中的链接 {"href", "name"} 转成目录条目"""
+    href = link["href"]
+    full_name = link["name"]
+    match = COURSE_ID_PATTERN.search(href)
+    parts = full_name.split(":")
+    name_raw = parts[1] if len(parts) >= 2 else full_name
+    return {
+        "id": (match.group(1) or match.group(2)) if match else href,
+        "name": COURSE_SUFFIX_PATTERN.sub("", name_raw).strip(),
+        "full_name": full_name,
+        "term": parse_term(full_name),
+        "href": href,
+        "homework_url": None,
+    }
+
+
+class CourseCatalog:
+
+    def __init__(self, path=CATALOG_PATH, max_age_days=7):
+        self.path = path
+        self.max_age = timedelta(days=max_age_days)
+        self.courses = []
+        self.refreshed_at = None
+        self.stale = False
+        self._load()
+
+    def _load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.courses = data.get("courses", [])
+            if data.get("refreshed_at"):
+                self.refreshed_at = datetime.strptime(data["refreshed_at"], TIME_FORMAT)
+            self.stale = data.get("stale", False)
+        except Exception as e:
+            logger.error("读取课程目录出错: %s", e)
+            self.courses = []
+            self.refreshed_at = None
+
+    def save(self):
+        if self.path is None:
+            return
+        data = {
+            "refreshed_at": self.refreshed_at.strftime(TIME_FORMAT) if self.refreshed_at else None,
+            "stale": self.stale,
+            "courses": self.courses,
+        }
+        try:
+            atomic_write(self.path, json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8"))
+        except Exception as e:
+            logger.error("保存课程目录出错: %s", e)
+
+    def needs_refresh(self):
+        return (self.stale or not self.courses or self.refreshed_at is None
+                or datetime.now() - self.refreshed_at > self.max_age)
+
+    def invalidate(self):
+        """下次导入时重新读取课程列表"""
+        self.stale = True
+        self.save()
+
+    def refresh(self, course_links):
+        """
+        用课程列表页上的链接更新目录, 课程主页没变的课程保留已找到的作业页面;
+        之前没有作业页面的课程重新查找, 作业页面可能是后来才添加的
+        """
+        known = {course["id"]: course for course in self.courses}
+        courses = []
+        for link in course_links:
+            entry = course_entry(link)
+            old = known.get(entry["id"])
+            if old is not None and old["href"] == entry["href"] and old.get("homework_url"):
+                entry["homework_url"] = old["homework_url"]
+            courses.append(entry)
+        self.courses = courses
+        self.refreshed_at = datetime.now()
+        self.stale = False
+        self.save()
+        logger.info("课程目录已更新, 共 %s 门课程", len(courses))
+
+    def terms(self):
+        """目录中的学期, 从新到旧"""
+        return sorted({course["term"] for course in self.courses if course["term"]}, reverse=True)
+
+    def select(self, terms=None, course_ids=None):
+        """
+        选出要导入的课程: terms 中学期的全部课程加上 course_ids 中的课程,
+        都没有指定时取最新学期的课程
+        """
+        if not terms and not course_ids:
+            terms = self.terms()[:1]
+        terms = set(terms or ())
+        course_ids = set(course_ids or ())
+        return [course for course in self.courses
+                if course["term"] in terms or course["id"] in course_ids]
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+网页导入的断点记录
+
+每爬完一个文件夹或一门课程就写入记录文件, 导入中途出错或程序退出后, 下次导入会跳过
+已完成的课程和文件夹, 直接使用记录中的作业。所有课程都完成后删除记录文件;
+记录超过 MAX_AGE 或账号/登录地址不同时重新开始; path 为 None 时只在内存中记录。文件格式:
+
+    {"key": "...", "started": "2025-04-16 09:00:00",
+     "courses": {"<课程链接>": {"name": "...", "assignments": [...]}},
+     "folders": {"<文件夹链接>": [...]}}
+"""
+
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+
+from persistence import atomic_write
+
+logger = logging.getLogger(__name__)
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+MAX_AGE = timedelta(days=1)
+
+
+class CrawlJournal:
+
+    def __init__(self, path, key):
+        self.path = path
+        self.key = key
+        self.started = datetime.now()
+        self.courses = {}
+        self.folders = {}
+        self._load()
+
+    @property
+    def resumed(self):
+        return bool(self.courses or self.folders)
+
+    def _load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            started = datetime.strptime(data["started"], TIME_FORMAT)
+            if data.get("key") != self.key or datetime.now() - started > MAX_AGE:
+                logger.info("导入记录已过期, 重新开始")
+                return
+            self.started = started
+            self.courses = data.get("courses", {})
+            self.folders = data.get("folders", {})
+        except Exception as e:
+            logger.error("读取导入记录出错: %s", e)
+
+    def save(self):
+        if self.path is None:
+            return
+        data = {
+            "key": self.key,
+            "started": self.started.strftime(TIME_FORMAT),
+            "courses": self.courses,
+            "folders": self.folders,
+        }
+        try:
+            atomic_write(self.path, json.dumps(data, ensure_ascii=False).encode("utf-8"))
+        except Exception as e:
+            logger.error("保存导入记录出错: %s", e)
+
+    def course(self, href):
+        """已完成课程的作业, 未完成时返回None"""
+        entry = self.courses.get(href)
+        return entry["assignments"] if entry is not None else None
+
+    def folder(self, href):
+        """已完成文件夹的作业, 未完成时返回None"""
+        return self.folders.get(href)
+
+    def mark_folder(self, href, assignments):
+        self.folders[href] = assignments
+        self.save()
+
+    def mark_course(self, href, name, assignments):
+        self.courses[href] = {"name": name, "assignments": assignments}
+        self.save()
+
+    def finish(self):
+        """全部课程完成, 删除记录"""
+        self.courses = {}
+        self.folders = {}
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+解析教学网作业的截止时间
+
+支持的写法:
+    2025年4月16日23:59    四月16日 23:59    十二月三十一日23：59    2025-04-16 23:59
+年、月、日可以用阿拉伯数字或中文数字; 没有写年份时取离当前时间最近的年份, 所以
+十二月导入的"一月5日"算作下一年, 一月导入的"十二月28日"算作上一年, "2月29日"算作
+最近的闰年。
+"""
+
+import re
+from datetime import date
+
+_DIGITS = {"〇": 0, "零": 0, "一": 1, "二": 2, "两": 2, "三": 3, "四": 4,
+           "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+
+_NUMBER = r"\d{1,2}|[一二两三四五六七八九十]{1,3}"
+_TIME = r"(?:\s*(?P<hour>\d{1,2})\s*[:：]\s*(?P<minute>\d{2}))?"
+
+CHINESE_PATTERN = re.compile(
+    r"(?:(?P<year>\d{4}|[〇零一二三四五六七八九]{4})\s*年\s*)?"
+    rf"(?P<month>{_NUMBER})\s*月\s*(?P<day>{_NUMBER})\s*[日号]?" + _TIME
+)
+ISO_PATTERN = re.compile(
+    r"(?P<year>\d{4})[-/.](?P<month>\d{1,2})[-/.](?P<day>\d{1,2})"
+    r"(?:[ T]\s*(?P<hour>\d{1,2}):(?P<minute>\d{2}))?"
+)
+
+
+def chinese_number(text):
+    """把阿拉伯数字或 99 以内的中文数字(包括逐位书写的年份)转成整数"""
+    if text.isdigit():
+        return int(text)
+    if "十" not in text:
+        value = 0
+        for char in text:
+            value = value * 10 + _DIGITS[char]
+        return value
+    tens, _, ones = text.partition("十")
+    return (_DIGITS[tens] if tens else 1) * 10 + (_DIGITS[ones] if ones else 0)
+
+
+def infer_year(month, day, today):
+    """没有年份时取离 today 最近的、存在这一天的年份(2月29日取最近的闰年)"""
+    candidates = []
+    for year in range(today.year - 4, today.year + 5):
+        try:
+            candidates.append(date(year, month, day))
+        except ValueError:
+            continue
+    if not candidates:
+        # 任何年份都不存在的日期, 交给调用方报错
+        return today.year
+    return min(candidates, key=lambda candidate: abs((candidate - today).days)).year
+
+
+def parse_deadline(text, today=None):
+    """
+    Returns:
+        (due_date, due_time): "YYYY-MM-DD" 和 "HH:MM", 没有写时间时 due_time 为None;
+        无法解析时返回None
+    """
+    if not text:
+        return None
+    match = (CHINESE_PATTERN if "月" in text else ISO_PATTERN).search(text)
+    if match is None:
+        return None
+    # 两个模式的分组顺序相同: 年, 月, 日, 时, 分
+    year, month, day, hour, minute = match.groups()
+    try:
+        month = chinese_number(month)
+        day = chinese_number(day)
+        year = chinese_number(year) if year else infer_year(month, day, today or date.today())
+        due_date = date(year, month, day)
+    except (KeyError, ValueError):
+        return None
+
+    if hour is None:
+        return due_date.isoformat(), None
+    hour, minute = int(hour), int(minute)
+    if hour == 24 and minute == 0:
+        # "24:00" 表示当天结束
+        hour, minute = 23, 59
+    if hour > 23 or minute > 59:
+        return due_date.isoformat(), None
+    return due_date.isoformat(), f"{hour:02d}:{minute:02d}"
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+任务修改的撤销/重做记录
+
+每次修改记录为一个 Mutation, 只保存恢复所需的最少数据:
+    add     data = [(下标, 任务), ...]        撤销时按ID删除, 重做时按下标插回
+    delete  data = [(下标, 任务), ...]        撤销时按下标插回, 重做时按ID删除
+    update  data = [(任务ID, 旧值, 新值), ...] 旧值/新值只包含发生变化的字段
+    batch   data = [Mutation, ...]           撤销时逆序撤销各条记录
+
+History 同时限制记录条数和记录中任务的总数, 超出时丢弃最早的记录,
+因此内存占用与会话时长无关。
+"""
+
+from collections import deque
+from contextlib import contextmanager
+
+
+class Mutation:
+
+    __slots__ = ("kind", "label", "data")
+
+    def __init__(self, kind, label, data):
+        self.kind = kind
+        self.label = label
+        self.data = data
+
+    @property
+    def size(self):
+        if self.kind == "batch":
+            return sum(mutation.size for mutation in self.data)
+        return len(self.data)
+
+
+class History:
+
+    def __init__(self, max_entries=100, max_records=5000):
+        self.max_entries = max_entries
+        self.max_records = max_records
+        self._undo = deque()
+        self._redo = []
+        self._records = 0
+        self._group = None
+
+    def __len__(self):
+        return len(self._undo)
+
+    def can_undo(self):
+        return bool(self._undo)
+
+    def can_redo(self):
+        return bool(self._redo)
+
+    def undo_label(self):
+        return self._undo[-1].label if self._undo else None
+
+    def redo_label(self):
+        return self._redo[-1].label if self._redo else None
+
+    def record(self, mutation):
+        """记录一次新的修改, 清空重做记录"""
+        if self._group is not None:
+            self._group.append(mutation)
+            return
+        for entry in self._redo:
+            self._records -= entry.size
+        self._redo.clear()
+        self._push(mutation)
+
+    @contextmanager
+    def group(self, label):
+        """把代码块中的多次修改合并成一条记录"""
+        if self._group is not None:
+            yield
+            return
+        self._group = []
+        try:
+            yield
+        finally:
+            mutations, self._group = self._group, None
+            if len(mutations) == 1:
+                self.record(mutations[0])
+            elif mutations:
+                self.record(Mutation("batch", label, mutations))
+
+    def _push(self, mutation):
+        self._undo.append(mutation)
+        self._records += mutation.size
+        while len(self._undo) > 1 and (len(self._undo) > self.max_entries
+                                       or self._records > self.max_records):
+            self._records -= self._undo.popleft().size
+
+    def pop_undo(self):
+        """取出最近一条记录并移入重做记录, 没有时返回None"""
+        if not self._undo:
+            return None
+        mutation = self._undo.pop()
+        self._redo.append(mutation)
+        return mutation
+
+    def pop_redo(self):
+        """取出最近撤销的记录并移回撤销记录, 没有时返回None"""
+        if not self._redo:
+            return None
+        mutation = self._redo.pop()
+        self._undo.append(mutation)
+        return mutation
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
+        self._records = 0
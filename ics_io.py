@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+iCalendar (.ics) 导入导出
+
+读取和写入都是逐行进行的: iter_tasks() 每读完一个 VEVENT/VTODO 就产出一个任务,
+write_tasks() 每个任务写完即丢弃, 文件大小不影响内存占用。
+
+字段对应关系:
+    SUMMARY / DESCRIPTION          title / description
+    DTSTART, DTEND / DUE / DURATION due_date, start_time, end_time (时间转换为本地时间;
+                                   跨过午夜的事件 end_time 记为 00:00, 即持续到当天结束)
+    RRULE FREQ=DAILY/WEEKLY/MONTHLY repeat 每天/每周/每月 (INTERVAL 不为 1, 或含有 COUNT、UNTIL、
+                                   BY* 的规则只导入第一次, 不设置 repeat, 后者记录警告)
+    VALARM TRIGGER                 reminder_time (相对开始时间提前的分钟数, RELATED=END 时先换算到
+                                   相对开始时间)
+    CATEGORIES                     category
+    PRIORITY 1-4 / 5 / 6-9         priority 高 / 中 / 低
+    STATUS:COMPLETED, COMPLETED    completed
+    UID                            id
+"""
+
+import logging
+import re
+import uuid
+from datetime import datetime, timedelta, timezone
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:
+    ZoneInfo = None
+
+logger = logging.getLogger(__name__)
+
+PRODID = "-//schedule-pet//CN"
+COMPONENTS = ("VEVENT", "VTODO")
+
+REPEAT_TO_FREQ = {"每天": "DAILY", "每周": "WEEKLY", "每月": "MONTHLY"}
+FREQ_TO_REPEAT = {freq: repeat for repeat, freq in REPEAT_TO_FREQ.items()}
+
+PRIORITY_TO_ICS = {"高": 1, "中": 5, "低": 9}
+
+CATEGORY_ALIASES = {
+    "工作": "工作", "WORK": "工作", "BUSINESS": "工作",
+    "学习": "学习", "STUDY": "学习", "EDUCATION": "学习", "SCHOOL": "学习",
+    "生活": "生活", "PERSONAL": "生活", "LIFE": "生活", "HOLIDAY": "生活",
+    "其他": "其他",
+}
+
+_DURATION = re.compile(r"([+-])?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$")
+_UNESCAPE = re.compile(r"\\([\\;,nN])")
+_zones = {}
+_NO_PARAMS = {}
+
+
+def _unescape(value):
+    if "\\" not in value:
+        return value
+    return _UNESCAPE.sub(lambda m: "\n" if m.group(1) in "nN" else m.group(1), value)
+
+
+def _escape(value):
+    return (value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def parse_duration(value):
+    match = _DURATION.match(value.strip())
+    if not match:
+        raise ValueError(f"无效的时长: {value}")
+    sign, weeks, days, hours, minutes, seconds = match.groups()
+    delta = timedelta(weeks=int(weeks or 0), days=int(days or 0), hours=int(hours or 0),
+                      minutes=int(minutes or 0), seconds=int(seconds or 0))
+    return -delta if sign == "-" else delta
+
+
+def _zone(tzid):
+    if tzid not in _zones:
+        try:
+            _zones[tzid] = ZoneInfo(tzid) if ZoneInfo else None
+        except Exception:
+            _zones[tzid] = None
+    return _zones[tzid]
+
+
+def parse_datetime(value, params):
+    """
+    解析 DATE / DATE-TIME
+
+    Returns:
+        (datetime, 是否只有日期); 带时区的时间转换为本地时间
+    """
+    value = value.strip()
+    # 固定格式, 直接切片比 strptime 快得多; 格式不对时 int()/datetime() 抛出 ValueError
+    if params.get("VALUE") == "DATE" or len(value) == 8:
+        return datetime(int(value[0:4]), int(value[4:6]), int(value[6:8])), True
+    if len(value) < 15 or value[8] != "T":
+        raise ValueError(f"无效的时间: {value}")
+    moment = datetime(int(value[0:4]), int(value[4:6]), int(value[6:8]),
+                      int(value[9:11]), int(value[11:13]), int(value[13:15]))
+    if value.endswith("Z"):
+        return moment.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None), False
+    zone = _zone(params["TZID"]) if "TZID" in params else None
+    if zone is not None:
+        moment = moment.replace(tzinfo=zone).astimezone().replace(tzinfo=None)
+    return moment, False
+
+
+def _unfold(lines):
+    """合并折行(以空格或制表符开头的行是上一行的延续)"""
+    current = None
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current:
+            yield current
+        current = line
+    if current:
+        yield current
+
+
+def _split_property(line):
+    """ 'NAME;P1=V1;P2=V2:value' -> (NAME, {P1: V1, ...}, value) """
+    colon = line.find(":")
+    if colon < 0:
+        return None, {}, ""
+    semicolon = line.find(";", 0, colon)
+    if semicolon < 0:
+        return line[:colon].upper(), _NO_PARAMS, line[colon + 1:]
+    # 参数值可以带引号, 引号中的冒号不是分隔符
+    if '"' in line[:colon]:
+        quoted = False
+        for i, char in enumerate(line):
+            if char == '"':
+                quoted = not quoted
+            elif char == ":" and not quoted:
+                colon = i
+                break
+    if colon < 0:
+        return None, {}, ""
+    head, value = line[:colon], line[colon + 1:]
+    name, *parts = head.split(";")
+    params = {}
+    for part in parts:
+        key, _, param_value = part.partition("=")
+        params[key.upper()] = param_value.strip('"')
+    return name.upper(), params, value
+
+
+def _component_to_task(kind, props, alarms):
+    """把一个 VEVENT/VTODO 的属性转换为任务字典, 无法转换时返回None"""
+    start = props.get("DTSTART") or props.get("DUE")
+    if start is None:
+        return None
+    start_at, all_day = parse_datetime(start[1], start[0])
+
+    end_at = None
+    if "DTEND" in props:
+        end_at, _ = parse_datetime(props["DTEND"][1], props["DTEND"][0])
+    elif kind == "VTODO" and "DTSTART" in props and "DUE" in props:
+        end_at, _ = parse_datetime(props["DUE"][1], props["DUE"][0])
+    elif "DURATION" in props:
+        end_at = start_at + parse_duration(props["DURATION"][1])
+
+    start_time = end_time = None
+    if not all_day:
+        start_time = f"{start_at.hour:02d}:{start_at.minute:02d}"
+        if end_at is not None and end_at > start_at:
+            # 跨过午夜的事件按应用的约定记为结束时间不晚于开始时间, 即持续到当天结束
+            end_time = ("00:00" if end_at.date() > start_at.date()
+                        else f"{end_at.hour:02d}:{end_at.minute:02d}")
+
+    repeat = None
+    if "RRULE" in props:
+        rule = dict(part.partition("=")[::2] for part in props["RRULE"][1].upper().split(";"))
+        limited = [name for name in rule if name in ("COUNT", "UNTIL") or name.startswith("BY")]
+        if limited:
+            # 有次数、截止日期或筛选条件的规则无法用每天/每周/每月表示, 只导入第一次
+            logger.warning("重复规则 %s 含有 %s, 只导入第一次", props["RRULE"][1], ", ".join(limited))
+        elif rule.get("INTERVAL", "1") == "1":
+            repeat = FREQ_TO_REPEAT.get(rule.get("FREQ"))
+
+    # RELATED=END 的提醒相对结束时间; 没有结束时间的事件按 RFC 5545 在开始时结束(全天事件为次日)
+    if end_at is not None:
+        related_end = end_at
+    else:
+        related_end = start_at + timedelta(days=1) if all_day and kind == "VEVENT" else start_at
+    reminder_time = None
+    for params, trigger in alarms:
+        try:
+            if params.get("VALUE") == "DATE-TIME":
+                before = start_at - parse_datetime(trigger, {})[0]
+            elif params.get("RELATED", "START").upper() == "END":
+                before = start_at - (related_end + parse_duration(trigger))
+            else:
+                before = -parse_duration(trigger)
+        except ValueError:
+            continue
+        minutes = int(before.total_seconds() // 60)
+        if minutes > 0 and (reminder_time is None or minutes > reminder_time):
+            reminder_time = minutes
+
+    category = "其他"
+    if "CATEGORIES" in props:
+        for name in _unescape(props["CATEGORIES"][1]).split(","):
+            alias = CATEGORY_ALIASES.get(name.strip().upper()) or CATEGORY_ALIASES.get(name.strip())
+            if alias:
+                category = alias
+                break
+
+    priority = "中"
+    if "PRIORITY" in props:
+        try:
+            level = int(props["PRIORITY"][1])
+        except ValueError:
+            level = 0
+        if 1 <= level <= 4:
+            priority = "高"
+        elif level >= 6:
+            priority = "低"
+
+    status = props.get("STATUS", ({}, ""))[1].upper()
+    completed = (status == "COMPLETED" or "COMPLETED" in props
+                 or props.get("X-SCHEDULE-COMPLETED", ({}, ""))[1].upper() == "TRUE")
+
+    created_at = None
+    for name in ("CREATED", "DTSTAMP"):
+        if name in props:
+            try:
+                created_at = parse_datetime(props[name][1], props[name][0])[0]
+                break
+            except ValueError:
+                pass
+    created_at = created_at or datetime.now()
+
+    return {
+        "id": props["UID"][1] if "UID" in props else str(uuid.uuid4()),
+        "title": _unescape(props.get("SUMMARY", ({}, ""))[1]) or "(无标题)",
+        "description": _unescape(props.get("DESCRIPTION", ({}, ""))[1]),
+        "category": category,
+        "priority": priority,
+        "due_date": f"{start_at.year:04d}-{start_at.month:02d}-{start_at.day:02d}",
+        "start_time": start_time,
+        "end_time": end_time,
+        "repeat": repeat,
+        "reminder_time": reminder_time,
+        "completed": completed,
+        "created_at": str(created_at.replace(microsecond=0)),
+    }
+
+
+def iter_tasks(lines):
+    """
+    逐个读取日历中的任务
+
+    Args:
+        lines: 可迭代的文本行, 例如以文本模式打开的文件
+
+    Yields:
+        dict: 任务; 无法解析的组件会记录日志并跳过
+    """
+    kind = None
+    props = {}
+    alarms = []
+    depth = 0
+    for line in _unfold(lines):
+        name, params, value = _split_property(line)
+        if name == "BEGIN":
+            value = value.upper()
+            if kind is None and value in COMPONENTS:
+                kind, props, alarms, depth = value, {}, [], 0
+            elif kind is not None:
+                depth += 1
+            continue
+        if name == "END":
+            if kind is None:
+                continue
+            if depth:
+                depth -= 1
+                continue
+            try:
+                task = _component_to_task(kind, props, alarms)
+            except ValueError as e:
+                logger.warning("跳过无法解析的日历项 %s: %s", props.get("UID", ({}, "?"))[1], e)
+                task = None
+            kind = None
+            if task is not None:
+                yield task
+            continue
+        if kind is None or name is None:
+            continue
+        if depth:
+            # 嵌套组件中只关心 VALARM 的 TRIGGER
+            if name == "TRIGGER":
+                alarms.append((params, value))
+            continue
+        props.setdefault(name, (params, value))
+
+
+def read_file(filename):
+    """逐个读取 .ics 文件中的任务"""
+    with open(filename, "r", encoding="utf-8-sig", newline="") as f:
+        yield from iter_tasks(f)
+
+
+def _fold(line):
+    """按 75 字节折行"""
+    data = line.encode("utf-8")
+    if len(data) <= 75:
+        return line + "\r\n"
+    parts = []
+    limit = 75
+    while data:
+        cut = min(limit, len(data))
+        # 不在 UTF-8 多字节字符中间断开
+        while cut < len(data) and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(data[:cut].decode("utf-8"))
+        data = data[cut:]
+        limit = 74
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _task_lines(task, stamp):
+    date_part = task["due_date"].replace("-", "")
+    yield "BEGIN:VEVENT"
+    yield f"UID:{task['id']}"
+    yield f"DTSTAMP:{stamp}"
+    if task.get("start_time"):
+        yield f"DTSTART:{date_part}T{task['start_time'].replace(':', '')}00"
+        if task.get("end_time"):
+            if task["end_time"] == "24:00" or task["end_time"] <= task["start_time"]:
+                next_day = datetime.strptime(task["due_date"], "%Y-%m-%d") + timedelta(days=1)
+                yield f"DTEND:{next_day.strftime('%Y%m%d')}T000000"
+            else:
+                yield f"DTEND:{date_part}T{task['end_time'].replace(':', '')}00"
+    else:
+        yield f"DTSTART;VALUE=DATE:{date_part}"
+    yield f"SUMMARY:{_escape(task.get('title') or '')}"
+    if task.get("description"):
+        yield f"DESCRIPTION:{_escape(task['description'])}"
+    if task.get("category"):
+        yield f"CATEGORIES:{_escape(task['category'])}"
+    if task.get("priority") in PRIORITY_TO_ICS:
+        yield f"PRIORITY:{PRIORITY_TO_ICS[task['priority']]}"
+    if task.get("repeat") in REPEAT_TO_FREQ:
+        yield f"RRULE:FREQ={REPEAT_TO_FREQ[task['repeat']]}"
+    if task.get("completed"):
+        yield "X-SCHEDULE-COMPLETED:TRUE"
+    if task.get("created_at"):
+        try:
+            created = datetime.strptime(task["created_at"], "%Y-%m-%d %H:%M:%S")
+            yield f"CREATED:{created.strftime('%Y%m%dT%H%M%S')}"
+        except ValueError:
+            pass
+    if task.get("reminder_time"):
+        yield "BEGIN:VALARM"
+        yield "ACTION:DISPLAY"
+        yield f"DESCRIPTION:{_escape(task.get('title') or '')}"
+        yield f"TRIGGER:-PT{int(task['reminder_time'])}M"
+        yield "END:VALARM"
+    yield "END:VEVENT"
+
+
+def write_tasks(tasks, f):
+    """
+    把任务逐个写入日历文件
+
+    Args:
+        tasks: 可迭代的任务
+        f: 以文本模式打开的文件(newline="")
+
+    Returns:
+        int: 写入的任务数
+    """
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    f.write(f"BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:{PRODID}\r\nCALSCALE:GREGORIAN\r\n")
+    count = 0
+    for task in tasks:
+        if not task.get("due_date"):
+            continue
+        f.write("".join(_fold(line) for line in _task_lines(task, stamp)))
+        count += 1
+    f.write("END:VCALENDAR\r\n")
+    return count
+
+
+def write_file(tasks, filename):
+    with open(filename, "w", encoding="utf-8", newline="") as f:
+        return write_tasks(tasks, f)
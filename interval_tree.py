@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import random
+
+
+class _Node:
+
+    __slots__ = ("start", "end", "key", "value", "priority", "max_end", "left", "right")
+
+    def __init__(self, start, end, key, value):
+        self.start = start
+        self.end = end
+        self.key = key
+        self.value = value
+        self.priority = random.random()
+        self.max_end = end
+        self.left = None
+        self.right = None
+
+
+def _update(node):
+    max_end = node.end
+    if node.left is not None and node.left.max_end > max_end:
+        max_end = node.left.max_end
+    if node.right is not None and node.right.max_end > max_end:
+        max_end = node.right.max_end
+    node.max_end = max_end
+
+
+def _split(node, start, key):
+    """按 (start, key) 把树拆成 < 和 >= 两部分"""
+    if node is None:
+        return None, None
+    if (node.start, node.key) < (start, key):
+        left, right = _split(node.right, start, key)
+        node.right = left
+        _update(node)
+        return node, right
+    left, right = _split(node.left, start, key)
+    node.left = right
+    _update(node)
+    return left, node
+
+
+def _merge(left, right):
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        _update(left)
+        return left
+    right.left = _merge(left, right.left)
+    _update(right)
+    return right
+
+
+def _split_first(node):
+    """拆出最左边的节点"""
+    if node is None:
+        return None, None
+    if node.left is None:
+        rest = node.right
+        node.right = None
+        _update(node)
+        return node, rest
+    first, node.left = _split_first(node.left)
+    _update(node)
+    return first, node
+
+
+def _build(items, lo, hi):
+    """由已排序的 items[lo:hi] 构造平衡树"""
+    if lo >= hi:
+        return None
+    mid = (lo + hi) // 2
+    node = _Node(*items[mid])
+    node.left = _build(items, lo, mid)
+    node.right = _build(items, mid + 1, hi)
+    _update(node)
+    return node
+
+
+class IntervalTree:
+    """
+    以开始时间为键、维护子树最大结束时间的树堆(treap)
+
+    区间均为半开区间 [start, end)。插入、删除为 O(log n),
+    重叠查询为 O(log n + k)。
+    """
+
+    def __init__(self):
+        self._root = None
+        self._items = {}
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def insert(self, start, end, key, value=None):
+        if key in self._items:
+            self.remove(key)
+        left, right = _split(self._root, start, key)
+        self._root = _merge(_merge(left, _Node(start, end, key, value)), right)
+        self._items[key] = start
+
+    def remove(self, key):
+        start = self._items.pop(key, None)
+        if start is None:
+            return False
+        left, right = _split(self._root, start, key)
+        _, right = _split_first(right)
+        self._root = _merge(left, right)
+        return True
+
+    def clear(self):
+        self._root = None
+        self._items.clear()
+
+    def rebuild(self, items):
+        """
+        用 [(start, end, key, value), ...] 替换全部内容
+
+        排序后直接构造平衡树, O(n log n) 的排序之外只需 O(n), 比逐个插入快得多。
+        """
+        items = sorted(items, key=lambda item: (item[0], item[2]))
+        self._root = _build(items, 0, len(items))
+        self._items = {key: start for start, _, key, _ in items}
+        # 按层次顺序分配从大到小的随机优先级, 保持堆序, 之后的插入删除照常进行
+        priorities = sorted((random.random() for _ in items), reverse=True)
+        level = [self._root] if self._root is not None else []
+        i = 0
+        while level:
+            next_level = []
+            for node in level:
+                node.priority = priorities[i]
+                i += 1
+                if node.left is not None:
+                    next_level.append(node.left)
+                if node.right is not None:
+                    next_level.append(node.right)
+            level = next_level
+
+    def overlap(self, start, end):
+        """
+        查询与 [start, end) 重叠的区间
+
+        Returns:
+            list: [(start, end, key, value), ...], 按开始时间排序
+        """
+        result = []
+        stack = []
+        node = self._root
+        # 中序遍历, 剪掉 max_end <= start 的子树和开始时间 >= end 的右侧
+        while stack or node is not None:
+            while node is not None:
+                if node.max_end <= start:
+                    node = None
+                    break
+                stack.append(node)
+                node = node.left
+            if not stack:
+                break
+            node = stack.pop()
+            if node.start >= end:
+                break
+            if node.end > start:
+                result.append((node.start, node.end, node.key, node.value))
+            node = node.right
+        return result
+
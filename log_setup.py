@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import atexit
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from app_config import load_config
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+DEFAULT_LOG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.log')
+
+_listener = None
+
+
+def parse_level(value):
+    """把配置中的日志级别(不区分大小写的名称或数字)转成整数, 无效时返回None"""
+    if isinstance(value, int):
+        return value
+    level = logging.getLevelName(str(value).strip().upper())
+    return level if isinstance(level, int) else None
+
+
+def setup_logging(config_path="config.json", log_file=DEFAULT_LOG_FILE):
+    """
+    配置基于队列的日志管线
+
+    各线程只把日志记录放入队列, 由 QueueListener 的后台线程负责格式化输出和写盘,
+    文件按大小轮转。config.json 中的 "logging" 字段可配置:
+
+        {"logging": {"level": "INFO", "max_bytes": 1048576, "backup_count": 3,
+                     "levels": {"my_schedule": "WARNING", "SCRAPER": "DEBUG"}}}
+
+    Returns:
+        QueueListener: 已启动的监听器, 程序退出时会自动停止并刷新
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    config = load_config(config_path).get("logging", {})
+    formatter = logging.Formatter(LOG_FORMAT)
+
+    file_handler = RotatingFileHandler(
+        log_file,
+        maxBytes=int(config.get("max_bytes", 1024 * 1024)),
+        backupCount=int(config.get("backup_count", 3)),
+        encoding="utf-8"
+    )
+    file_handler.setFormatter(formatter)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(log_queue))
+
+    invalid = []
+    level = parse_level(config.get("level", "INFO"))
+    if level is None:
+        invalid.append(("root", config.get("level")))
+        level = logging.INFO
+    root.setLevel(level)
+
+    for name, value in config.get("levels", {}).items():
+        level = parse_level(value)
+        if level is None:
+            invalid.append((name, value))
+        else:
+            logging.getLogger(name).setLevel(level)
+
+    _listener = QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+    _listener.start()
+    for name, value in invalid:
+        logging.getLogger(__name__).warning("%s 的日志级别 %r 无效, 使用默认级别", name, value)
+    atexit.register(shutdown_logging)
+    return _listener
+
+
+def shutdown_logging():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,22 +1,15 @@
 #!/usr/bin/env python3
 
 import sys
-import os
-import logging
+from log_setup import setup_logging
 from PySide6.QtWidgets import QApplication
 from PySide6.QtGui import QIcon
 from ui_manager import MainWindow
 from pet_engine import PetState, DesktopPet
 from my_schedule import Schedule
+from profiler import perf, profile_session
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.log')),
-        logging.StreamHandler()
-    ]
-)
+setup_logging()
 
 def main():
     app = QApplication(sys.argv)
@@ -25,6 +18,8 @@ def main():
     pet_state = PetState()
     schedule = Schedule(pet_state=pet_state)
     schedule.check_overdue_tasks()
+    # 主窗口会重新加载任务文件, 先等这里的修改写完
+    schedule.flush()
 
     app.setWindowIcon(QIcon('icons/logo.png'))
 
@@ -34,7 +29,15 @@ def main():
     window = MainWindow(pet_state, pet)
     window.show()
 
-    sys.exit(app.exec())
+    return app.exec()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # python main.py --profile out.prof  用cProfile记录整个会话
+    if "--profile" in sys.argv:
+        index = sys.argv.index("--profile")
+        profile_file = sys.argv[index + 1] if index + 1 < len(sys.argv) else "session.prof"
+        perf.enabled = True
+        with profile_session(profile_file):
+            exit_code = main()
+        sys.exit(exit_code)
+    sys.exit(main())
\ No newline at end of file
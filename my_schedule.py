@@ -1,15 +1,176 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import functools
+from bisect import bisect_left, bisect_right
 import json
 import os
+import threading
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, date
 import logging
 from SCRAPER import WebScraper
+from profiler import perf
+from interval_tree import IntervalTree
+from sort_index import TaskSortIndex
+from app_config import load_config
+import snapshot
+from archive import TaskArchive
+from persistence import SaveWorker, atomic_write
+from history import History, Mutation
+from deadline import parse_deadline
+import atexit
+from timeline import task_day, task_interval, parse_minutes, MINUTES_PER_DAY
 import asyncio
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def occurrence_days(task, first_day, last_day):
+    """
+    列出任务在 [first_day, last_day] 内出现的日期序数, 重复任务会被展开
+
+    截止日期视为第一次出现的日期; "每月" 在没有对应日期的月份跳过。
+    """
+    day = task_day(task)
+    if day is None or day > last_day:
+        return []
+    repeat = task.get("repeat")
+    if not repeat:
+        return [day] if day >= first_day else []
+    if repeat == "每天":
+        return list(range(max(day, first_day), last_day + 1))
+    if repeat == "每周":
+        start = day if day >= first_day else first_day + (day - first_day) % 7
+        return list(range(start, last_day + 1, 7))
+    if repeat == "每月":
+        anchor = date.fromordinal(day)
+        current = date.fromordinal(max(day, first_day))
+        year, month = current.year, current.month
+        days = []
+        while True:
+            try:
+                occurrence = date(year, month, anchor.day).toordinal()
+            except ValueError:
+                occurrence = None
+            if occurrence is not None:
+                if occurrence > last_day:
+                    break
+                if occurrence >= first_day and occurrence >= day:
+                    days.append(occurrence)
+            elif date(year, month, 1).toordinal() > last_day:
+                break
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return days
+    return [day] if day >= first_day else []
+
+
+# datetime 的最小间隔, 把开区间端点换成闭区间
+_TICK = timedelta(microseconds=1)
+
+
+def reminder_at(task):
+    """任务的提醒时间, 没有设置提醒时返回None, 数据无效时抛出ValueError"""
+    if not task.get("reminder_time"):
+        return None
+    due_date = task["due_date"]
+    if task.get("start_time"):
+        task_time = datetime.strptime(f"{due_date} {task['start_time']}", "%Y-%m-%d %H:%M")
+    else:
+        task_time = datetime.strptime(f"{due_date}", "%Y-%m-%d")
+    return task_time - timedelta(minutes=int(task["reminder_time"]))
+
+
+def format_minutes(minutes):
+    if minutes >= MINUTES_PER_DAY:
+        return "24:00"
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class DayStats:
+    """某一天的任务计数, 由Schedule增量维护"""
+
+    __slots__ = ("total", "completed", "overdue", "priority_counts")
+
+    def __init__(self):
+        self.total = 0
+        self.completed = 0
+        self.overdue = 0
+        # 下标为优先级等级(见Schedule.PRIORITY_RANK), 只统计未完成的任务
+        self.priority_counts = [0, 0, 0, 0]
+
+    @property
+    def max_priority(self):
+        for rank in (3, 2, 1):
+            if self.priority_counts[rank]:
+                return rank
+        return 0
+
+
+class ChangeEvent:
+    """
+    日程数据变更通知
+
+    Attributes:
+        kind: "add" / "update" / "delete" / "reload"
+        task_ids: 受影响的任务ID
+        days: 受影响的日期序数, 包括修改前后的截止日期
+    """
+
+    __slots__ = ("kind", "task_ids", "days")
+
+    def __init__(self, kind, task_ids=(), days=()):
+        self.kind = kind
+        self.task_ids = set(task_ids)
+        self.days = set(days)
+
+
+class TaskSnapshot:
+    """
+    某一版本的任务列表
+
+    发布后不再修改(任务字典修改时整体替换, 不会原地修改),
+    任何线程都可以不加锁地读取。
+    """
+
+    __slots__ = ("version", "tasks", "_by_id")
+
+    def __init__(self, version, tasks):
+        self.version = version
+        self.tasks = tasks
+        self._by_id = None
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def __iter__(self):
+        return iter(self.tasks)
+
+    def get(self, task_id):
+        by_id = self._by_id
+        if by_id is None:
+            by_id = self._by_id = {task["id"]: task for task in self.tasks}
+        return by_id.get(task_id)
+
+
+def _writer(method):
+    """
+    修改任务的方法: 在写锁内执行, 发出变更通知前和最外层调用结束时发布新的快照
+
+    写操作彼此串行; 读取快照的线程不需要等待写锁。
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            self._write_depth += 1
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self._write_depth -= 1
+                if self._write_depth == 0:
+                    self._publish()
+    return wrapper
+
 
 class Schedule:
     WORK = "工作"
@@ -20,36 +181,473 @@ class Schedule:
     HIGH = "高"
     MEDIUM = "中"
     LOW = "低"
+
+    PRIORITY_RANK = {LOW: 1, MEDIUM: 2, HIGH: 3}
+
+    # 一次导入超过这么多任务时整体重建索引
+    BULK_REINDEX_THRESHOLD = 500
+
+    EDITABLE_FIELDS = ("title", "description", "category", "priority", "due_date", "start_time",
+                       "end_time", "repeat", "reminder_time", "completed")
+
+    WORK_START = "09:00"
+    WORK_END = "18:00"
     
-    def __init__(self, data_file="data/tasks.json", pet_state=None):
+    def __init__(self, data_file="data/tasks.json", pet_state=None, storage_format=None):
+        """
+        Args:
+            data_file: 任务文件路径
+            pet_state: 宠物状态, 完成任务时会增加HP
+            storage_format: "json" 或 "snapshot"(二进制快照, 保存在同名 .snap 文件),
+                默认读取 config.json 中的 "storage_format"
+        """
+        config = load_config()
         self.data_file = data_file
+        self.storage_format = storage_format or config.get("storage_format", "json")
+
+        # 持久化方式, 各选项的保证见 persistence.py
+        persistence_config = config.get("persistence", {})
+        self.fsync = persistence_config.get("fsync", False)
+        self._save_worker = None
+        if persistence_config.get("mode", "async") == "async":
+            self._save_worker = SaveWorker(
+                self._write_tasks, delay=persistence_config.get("delay_ms", 300) / 1000
+            )
+            atexit.register(self.close)
+
+        # 超过 max_age_days 天的已完成非重复任务移入按月分区的归档文件, 只在查询到时才解码
+        archive_config = config.get("archive", {})
+        self.archive_max_age_days = archive_config.get("max_age_days", 180)
+        self.archive = None
+        if archive_config.get("enabled", True):
+            self.archive = TaskArchive(
+                os.path.join(os.path.dirname(data_file), "archive.bin"),
+                priority_rank=self.PRIORITY_RANK
+            )
         self.tasks = []
         self.pet_state = pet_state
+        self.day_stats = {}
+        self._today = date.today().toordinal()
+        self._time_index = IntervalTree()
+        self._recurring = {}
+        self._day_index = {}
+        # 未完成且设置了提醒的任务的 (提醒时间, 任务ID, 任务), 按提醒时间排序; 任务ID -> 条目
+        self._reminders = []
+        self._reminder_entries = {}
+        self._sort_index = TaskSortIndex(self.PRIORITY_RANK, (self.WORK, self.STUDY, self.LIFE, self.OTHER))
+        self._listeners = []
+        self._lock = threading.RLock()
+        self._write_depth = 0
+        self._snapshot = TaskSnapshot(0, ())
+        # 任务列表在上次发布后有变化; 修改任务时一定会更新索引, 由索引方法设置
+        self._dirty = True
+        history_config = config.get("history", {})
+        self.history = History(history_config.get("max_entries", 100),
+                               history_config.get("max_records", 5000))
         self._load_tasks()
+        if self.archive is not None:
+            # 早期版本会归档未完成的任务, 移回任务列表
+            unfinished = self.archive.unfinished_ids()
+            if unfinished:
+                self._restore_archived(unfinished)
+                logger.info("从归档中移回了%s个未完成的任务", len(unfinished))
+            self.archive_old_tasks(notify=False)
+        self._rebuild_indexes()
+        self._publish()
+
+    def _publish(self):
+        if self._dirty:
+            self._snapshot = TaskSnapshot(self._snapshot.version + 1, tuple(self.tasks))
+            self._dirty = False
+
+    def snapshot(self):
+        """当前发布的任务快照, 可在后台线程中无锁读取"""
+        return self._snapshot
+
+    def add_listener(self, callback):
+        """注册变更回调, callback(event: ChangeEvent)"""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _notify(self, event):
+        # 先发布快照, 回调中的 get_task 才能取到刚修改的任务
+        self._publish()
+        for callback in list(self._listeners):
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error("处理日程变更通知时出错: %s", e)
+
+    def _rebuild_indexes(self):
+        self._dirty = True
+        self._recurring.clear()
+        self._day_index.clear()
+        self._sort_index.invalidate()
+        self._rebuild_day_stats()
+        self._reminder_entries = {}
+        intervals = []
+        for task in self.tasks:
+            self._index_day(task, 1)
+            entry = self._reminder_entry(task)
+            if entry is not None:
+                self._reminder_entries[task["id"]] = entry
+            interval = task_interval(task)
+            day = task_day(task)
+            if interval is None or day is None:
+                continue
+            if task.get("repeat"):
+                self._recurring[task["id"]] = task
+            else:
+                base = day * MINUTES_PER_DAY
+                intervals.append((base + interval[0], base + interval[1], task["id"], task))
+        self._time_index.rebuild(intervals)
+        self._reminders = sorted(self._reminder_entries.values())
+
+    def _index_task(self, task, sign):
+        """更新任务相关的所有索引, 返回日期序数"""
+        self._dirty = True
+        self._index_time(task, sign)
+        self._index_day(task, sign)
+        self._index_reminder(task, sign)
+        if sign > 0:
+            self._sort_index.add(task)
+        else:
+            self._sort_index.remove(task["id"])
+        return self._count_task(task, sign)
+
+    def _index_day(self, task, sign):
+        day = task_day(task)
+        if day is None:
+            return
+        bucket = self._day_index.get(day)
+        if sign > 0:
+            if bucket is None:
+                bucket = self._day_index[day] = {}
+            bucket[task["id"]] = task
+        elif bucket is not None:
+            bucket.pop(task["id"], None)
+            if not bucket:
+                del self._day_index[day]
+
+    @staticmethod
+    def _reminder_entry(task):
+        if task.get("completed") or not task.get("reminder_time"):
+            return None
+        try:
+            return (reminder_at(task), task["id"], task)
+        except (KeyError, TypeError, ValueError) as e:
+            logger.error("计算提醒时间出错: %s", e)
+            return None
+
+    def _index_reminder(self, task, sign):
+        if sign > 0:
+            entry = self._reminder_entry(task)
+            if entry is not None:
+                self._reminder_entries[task["id"]] = entry
+                self._reminders.insert(bisect_right(self._reminders, entry[:2]), entry)
+            return
+        entry = self._reminder_entries.pop(task["id"], None)
+        if entry is not None:
+            i = bisect_left(self._reminders, entry[:2])
+            if i < len(self._reminders) and self._reminders[i][1] == task["id"]:
+                del self._reminders[i]
+
+    def _replace_task(self, index, task):
+        """用新的任务字典替换 self.tasks[index], 返回修改前后的日期序数"""
+        old_day = self._index_task(self.tasks[index], -1)
+        self.tasks[index] = task
+        new_day = self._index_task(task, 1)
+        return old_day, new_day
+
+    def tasks_on_day(self, day):
+        """按日期序数取当天的任务(不展开重复任务)"""
+        with self._lock:
+            bucket = self._day_index.get(day)
+            return list(bucket.values()) if bucket else []
+
+    def _index_time(self, task, sign):
+        """
+        维护定时任务的区间索引
+
+        不重复的任务以绝对分钟数 [day*1440+start, day*1440+end) 存入区间树,
+        重复任务单独保存, 查询时按时间窗口展开。
+        """
+        task_id = task["id"]
+        if sign < 0:
+            self._time_index.remove(task_id)
+            self._recurring.pop(task_id, None)
+            return
+        interval = task_interval(task)
+        day = task_day(task)
+        if interval is None or day is None:
+            return
+        if task.get("repeat"):
+            self._recurring[task_id] = task
+        else:
+            base = day * MINUTES_PER_DAY
+            self._time_index.insert(base + interval[0], base + interval[1], task_id, task)
+
+    def _busy_intervals(self, start, end, exclude_id=None):
+        """返回与绝对分钟区间 [start, end) 重叠的 (start, end, task) 列表"""
+        with self._lock:
+            busy = [(s, e, task) for s, e, task_id, task in self._time_index.overlap(start, end)
+                    if task_id != exclude_id]
+            recurring = list(self._recurring.items())
+        if recurring:
+            first_day = start // MINUTES_PER_DAY
+            last_day = (end - 1) // MINUTES_PER_DAY
+            for task_id, task in recurring:
+                if task_id == exclude_id:
+                    continue
+                interval = task_interval(task)
+                for day in occurrence_days(task, first_day, last_day):
+                    s = day * MINUTES_PER_DAY + interval[0]
+                    e = day * MINUTES_PER_DAY + interval[1]
+                    if s < end and start < e:
+                        busy.append((s, e, task))
+        busy.sort(key=lambda item: item[0])
+        return busy
+
+    @perf.timed("schedule.find_conflicts")
+    def find_conflicts(self, due_date, start_time, end_time=None, exclude_id=None):
+        """
+        查找与给定时间段冲突的任务
+
+        Args:
+            due_date: 日期, YYYY-MM-DD
+            start_time: 开始时间, HH:MM
+            end_time: 结束时间, HH:MM, 为空时按一小时计算
+            exclude_id: 需要排除的任务ID(编辑任务时传入自身ID)
+
+        Returns:
+            list: 冲突的任务, 按开始时间排序
+        """
+        interval = task_interval({"start_time": start_time, "end_time": end_time})
+        day = task_day({"due_date": due_date})
+        if interval is None or day is None:
+            return []
+        base = day * MINUTES_PER_DAY
+        conflicts = []
+        seen = set()
+        for _, _, task in self._busy_intervals(base + interval[0], base + interval[1], exclude_id):
+            if task["id"] not in seen:
+                seen.add(task["id"])
+                conflicts.append(task)
+        return conflicts
+
+    @perf.timed("schedule.find_free_slots")
+    def find_free_slots(self, duration, from_date, to_date=None, count=3,
+                        work_start=None, work_end=None, exclude_id=None, not_before=None):
+        """
+        在工作时间内查找空闲时段
+
+        Args:
+            duration: 时长(分钟)
+            from_date: 起始日期, YYYY-MM-DD
+            to_date: 结束日期, 默认为起始日期后两周
+            count: 最多返回的时段数
+            work_start: 每天工作开始时间, 默认 WORK_START
+            work_end: 每天工作结束时间, 默认 WORK_END
+            exclude_id: 需要排除的任务ID
+            not_before: datetime, 早于该时刻的时段不返回
+
+        Returns:
+            list: [(日期, 开始时间, 结束时间), ...]
+        """
+        first_day = task_day({"due_date": from_date})
+        if first_day is None or duration <= 0:
+            return []
+        last_day = task_day({"due_date": to_date}) if to_date else first_day + 14
+        day_start = parse_minutes(work_start or self.WORK_START)
+        day_end = parse_minutes(work_end or self.WORK_END)
+        if day_start is None or day_end is None or day_end - day_start < duration:
+            return []
+        earliest = None
+        if not_before is not None:
+            earliest = not_before.toordinal() * MINUTES_PER_DAY + not_before.hour * 60 + not_before.minute
+
+        slots = []
+        for day in range(first_day, (last_day or first_day) + 1):
+            base = day * MINUTES_PER_DAY
+            cursor = base + day_start
+            limit = base + day_end
+            if earliest is not None:
+                cursor = max(cursor, earliest)
+            for s, e, _ in self._busy_intervals(cursor, limit, exclude_id) + [(limit, limit, None)]:
+                if s - cursor >= duration:
+                    slots.append((date.fromordinal(day).isoformat(),
+                                  format_minutes(cursor - base),
+                                  format_minutes(cursor - base + duration)))
+                    if len(slots) >= count:
+                        return slots
+                cursor = max(cursor, e)
+        return slots
+
+    def _rebuild_day_stats(self):
+        self._today = date.today().toordinal()
+        self.day_stats = {}
+        for task in self.tasks:
+            self._count_task(task, 1)
+        if self.archive is not None:
+            for day, counts in self.archive.day_summaries():
+                stats = self.day_stats.get(day)
+                if stats is None:
+                    stats = self.day_stats[day] = DayStats()
+                stats.total += counts[0]
+                stats.completed += counts[1]
+                for rank in range(4):
+                    stats.priority_counts[rank] += counts[2 + rank]
+                if day < self._today:
+                    stats.overdue += counts[0] - counts[1]
+
+    @_writer
+    @perf.timed("schedule.archive")
+    def archive_old_tasks(self, max_age_days=None, notify=True):
+        """
+        把截止日期早于 max_age_days 天前的已完成非重复任务移入归档, 未完成的任务一直留在任务列表中
+
+        先写归档再保存任务文件, 中途出错时任务最多在两处各有一份, 不会丢失。
+
+        Returns:
+            int: 归档的任务数
+        """
+        if self.archive is None:
+            return 0
+        if max_age_days is None:
+            max_age_days = self.archive_max_age_days
+        cutoff = date.today().toordinal() - max_age_days
+        old_tasks = []
+        for task in self.tasks:
+            day = task_day(task)
+            if day is not None and day < cutoff and task.get("completed") and not task.get("repeat"):
+                old_tasks.append(task)
+        if not old_tasks:
+            return 0
+        try:
+            self.archive.add(old_tasks)
+        except Exception as e:
+            logger.error("归档任务时出错: %s", e)
+            return 0
+        old_ids = {task["id"] for task in old_tasks}
+        self.tasks = [task for task in self.tasks if task["id"] not in old_ids]
+        self._save_tasks()
+        logger.info("归档了%s个旧任务", len(old_tasks))
+        if notify:
+            self._rebuild_indexes()
+            self._notify(ChangeEvent("reload"))
+        return len(old_tasks)
+
+    def archived_tasks(self, first_day=None, last_day=None):
+        with self._lock:
+            return self._archived_tasks(first_day, last_day)
+
+    def _archived_tasks(self, first_day=None, last_day=None):
+        """按日期序数范围取归档任务"""
+        if self.archive is None or not len(self.archive):
+            return []
+        return self.archive.get_range(first_day, last_day)
+
+    def _restore_archived(self, task_ids, save=True):
+        """把归档中的任务移回当前任务列表, 以便修改或删除, 返回移回的任务"""
+        if self.archive is None or not len(self.archive):
+            return []
+        removed = self.archive.remove(task_ids)
+        if not removed:
+            return []
+        # 归档中途出错时任务可能同时留在任务列表中
+        existing = {task["id"] for task in self.tasks}
+        self.tasks.extend(task for task in removed if task["id"] not in existing)
+        self._rebuild_indexes()
+        if save:
+            self._save_tasks()
+        return removed
+
+    def _count_task(self, task, sign):
+        """把任务计入(sign=1)或移出(sign=-1)所在日期的统计, 返回日期序数"""
+        day = task_day(task)
+        if day is None:
+            return None
+        stats = self.day_stats.get(day)
+        if stats is None:
+            if sign < 0:
+                return day
+            stats = self.day_stats[day] = DayStats()
+        stats.total += sign
+        if task.get("completed"):
+            stats.completed += sign
+        else:
+            stats.priority_counts[self.PRIORITY_RANK.get(task.get("priority"), 0)] += sign
+            if day < self._today:
+                stats.overdue += sign
+        if stats.total <= 0:
+            del self.day_stats[day]
+        return day
     
+    @property
+    def storage_file(self):
+        if self.storage_format == "snapshot":
+            return os.path.splitext(self.data_file)[0] + ".snap"
+        return self.data_file
+
+    @perf.timed("schedule.load")
     def _load_tasks(self):
         try:
-            if os.path.exists(self.data_file):
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    self.tasks = json.load(f)
-                logging.info(f"从{self.data_file}成功加载了{len(self.tasks)}个日程任务")
+            path = self.storage_file
+            if not os.path.exists(path) and os.path.exists(self.data_file):
+                # 刚切换到快照格式时先读原来的JSON, 下次保存即完成转换
+                path = self.data_file
+            if os.path.exists(path):
+                self.tasks = snapshot.load_file(path)
+                logger.info("从%s成功加载了%s个日程任务", path, len(self.tasks))
             else:
                 os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
-                with open(self.data_file, 'w', encoding='utf-8') as f:
-                    json.dump([], f, ensure_ascii=False)
-                logging.info(f"创建了新的任务文件:{self.data_file}")
+                self.tasks = []
+                self._save_tasks()
+                logger.info("创建了新的任务文件:%s", self.storage_file)
         except Exception as e:
-            logging.error(f"加载任务时出错: {e}")
+            logger.error("加载任务时出错: %s", e)
             self.tasks = []
     
     def _save_tasks(self):
+        """
+        保存任务
+
+        任务字典修改时整体替换而不是原地修改, 因此复制列表即可得到一致的快照,
+        序列化和写盘交给后台线程完成。
+        """
+        if self._save_worker is not None:
+            self._save_worker.submit(list(self.tasks))
+        else:
+            self._write_tasks(self.tasks)
+
+    @perf.timed("schedule.save")
+    def _write_tasks(self, tasks):
         try:
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(self.tasks, f, ensure_ascii=False, indent=2)
-            logging.info(f"成功保存了{len(self.tasks)}个日程任务")
+            if self.storage_format == "snapshot":
+                data = snapshot.dumps(tasks)
+            else:
+                data = json.dumps(tasks, ensure_ascii=False, indent=2).encode("utf-8")
+            atomic_write(self.storage_file, data, fsync=self.fsync)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("成功保存了%s个日程任务", len(tasks))
         except Exception as e:
-            logging.error(f"保存任务时出错: {e}")
+            logger.error("保存任务时出错: %s", e)
+
+    def flush(self, timeout=None):
+        """等待尚未写盘的修改写完, 返回是否在超时前完成"""
+        if self._save_worker is None:
+            return True
+        return self._save_worker.flush(timeout)
+
+    def close(self):
+        if self._save_worker is not None:
+            self._save_worker.stop()
+            self._save_worker = None
     
+    @_writer
     def add_task(self, title, description, category, priority, due_date, 
                  start_time=None, end_time=None, repeat=None, reminder_time=None):
         task_id = str(uuid.uuid4())
@@ -57,7 +655,7 @@ class Schedule:
         try:
             datetime.strptime(due_date, "%Y-%m-%d")
         except ValueError:
-            logging.error("日期格式无效，应为 YYYY-MM-DD")
+            logger.error("日期格式无效，应为 YYYY-MM-DD")
             return None
         
         task = {
@@ -75,44 +673,257 @@ class Schedule:
             "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         }
         
+        self.history.record(Mutation("add", f"添加任务 {title}", [(len(self.tasks), task)]))
         self.tasks.append(task)
+        day = self._index_task(task, 1)
         self._save_tasks()
-        logging.info(f"添加了新任务: {title}")
+        logger.debug("添加了新任务: %s", title)
+        self._notify(ChangeEvent("add", [task_id], [d for d in (day,) if d is not None]))
         return task_id
     
+    @_writer
     def update_task(self, task_id, **kwargs):
         for i, task in enumerate(self.tasks):
             if task["id"] == task_id:
-                for key, value in kwargs.items():
-                    if key in task:
-                        task[key] = value
+                updates = {key: value for key, value in kwargs.items() if key in task}
+                before = {key: task[key] for key, value in updates.items() if task[key] != value}
+                if before:
+                    after = {key: updates[key] for key in before}
+                    self.history.record(Mutation("update", f"修改任务 {task['title']}",
+                                                 [(task_id, before, after)]))
+                task = {**task, **updates}
+                old_day, new_day = self._replace_task(i, task)
                 
                 self._save_tasks()
-                logging.info(f"更新了任务: {task['title']}")
+                logger.debug("更新了任务: %s", task['title'])
+                self._notify(ChangeEvent("update", [task_id], [d for d in (old_day, new_day) if d is not None]))
                 return True
         
-        logging.warning(f"未找到ID为{task_id}的任务")
+        if self._restore_archived([task_id]):
+            return self.update_task(task_id, **kwargs)
+        logger.warning("未找到ID为%s的任务", task_id)
         return False
     
+    @_writer
     def delete_task(self, task_id):
         for i, task in enumerate(self.tasks):
             if task["id"] == task_id:
                 deleted_task = self.tasks.pop(i)
+                self.history.record(Mutation("delete", f"删除任务 {deleted_task['title']}",
+                                             [(i, deleted_task)]))
+                day = self._index_task(deleted_task, -1)
                 self._save_tasks()
-                logging.info(f"删除了任务: {deleted_task['title']}")
+                logger.debug("删除了任务: %s", deleted_task['title'])
+                self._notify(ChangeEvent("delete", [task_id], [d for d in (day,) if d is not None]))
                 return True
         
-        logging.warning(f"未找到ID为{task_id}的任务")
+        if self._restore_archived([task_id]):
+            return self.delete_task(task_id)
+        logger.warning("未找到ID为%s的任务", task_id)
         return False
+
+    def _locate_tasks(self, task_ids):
+        """
+        查找一批任务在self.tasks中的下标, 不在当前列表中的会先从归档移回(尚未保存)
+
+        Returns:
+            tuple: ({任务ID: 下标}, 是否从归档移回了任务)
+        """
+        task_ids = set(task_ids)
+        positions = {task["id"]: i for i, task in enumerate(self.tasks) if task["id"] in task_ids}
+        missing = task_ids.difference(positions)
+        restored = self._restore_archived(missing, save=False) if missing else []
+        start = len(self.tasks) - len(restored)
+        positions.update((task["id"], start + i) for i, task in enumerate(restored))
+        missing.difference_update(positions)
+        if missing:
+            logger.warning("未找到%s个任务: %s", len(missing), ", ".join(sorted(missing)))
+        return positions, bool(restored)
+
+    @_writer
+    def update_tasks(self, task_ids, **kwargs):
+        """
+        批量修改任务, 只保存一次并发出一个变更通知
+
+        Returns:
+            list: 实际发生变化的任务ID
+        """
+        updates = {key: value for key, value in kwargs.items() if key in self.EDITABLE_FIELDS}
+        if not updates:
+            return []
+        positions, restored = self._locate_tasks(task_ids)
+        diffs = []
+        for task_id, i in positions.items():
+            task = self.tasks[i]
+            before = {key: task.get(key) for key, value in updates.items() if task.get(key) != value}
+            if before:
+                diffs.append((task_id, before, {key: updates[key] for key in before}))
+        if diffs:
+            self.history.record(Mutation("update", f"批量修改 {len(diffs)} 个任务", diffs))
+            self._patch_tasks([(task_id, after) for task_id, _, after in diffs])
+            logger.info("批量更新了%s个任务", len(diffs))
+        elif restored:
+            self._save_tasks()
+        return [task_id for task_id, _, _ in diffs]
+
+    @_writer
+    def delete_tasks(self, task_ids):
+        """
+        批量删除任务, 只保存一次并发出一个变更通知
+
+        Returns:
+            list: 被删除的任务ID
+        """
+        positions, _ = self._locate_tasks(task_ids)
+        if not positions:
+            return []
+        removed = self._remove_tasks(positions)
+        self.history.record(Mutation("delete", f"删除 {len(removed)} 个任务", removed))
+        logger.info("批量删除了%s个任务", len(removed))
+        return [task["id"] for _, task in removed]
+
+    @_writer
+    def import_tasks(self, tasks, label="导入任务"):
+        """
+        批量导入任务(例如从日历文件逐个读出的任务), 只保存一次并发出一个变更通知
+
+        截止日期无效或ID已存在的任务会被跳过。
+
+        Returns:
+            list: 导入的任务ID
+        """
+        existing = {task["id"] for task in self.tasks}
+        fields = ("id",) + self.EDITABLE_FIELDS + ("created_at",)
+        # 先读完整个输入再修改任务列表, 读取中途出错时任务列表保持不变
+        accepted = []
+        days = set()
+        skipped = 0
+        for task in tasks:
+            day = task_day(task)
+            if day is None or not task.get("id") or task["id"] in existing:
+                skipped += 1
+                continue
+            task = {field: task.get(field) for field in fields}
+            task["completed"] = bool(task["completed"])
+            existing.add(task["id"])
+            accepted.append(task)
+            days.add(day)
+        if skipped:
+            logger.info("导入时跳过了%s个无效或重复的任务", skipped)
+        if not accepted:
+            return []
+        added = [(len(self.tasks) + i, task) for i, task in enumerate(accepted)]
+        self.tasks.extend(accepted)
+        if len(added) > self.BULK_REINDEX_THRESHOLD:
+            # 大批量导入时整体重建索引, 比逐个插入区间树快
+            self._rebuild_indexes()
+        else:
+            for _, task in added:
+                self._index_task(task, 1)
+        self.history.record(Mutation("add", label, added))
+        self._save_tasks()
+        logger.info("导入了%s个任务", len(added))
+        self._notify(ChangeEvent("add", [task["id"] for _, task in added], days))
+        return [task["id"] for _, task in added]
+
+    def _insert_tasks(self, entries):
+        """按 [(下标, 任务), ...] 插回任务, 保存并通知"""
+        days = set()
+        for index, task in sorted(entries, key=lambda entry: entry[0]):
+            self.tasks.insert(min(index, len(self.tasks)), task)
+            day = self._index_task(task, 1)
+            if day is not None:
+                days.add(day)
+        self._save_tasks()
+        self._notify(ChangeEvent("add", [task["id"] for _, task in entries], days))
+
+    def _remove_tasks(self, task_ids):
+        """删除任务, 保存并通知, 返回 [(原下标, 任务), ...]"""
+        task_ids = set(task_ids)
+        removed = []
+        kept = []
+        days = set()
+        for i, task in enumerate(self.tasks):
+            if task["id"] in task_ids:
+                removed.append((i, task))
+                day = self._index_task(task, -1)
+                if day is not None:
+                    days.add(day)
+            else:
+                kept.append(task)
+        if removed:
+            self.tasks = kept
+            self._save_tasks()
+            self._notify(ChangeEvent("delete", [task["id"] for _, task in removed], days))
+        return removed
+
+    def _patch_tasks(self, changes):
+        """按 [(任务ID, 字段), ...] 修改任务, 保存并通知"""
+        changes = dict(changes)
+        days = set()
+        patched = []
+        for i, task in enumerate(self.tasks):
+            fields = changes.get(task["id"])
+            if fields is not None:
+                old_day, new_day = self._replace_task(i, {**task, **fields})
+                days.update(d for d in (old_day, new_day) if d is not None)
+                patched.append(task["id"])
+        if patched:
+            self._save_tasks()
+            self._notify(ChangeEvent("update", patched, days))
+
+    def _apply_mutation(self, mutation, undo):
+        if mutation.kind == "batch":
+            for child in (reversed(mutation.data) if undo else mutation.data):
+                self._apply_mutation(child, undo)
+        elif mutation.kind == "update":
+            self._patch_tasks([(task_id, before if undo else after)
+                               for task_id, before, after in mutation.data])
+        elif (mutation.kind == "add") == undo:
+            self._remove_tasks(task["id"] for _, task in mutation.data)
+        else:
+            self._insert_tasks(mutation.data)
+
+    @_writer
+    def undo(self):
+        """撤销最近一次修改, 返回其描述, 没有可撤销的修改时返回None"""
+        mutation = self.history.pop_undo()
+        if mutation is None:
+            return None
+        self._apply_mutation(mutation, undo=True)
+        logger.info("撤销: %s", mutation.label)
+        return mutation.label
+
+    @_writer
+    def redo(self):
+        """重做最近一次撤销的修改, 返回其描述, 没有可重做的修改时返回None"""
+        mutation = self.history.pop_redo()
+        if mutation is None:
+            return None
+        self._apply_mutation(mutation, undo=False)
+        logger.info("重做: %s", mutation.label)
+        return mutation.label
     
     def get_task(self, task_id):
-        for task in self.tasks:
-            if task["id"] == task_id:
-                return task
+        task = self._snapshot.get(task_id)
+        if task is not None:
+            return task
+        with self._lock:
+            if self.archive is not None and len(self.archive):
+                return self.archive.find(task_id)
         return None
     
-    def get_tasks(self, category=None, priority=None, from_date=None, to_date=None, completed=None):
-        filtered_tasks = self.tasks
+    @perf.timed("schedule.get_tasks")
+    def get_tasks(self, category=None, priority=None, from_date=None, to_date=None, completed=None,
+                  include_archive=False):
+        filtered_tasks = list(self._snapshot.tasks)
+
+        if include_archive:
+            first_day = task_day({"due_date": from_date}) if from_date else None
+            last_day = task_day({"due_date": to_date}) if to_date else None
+            archived = self.archived_tasks(first_day, last_day)
+            if archived:
+                filtered_tasks = filtered_tasks + archived
         
         if category:
             filtered_tasks = [t for t in filtered_tasks if t["category"] == category]
@@ -125,20 +936,43 @@ class Schedule:
                 from_date_obj = datetime.strptime(from_date, "%Y-%m-%d")
                 filtered_tasks = [t for t in filtered_tasks if datetime.strptime(t["due_date"], "%Y-%m-%d") >= from_date_obj]
             except ValueError:
-                logging.error("起始日期格式无效")
+                logger.error("起始日期格式无效")
         
         if to_date:
             try:
                 to_date_obj = datetime.strptime(to_date, "%Y-%m-%d")
                 filtered_tasks = [t for t in filtered_tasks if datetime.strptime(t["due_date"], "%Y-%m-%d") <= to_date_obj]
             except ValueError:
-                logging.error("结束日期格式无效")
+                logger.error("结束日期格式无效")
         
         if completed is not None:
             filtered_tasks = [t for t in filtered_tasks if t["completed"] == completed]
         
         return filtered_tasks
-    
+
+    @perf.timed("schedule.sorted_tasks")
+    def get_sorted_tasks(self, column, descending=False, category=None, priority=None, completed=None):
+        """
+        按预先计算的排序键排列的当前任务(不含归档), 筛选条件同 get_tasks
+
+        Args:
+            column: sort_index.SORT_COLUMNS 中的列名
+        """
+        with self._lock:
+            if not self._sort_index.ready:
+                self._sort_index.rebuild(self.tasks)
+            ordered = self._sort_index.ordered(column)
+            if category or priority or completed is not None:
+                tasks = [t for t in ordered
+                         if (not category or t["category"] == category)
+                         and (not priority or t["priority"] == priority)
+                         and (completed is None or t["completed"] == completed)]
+            else:
+                tasks = list(ordered)
+        if descending:
+            tasks.reverse()
+        return tasks
+
     def get_today_tasks(self):
         today = datetime.now().strftime("%Y-%m-%d")
         return self.get_tasks(from_date=today, to_date=today)
@@ -165,54 +999,52 @@ class Schedule:
             self.pet_state.increase_hp(10)
         return result
     
+    @perf.timed("schedule.get_upcoming_reminders")
     def get_upcoming_reminders(self, minutes=30):
         now = datetime.now()
-        reminder_tasks = []
-        
-        for task in self.tasks:
-            if task["completed"]:
-                continue
-                
-            if not task.get("reminder_time"):
-                continue
-                
-            try:
-                due_date = task["due_date"]
-                
-                if task.get("start_time"):
-                    task_time = datetime.strptime(f"{due_date} {task['start_time']}", "%Y-%m-%d %H:%M")
-                else:
-                    task_time = datetime.strptime(f"{due_date}", "%Y-%m-%d")
-                
-                reminder_time = task_time - timedelta(minutes=int(task["reminder_time"]))
-                
-                if now <= reminder_time <= (now + timedelta(minutes=minutes)):
-                    reminder_tasks.append(task)
-            except Exception as e:
-                logging.error(f"计算提醒时间出错: {e}")
-        
-        return reminder_tasks
-    
+        return self.get_reminders_between(now, now + timedelta(minutes=minutes), include_start=True)
+
+    def get_reminders_between(self, start, end, include_start=False):
+        """未完成且提醒时间在 (start, end] 内的任务, include_start 为真时包含 start, 按提醒时间排序"""
+        if not include_start:
+            start += _TICK
+        with self._lock:
+            # 条目为 (提醒时间, 任务ID, 任务), 单元素元组排在同一时间的所有条目之前
+            i = bisect_left(self._reminders, (start,))
+            j = bisect_left(self._reminders, (end + _TICK,))
+            return [entry[2] for entry in self._reminders[i:j]]
+
     def import_from_web(self, base_url):
         base_url = "https://course.pku.edu.cn/webapps/bb-sso-BBLEARN/login.html"
-        assignments = asyncio.run(WebScraper(base_url))
-        logging.info(f"从网页导入了 {len(assignments)} 个任务")
-        
+        imported = []
+
+        def on_course(course_name, assignments):
+            # 每门课程完成后立即写入, 导入中途失败时已完成课程的任务不会丢失
+            self._import_assignments(assignments)
+            self.flush()
+            imported.extend(assignments)
+
+        with self.history.group("从网页导入任务"):
+            asyncio.run(WebScraper(base_url, on_course=on_course))
+        logger.info("从网页导入了 %s 个任务", len(imported))
+
+    def _import_assignments(self, assignments):
+        today = date.today()
         for assignment in assignments:
             due_date = assignment.get("due_date")
+            due_time = None
             if due_date and due_date.strip():
-                try:
-                    from dateutil.parser import parse
-                    parsed_date = parse(due_date, fuzzy=True)
-                    due_date = parsed_date.strftime("%Y-%m-%d")
-                except Exception as e:
-                    logging.error(f"截止日期无法解析: {due_date}, 错误: {e}")
-                    due_date = datetime.now().strftime("%Y-%m-%d")
+                deadline = parse_deadline(due_date, today)
+                if deadline is not None:
+                    due_date, due_time = deadline
+                else:
+                    logger.error("截止日期无法解析: %s", due_date)
+                    due_date = today.isoformat()
             else:
-                due_date = datetime.now().strftime("%Y-%m-%d")
+                due_date = today.isoformat()
             
-            if datetime.strptime(due_date, "%Y-%m-%d").date() < datetime.now().date():
-                logging.info(f"任务'{assignment['title']}'截止日期 {due_date} 已经过期，将跳过该任务")
+            if date.fromisoformat(due_date) < today:
+                logger.info("任务'%s'截止日期 %s 已经过期，将跳过该任务", assignment['title'], due_date)
                 continue
 
             course_name = assignment.get("course_name", "未知课程")
@@ -224,13 +1056,25 @@ class Schedule:
                 description=description,
                 category=self.STUDY,
                 priority=self.MEDIUM,
-                due_date=due_date
+                due_date=due_date,
+                start_time=due_time
             )
     
+    @_writer
+    def roll_over_day(self):
+        """日期变化后重新统计逾期任务"""
+        if date.today().toordinal() == self._today:
+            return False
+        self._rebuild_day_stats()
+        self._notify(ChangeEvent("reload"))
+        return True
+
+    @_writer
     def check_overdue_tasks(self):
+        self.roll_over_day()
         now = datetime.now()
         changed = False
-        for task in self.tasks:
+        for i, task in enumerate(self.tasks):
             if not task.get("completed", False):
                 due_str = task.get("due_date")
                 if due_str:
@@ -240,7 +1084,7 @@ class Schedule:
                             if not task.get("overdue_penalized", False):
                                 if self.pet_state:
                                     self.pet_state.hp = max(5, self.pet_state.hp - 15)
-                                task["overdue_penalized"] = True
+                                self._replace_task(i, {**task, "overdue_penalized": True})
                                 changed = True
                     except Exception as e:
                         pass
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+非阻塞的任务提醒
+
+提醒先进入以 (任务ID, 提醒对应的时间) 为键的队列, 同一次提醒只会送达一次;
+送达时优先使用系统托盘通知, 托盘不可用时打开非模态的提醒面板。
+两次通知之间至少间隔 min_interval_s 秒, 期间到达的提醒合并成一条通知。
+提醒的送达/推迟状态保存在 ReminderLedger 中, 重启后不会重复提醒, 程序关闭期间
+错过的提醒在启动时汇总成一条通知。config.json 中可配置:
+
+    {"notifications": {"batch_window_ms": 500, "min_interval_s": 5, "snooze_minutes": 10}}
+"""
+
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from PySide6.QtCore import QObject, Qt, QTimer, Signal
+from PySide6.QtWidgets import (
+    QHBoxLayout, QListWidget, QListWidgetItem, QPushButton, QSystemTrayIcon,
+    QVBoxLayout, QWidget
+)
+
+from reminder_ledger import FIRED, MISSED, SNOOZED
+
+logger = logging.getLogger(__name__)
+
+# 合并通知中最多列出的任务数
+MAX_LISTED = 5
+
+
+def reminder_key(task):
+    """同一任务的同一次提醒对应同一个键, 修改任务时间后视为新的提醒"""
+    occurrence = f"{task.get('due_date') or ''} {task.get('start_time') or ''}".strip()
+    return task["id"], occurrence
+
+
+def describe(task):
+    return f"{task.get('start_time') or '全天'} {task['title']}"
+
+
+def summarize(tasks):
+    lines = [describe(task) for task in tasks[:MAX_LISTED]]
+    if len(tasks) > MAX_LISTED:
+        lines.append(f"……等 {len(tasks)} 个任务")
+    return "\n".join(lines)
+
+
+class NotificationCenter(QObject):
+    # 待处理的提醒有变化
+    changed = Signal()
+    # 托盘通知不可用或被点击, 需要显示提醒面板
+    panel_requested = Signal()
+
+    def __init__(self, tray=None, config=None, parent=None, ledger=None):
+        super().__init__(parent)
+        config = config or {}
+        self.tray = tray
+        self.ledger = ledger
+        self.batch_window_ms = int(config.get("batch_window_ms", 500))
+        self.min_interval = float(config.get("min_interval_s", 5))
+        self.snooze_minutes = int(config.get("snooze_minutes", 10))
+
+        # 已经入队过的提醒, 键 -> 入队时间
+        self._seen = {}
+        self._pending = OrderedDict()
+        self._snoozed = {}
+        # 已送达但用户还没有处理的提醒, 显示在面板中
+        self.active = OrderedDict()
+        self._last_delivery = None
+
+        self._deliver_timer = QTimer(self)
+        self._deliver_timer.setSingleShot(True)
+        self._deliver_timer.timeout.connect(self._deliver)
+        self._snooze_timer = QTimer(self)
+        self._snooze_timer.setSingleShot(True)
+        self._snooze_timer.timeout.connect(self._wake_snoozed)
+
+        if self.tray is not None:
+            self.tray.messageClicked.connect(self.panel_requested)
+
+        if self.ledger is not None:
+            # 定期记录检查时间, 下次启动时据此找出错过的提醒
+            self._touch_timer = QTimer(self)
+            self._touch_timer.setInterval(60 * 1000)
+            self._touch_timer.timeout.connect(self.ledger.touch)
+            self._touch_timer.start()
+
+    def notify(self, task):
+        """
+        提醒入队, 返回是否为新的提醒
+
+        get_upcoming_reminders 在提醒时间之前会重复返回同一个任务, 重复的直接忽略。
+        """
+        key = reminder_key(task)
+        if key in self._seen or (self.ledger is not None and self.ledger.state(key) is not None):
+            return False
+        self._seen[key] = datetime.now()
+        self._enqueue(key, task)
+        return True
+
+    def _enqueue(self, key, task):
+        self._pending[key] = task
+        if not self._deliver_timer.isActive():
+            self._deliver_timer.start(self.batch_window_ms)
+
+    def _deliver(self):
+        if not self._pending:
+            return
+        if self._last_delivery is not None:
+            wait = self._last_delivery + self.min_interval - time.monotonic()
+            if wait > 0:
+                self._deliver_timer.start(int(wait * 1000) + 1)
+                return
+
+        batch = list(self._pending.items())
+        self._pending.clear()
+        self.active.update(batch)
+        self._last_delivery = time.monotonic()
+        if self.ledger is not None:
+            self.ledger.mark([key for key, _ in batch], FIRED)
+
+        tasks = [task for _, task in batch]
+        if len(tasks) == 1:
+            task = tasks[0]
+            title = "任务提醒"
+            message = (f"任务：{task['title']}\n时间：{task.get('start_time') or '全天'}\n"
+                       f"描述：{task.get('description') or ''}")
+        else:
+            title = f"{len(tasks)} 个任务提醒"
+            message = summarize(tasks)
+
+        if not self._show_toast(title, message):
+            self.panel_requested.emit()
+        logger.info("送达了%s条提醒", len(tasks))
+        self._prune()
+        self.changed.emit()
+
+    def _show_toast(self, title, message):
+        if self.tray is None or not self.tray.isVisible() or not QSystemTrayIcon.supportsMessages():
+            return False
+        self.tray.showMessage(title, message, QSystemTrayIcon.Information, 10000)
+        return True
+
+    def snooze(self, key, minutes=None):
+        task = self.active.pop(key, None)
+        if task is None:
+            return False
+        until = datetime.now() + timedelta(minutes=minutes or self.snooze_minutes)
+        self._snoozed[key] = (until, task)
+        if self.ledger is not None:
+            self.ledger.mark([key], SNOOZED, until)
+        self._schedule_snoozed()
+        logger.debug("提醒'%s'推迟到 %s", task["title"], until.strftime("%H:%M"))
+        self.changed.emit()
+        return True
+
+    def dismiss(self, key):
+        if self.active.pop(key, None) is not None:
+            self.changed.emit()
+
+    def dismiss_all(self):
+        if self.active:
+            self.active.clear()
+            self.changed.emit()
+
+    def catch_up(self, schedule_manager):
+        """
+        启动时调用: 恢复推迟的提醒, 并把程序关闭期间错过的提醒汇总成一条通知
+
+        Returns:
+            int: 错过的提醒数
+        """
+        if self.ledger is None:
+            return 0
+        now = datetime.now()
+        missed = OrderedDict()
+        if self.ledger.last_check is not None:
+            for task in schedule_manager.get_reminders_between(self.ledger.last_check, now):
+                key = reminder_key(task)
+                if self.ledger.state(key) is None:
+                    missed[key] = task
+
+        for task_id, occurrence, until in self.ledger.snoozed():
+            key = (task_id, occurrence)
+            task = schedule_manager.get_task(task_id)
+            if task is None or task.get("completed") or reminder_key(task) != key:
+                # 任务已删除、完成或改了时间, 推迟的提醒作废
+                self.ledger.mark([key], FIRED, save=False)
+            elif until <= now:
+                missed[key] = task
+            else:
+                self._snoozed[key] = (until, task)
+                self._seen[key] = now
+
+        self.ledger.mark(missed, MISSED, save=False)
+        self.ledger.touch(now)
+        self._schedule_snoozed()
+        if not missed:
+            return 0
+
+        for key in missed:
+            self._seen[key] = now
+        self.active.update(missed)
+        tasks = list(missed.values())
+        title = f"错过了 {len(tasks)} 个提醒"
+        if not self._show_toast(title, summarize(tasks)):
+            self.panel_requested.emit()
+        self._last_delivery = time.monotonic()
+        logger.info("程序关闭期间错过了%s个提醒", len(tasks))
+        self.changed.emit()
+        return len(tasks)
+
+    def _schedule_snoozed(self):
+        if not self._snoozed:
+            self._snooze_timer.stop()
+            return
+        earliest = min(until for until, _ in self._snoozed.values())
+        delay = max(0, (earliest - datetime.now()).total_seconds())
+        self._snooze_timer.start(int(delay * 1000) + 1)
+
+    def _wake_snoozed(self):
+        now = datetime.now()
+        for key, (until, task) in list(self._snoozed.items()):
+            if until <= now:
+                del self._snoozed[key]
+                self._enqueue(key, task)
+        self._schedule_snoozed()
+
+    def _prune(self):
+        # 提醒窗口只有半小时, 一天前入队的记录不会再被重复返回
+        cutoff = datetime.now() - timedelta(days=1)
+        for key in [key for key, queued in self._seen.items() if queued < cutoff]:
+            del self._seen[key]
+
+
+class NotificationPanel(QWidget):
+    """非模态的提醒面板, 列出已送达但还没有处理的提醒"""
+
+    def __init__(self, center, parent=None):
+        super().__init__(parent, Qt.Tool)
+        self.center = center
+        self.setWindowTitle("任务提醒")
+        self.setMinimumSize(360, 240)
+        self.init_ui()
+        self.center.changed.connect(self.refresh)
+
+    def init_ui(self):
+
+        layout = QVBoxLayout()
+        self.list_widget = QListWidget()
+        self.list_widget.setSelectionMode(QListWidget.ExtendedSelection)
+        layout.addWidget(self.list_widget)
+
+        button_layout = QHBoxLayout()
+        self.snooze_btn = QPushButton(f"{self.center.snooze_minutes}分钟后提醒")
+        self.snooze_btn.clicked.connect(self.snooze_selected)
+        self.dismiss_btn = QPushButton("知道了")
+        self.dismiss_btn.clicked.connect(self.dismiss_selected)
+        self.dismiss_all_btn = QPushButton("全部知道了")
+        self.dismiss_all_btn.clicked.connect(self.center.dismiss_all)
+        button_layout.addWidget(self.snooze_btn)
+        button_layout.addWidget(self.dismiss_btn)
+        button_layout.addStretch()
+        button_layout.addWidget(self.dismiss_all_btn)
+        layout.addLayout(button_layout)
+
+        self.setLayout(layout)
+        self.refresh()
+
+    def refresh(self):
+        self.list_widget.clear()
+        self._keys = list(self.center.active)
+        for task in self.center.active.values():
+            item = QListWidgetItem(f"{task.get('due_date') or ''} {describe(task)}")
+            item.setToolTip(task.get("description") or "")
+            self.list_widget.addItem(item)
+        if not self.center.active and self.isVisible():
+            self.hide()
+
+    def selected_keys(self):
+        rows = sorted(index.row() for index in self.list_widget.selectedIndexes())
+        if not rows and self._keys:
+            rows = [0]
+        return [self._keys[row] for row in rows]
+
+    def snooze_selected(self):
+        for key in self.selected_keys():
+            self.center.snooze(key)
+
+    def dismiss_selected(self):
+        for key in self.selected_keys():
+            self.center.dismiss(key)
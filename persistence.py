@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+任务文件的持久化
+
+写入一律先写临时文件再 os.replace, 任何时刻磁盘上要么是旧文件要么是新文件。
+两种持久化方式(config.json 中的 "persistence"):
+
+    {"persistence": {"mode": "async", "delay_ms": 300, "fsync": false}}
+
+    mode = "sync"   每次修改在调用线程上立即写盘, 返回时数据已交给操作系统
+    mode = "async"  修改后由后台线程在 delay_ms 内合并写入; 程序崩溃时最多丢失
+                    最近 delay_ms 内的修改。正常退出和 flush() 会等待写完
+    fsync = true    替换前对临时文件调用 fsync, 断电时也不会丢失已写入的数据,
+                    代价是每次写入多等一次磁盘
+"""
+
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def atomic_write(path, data, fsync=False):
+    """把 bytes 原子地写入 path"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class SaveWorker:
+    """
+    合并写入的后台保存线程
+
+    submit() 只记录最新的状态; 线程在收到第一次提交后等待 delay 秒,
+    期间的多次提交只会写入最后一次。
+    """
+
+    def __init__(self, write, delay=0.3, name="schedule-save"):
+        """
+        Args:
+            write: 在后台线程中调用的写入函数, write(state)
+            delay: 合并窗口(秒)
+        """
+        self._write = write
+        self.delay = delay
+        self._cond = threading.Condition()
+        self._pending = None
+        self._has_pending = False
+        self._submitted = 0
+        self._written = 0
+        # flush() 等待写完的提交序号, 大于 _written 时跳过合并窗口
+        self._flush_target = 0
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, state):
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError("保存线程已停止")
+            self._pending = state
+            self._has_pending = True
+            self._submitted += 1
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._has_pending and not self._stopped:
+                    self._cond.wait()
+                if not self._has_pending:
+                    return
+                deadline = time.monotonic() + self.delay
+                while self._flush_target <= self._written and not self._stopped:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                state = self._pending
+                sequence = self._submitted
+                self._pending = None
+                self._has_pending = False
+
+            try:
+                self._write(state)
+            except Exception as e:
+                logger.error("后台保存时出错: %s", e)
+
+            with self._cond:
+                self._written = sequence
+                self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        等待此前提交的状态全部写完
+
+        Returns:
+            bool: 是否在超时前写完
+        """
+        with self._cond:
+            target = self._submitted
+            if self._written >= target:
+                return True
+            self._flush_target = max(self._flush_target, target)
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: self._written >= target, timeout)
+
+    def stop(self, timeout=5.0):
+        self.flush(timeout)
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
@@ -4,7 +4,11 @@ from PySide6.QtWidgets import (QWidget, QMenu, QSystemTrayIcon,
                               QGraphicsOpacityEffect, QApplication)
 import os
 import json
+import logging
+from profiler import perf
+from timer_service import get_timer_service
 
+logger = logging.getLogger(__name__)
 
 T = 5
 
@@ -60,7 +64,7 @@ class PetState(QObject):
                     self._food = data.get('food', 100)
                     self._mood = data.get('mood', 'normal')
         except Exception as e:
-            print(f"加载宠物状态失败: {e}")
+            logger.error("加载宠物状态失败: %s", e)
 
     def save_state(self):
         try:
@@ -72,7 +76,7 @@ class PetState(QObject):
                     'mood': self._mood
                 }, f)
         except Exception as e:
-            print(f"保存宠物状态失败: {e}")
+            logger.error("保存宠物状态失败: %s", e)
 
 class DesktopPet(QWidget):
     def __init__(self, state):
@@ -118,9 +122,8 @@ class DesktopPet(QWidget):
         self.tray.show()
 
     def init_hp_timer(self):
-        self.hp_timer = QTimer()
-        self.hp_timer.timeout.connect(self.auto_decrease_hp)
-        self.hp_timer.start(1000*T)  # 每分钟,可以修改T
+        # 每T秒掉一点HP, 与提醒检查共用定时服务
+        self.hp_job = get_timer_service().every(T, self.auto_decrease_hp, "pet.decay")
 
     def auto_decrease_hp(self):
         if self.state.hp > 1:
@@ -129,6 +132,7 @@ class DesktopPet(QWidget):
         self.hp = min(100, self.hp + amount)
         
         
+    @perf.timed("pet.paint")
     def paintEvent(self, event):
         painter = QPainter(self)
         painter.setRenderHint(QPainter.Antialiasing)
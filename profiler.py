@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import cProfile
+import functools
+import json
+import os
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+
+class _NullTimer:
+    """未启用统计时使用的空计时器, 不做任何事情"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+
+    __slots__ = ("perf", "name", "start")
+
+    def __init__(self, perf, name):
+        self.perf = perf
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.perf.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Instrumentation:
+    """
+    热点路径的计时与计数工具
+
+    未启用时 measure() 返回共享的空计时器, timed() 包装的函数只多一次属性判断,
+    因此可以常驻在日程查询、保存、视图刷新等路径上。
+    """
+
+    def __init__(self, max_samples=2048):
+        self.enabled = os.environ.get("SCHEDULE_PERF") == "1"
+        self.max_samples = max_samples
+        self._samples = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+        self._profiler = None
+
+    def measure(self, name):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def timed(self, name):
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(name, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def record(self, name, elapsed):
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.max_samples)
+            samples.append(elapsed)
+            self._counts[name] = self._counts.get(name, 0) + 1
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + n
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+
+    def stats(self):
+        """
+        汇总统计结果
+
+        Returns:
+            dict: 名称 -> {count, p50, p95, max, total}, 时间单位为毫秒
+        """
+        with self._lock:
+            snapshot = {name: sorted(samples) for name, samples in self._samples.items()}
+            counts = dict(self._counts)
+
+        result = {}
+        for name, count in counts.items():
+            samples = snapshot.get(name, [])
+            entry = {"count": count, "p50": None, "p95": None, "max": None, "total": None}
+            if samples:
+                entry["p50"] = samples[int(0.50 * (len(samples) - 1))] * 1000
+                entry["p95"] = samples[int(0.95 * (len(samples) - 1))] * 1000
+                entry["max"] = samples[-1] * 1000
+                entry["total"] = sum(samples) * 1000
+            result[name] = entry
+        return result
+
+    def dump(self, filename):
+        data = {
+            "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "enabled": self.enabled,
+            "stats": self.stats()
+        }
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+    @property
+    def profiling(self):
+        return self._profiler is not None
+
+    def start_profile(self):
+        if self._profiler is not None:
+            return False
+        self._profiler = cProfile.Profile()
+        self._profiler.enable()
+        return True
+
+    def stop_profile(self, filename):
+        """
+        停止cProfile会话并写出结果
+
+        Args:
+            filename: .prof 文件路径, 同目录下会额外生成一份可读的 .txt 摘要
+        """
+        if self._profiler is None:
+            return False
+        profiler, self._profiler = self._profiler, None
+        profiler.disable()
+        profiler.dump_stats(filename)
+        with open(os.path.splitext(filename)[0] + ".txt", 'w', encoding='utf-8') as f:
+            pstats.Stats(profiler, stream=f).sort_stats("cumulative").print_stats(60)
+        return True
+
+
+perf = Instrumentation()
+
+
+@contextmanager
+def profile_session(filename):
+    """用cProfile包裹一段代码, 便于附在问题报告中"""
+    started = perf.start_profile()
+    try:
+        yield
+    finally:
+        if started:
+            perf.stop_profile(filename)
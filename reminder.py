@@ -1,87 +1,103 @@
 #!/usr/bin/env python3
 
-import threading
-import time
-import schedule 
 import logging
 from datetime import datetime, timedelta
 from PySide6.QtCore import QObject, Signal
+from profiler import perf
+from timer_service import get_timer_service
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
 
 class Reminder(QObject):
     reminder_signal = Signal(dict)
     
-    def __init__(self, schedule_manager):
+    def __init__(self, schedule_manager, timers=None):
         super().__init__()
         self.schedule_manager = schedule_manager
-        self.reminder_thread = None
+        self.timers = timers
+        self._jobs = []
         self.running = False
         
     def start(self):
-        if self.reminder_thread is not None and self.reminder_thread.is_alive():
-            logging.warning("提醒线程已经在运行中")
+        """在主线程的定时服务上注册提醒检查, 回调与界面修改任务在同一线程, 无需加锁"""
+        if self.running:
+            logger.warning("提醒服务已经在运行中")
             return False
         
+        timers = self.timers or get_timer_service()
         self.running = True
-        self.reminder_thread = threading.Thread(target=self._reminder_loop)
-        self.reminder_thread.daemon = True  
-        self.reminder_thread.start()
-        logging.info("提醒服务已启动")
+        self._jobs = [
+            timers.daily("00:00", self._schedule_daily_tasks, "reminder.daily"),
+            timers.every(60, self._check_reminders, "reminder.check", delay=0),
+        ]
+        self._schedule_daily_tasks()
+        logger.info("提醒服务已启动")
         return True
     
     def stop(self):
+        if not self.running:
+            return False
+        timers = self.timers or get_timer_service()
+        for job in self._jobs:
+            timers.cancel(job)
+        self._jobs = []
         self.running = False
-        if self.reminder_thread and self.reminder_thread.is_alive():
-            self.reminder_thread.join(timeout=2.0)
-            logging.info("提醒服务已停止")
-            return True
-        return False
-    
-    def _reminder_loop(self):
-        schedule.every().day.at("00:00").do(self._schedule_daily_tasks)
-        schedule.every().minute.do(self._check_reminders)
-        self._schedule_daily_tasks()
-        
-        while self.running:
-            schedule.run_pending()
-            time.sleep(1)  
+        logger.info("提醒服务已停止")
+        return True
     
     def _schedule_daily_tasks(self):
         tasks = self.schedule_manager.get_today_tasks()
-        logging.info(f"今日共有{len(tasks)}个任务")
+        logger.info("今日共有%s个任务", len(tasks))
     
+    @perf.timed("reminder.check")
     def _check_reminders(self):
         upcoming_tasks = self.schedule_manager.get_upcoming_reminders(minutes=30)
         
         for task in upcoming_tasks:
             self.reminder_signal.emit(task)
-            logging.info(f"发出提醒: {task['title']}")
+            logger.info("发出提醒: %s", task['title'])
     
     def add_one_time_reminder(self, task_id, minutes_before=15):
         task = self.schedule_manager.get_task(task_id)
         if not task:
-            logging.warning(f"未找到ID为{task_id}的任务")
+            logger.warning("未找到ID为%s的任务", task_id)
             return False
             
         if not task.get("due_date"):
-            logging.warning(f"任务'{task['title']}'没有截止日期")
+            logger.warning("任务'%s'没有截止日期", task['title'])
             return False
             
         self.schedule_manager.update_task(task_id, reminder_time=minutes_before)
-        logging.info(f"为任务'{task['title']}'添加了提前{minutes_before}分钟的提醒")
+        logger.info("为任务'%s'添加了提前%s分钟的提醒", task['title'], minutes_before)
         return True
     
     def remove_reminder(self, task_id):
         task = self.schedule_manager.get_task(task_id)
         if not task:
-            logging.warning(f"未找到ID为{task_id}的任务")
+            logger.warning("未找到ID为%s的任务", task_id)
             return False
             
         if not task.get("reminder_time"):
-            logging.warning(f"任务'{task['title']}'没有设置提醒")
+            logger.warning("任务'%s'没有设置提醒", task['title'])
             return False
             
         self.schedule_manager.update_task(task_id, reminder_time=None)
-        logging.info(f"移除了任务'{task['title']}'的提醒")
-        return True
\ No newline at end of file
+        logger.info("移除了任务'%s'的提醒", task['title'])
+        return True
+
+    def set_reminders(self, task_ids, minutes_before=15):
+        """
+        批量设置提醒, minutes_before 为 None 时移除提醒, 没有截止日期的任务不会设置提醒
+
+        Returns:
+            list: 实际修改的任务ID
+        """
+        if minutes_before is not None:
+            task_ids = [task_id for task_id in task_ids
+                        if (self.schedule_manager.get_task(task_id) or {}).get("due_date")]
+        changed = self.schedule_manager.update_tasks(task_ids, reminder_time=minutes_before)
+        if minutes_before is None:
+            logger.info("移除了%s个任务的提醒", len(changed))
+        else:
+            logger.info("为%s个任务设置了提前%s分钟的提醒", len(changed), minutes_before)
+        return changed
\ No newline at end of file
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+提醒记录
+
+记录每个任务每次提醒(键为 任务ID|提醒对应的时间)的状态, 重启后不会重复提醒,
+也能找出程序关闭期间错过的提醒。文件格式:
+
+    {"last_check": "2025-04-16 09:00:00",
+     "entries": {"<任务ID>|2025-04-16 10:00": {"state": "fired", "at": "...", "until": "..."}}}
+
+state 为 "fired"(已送达)、"snoozed"(推迟到 until)或 "missed"(已在补发汇总中提示)。
+超过 RETENTION 的记录在加载和保存时丢弃, 文件大小只与近期的提醒数量有关。
+"""
+
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+
+from persistence import atomic_write
+
+logger = logging.getLogger(__name__)
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+RETENTION = timedelta(days=2)
+
+FIRED = "fired"
+SNOOZED = "snoozed"
+MISSED = "missed"
+
+
+def ledger_key(key):
+    task_id, occurrence = key
+    return f"{task_id}|{occurrence}"
+
+
+class ReminderLedger:
+
+    def __init__(self, path):
+        self.path = path
+        self.last_check = None
+        self.entries = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("last_check"):
+                self.last_check = datetime.strptime(data["last_check"], TIME_FORMAT)
+            cutoff = (datetime.now() - RETENTION).strftime(TIME_FORMAT)
+            self.entries = {key: entry for key, entry in data.get("entries", {}).items()
+                            if entry.get("state") == SNOOZED or entry.get("at", "") >= cutoff}
+        except Exception as e:
+            logger.error("读取提醒记录出错: %s", e)
+            self.last_check = None
+            self.entries = {}
+
+    def save(self):
+        data = {
+            "last_check": self.last_check.strftime(TIME_FORMAT) if self.last_check else None,
+            "entries": self.entries,
+        }
+        try:
+            atomic_write(self.path, json.dumps(data, ensure_ascii=False).encode("utf-8"))
+        except Exception as e:
+            logger.error("保存提醒记录出错: %s", e)
+
+    def state(self, key):
+        entry = self.entries.get(ledger_key(key))
+        return entry["state"] if entry else None
+
+    def mark(self, keys, state, until=None, save=True):
+        now = datetime.now().strftime(TIME_FORMAT)
+        for key in keys:
+            entry = {"state": state, "at": now}
+            if until is not None:
+                entry["until"] = until.strftime(TIME_FORMAT)
+            self.entries[ledger_key(key)] = entry
+        if save:
+            self.save()
+
+    def snoozed(self):
+        """
+        Returns:
+            list: [(任务ID, 提醒时间, 推迟到的时间), ...]
+        """
+        result = []
+        for key, entry in self.entries.items():
+            if entry["state"] == SNOOZED and entry.get("until"):
+                task_id, _, occurrence = key.partition("|")
+                result.append((task_id, occurrence, datetime.strptime(entry["until"], TIME_FORMAT)))
+        return result
+
+    def touch(self, now=None, save=True):
+        """记录最近一次检查提醒的时间, 下次启动时从这里开始查找错过的提醒"""
+        self.last_check = now or datetime.now()
+        cutoff = (self.last_check - RETENTION).strftime(TIME_FORMAT)
+        self.entries = {key: entry for key, entry in self.entries.items()
+                        if entry["state"] == SNOOZED or entry["at"] >= cutoff}
+        if save:
+            self.save()
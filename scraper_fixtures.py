@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+爬虫的录制与回放
+
+录制时把爬取过程中每个文档和 XHR 请求的响应按 URL 保存到 gzip 压缩的 JSON 文件;
+回放时拦截页面请求, 直接返回录制的响应, 不在文件中的请求一律中止, 不需要网络和账号
+(仍需要本机的 Chrome)。可以离线测试列表解析、文件夹递归和截止时间解析, 也可以比较
+爬虫改动前后的耗时:
+
+    python SCRAPER.py --record fixtures/course.json.gz
+    python SCRAPER.py --replay fixtures/course.json.gz
+
+文件格式:
+
+    {"version": 1, "recorded_at": "...", "home_url": "<课程列表页>",
+     "pages": {"<URL>": {"status": 200, "content_type": "text/html", "body": "..."},
+               "<URL>": {"status": 302, "location": "<URL>"}}}
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+FIXTURE_VERSION = 1
+RECORDED_TYPES = ("document", "xhr", "fetch")
+
+
+class FixtureBundle:
+
+    def __init__(self, path):
+        self.path = path
+        self.pages = {}
+        self.home_url = None
+        self.recorded_at = None
+
+    @classmethod
+    def load(cls, path):
+        bundle = cls(path)
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != FIXTURE_VERSION:
+            raise ValueError(f"不支持的录制文件版本: {data.get('version')}")
+        bundle.pages = data["pages"]
+        bundle.home_url = data.get("home_url")
+        bundle.recorded_at = data.get("recorded_at")
+        return bundle
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        data = {
+            "version": FIXTURE_VERSION,
+            "recorded_at": self.recorded_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "home_url": self.home_url,
+            "pages": self.pages,
+        }
+        with gzip.open(self.path, "wt", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+
+    def get(self, url):
+        return self.pages.get(url)
+
+    def put(self, url, status, content_type=None, body=None, location=None):
+        entry = {"status": status}
+        if location is not None:
+            entry["location"] = location
+        else:
+            entry["content_type"] = content_type or "text/html"
+            entry["body"] = body or ""
+        self.pages[url] = entry
+
+
+class FixtureRecorder:
+    """监听页面响应, 把文档和 XHR 响应写入 bundle"""
+
+    replaying = False
+
+    def __init__(self, path):
+        self.bundle = FixtureBundle(path)
+        self._pending = set()
+
+    async def attach(self, page):
+        page.on("response", self._on_response)
+
+    def _on_response(self, response):
+        future = asyncio.ensure_future(self._record(response))
+        self._pending.add(future)
+        future.add_done_callback(self._pending.discard)
+
+    async def _record(self, response):
+        if response.request.resourceType not in RECORDED_TYPES:
+            return
+        status = response.status
+        headers = response.headers
+        try:
+            if 300 <= status < 400:
+                self.bundle.put(response.url, status, location=headers.get("location"))
+            else:
+                self.bundle.put(response.url, status, headers.get("content-type"), await response.text())
+        except Exception as e:
+            logger.debug("录制 %s 出错: %s", response.url, e)
+
+    async def finish(self):
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        self.bundle.save()
+        logger.info("录制了 %s 个页面, 保存到 %s", len(self.bundle.pages), self.bundle.path)
+
+
+class FixtureReplayer:
+    """拦截页面请求, 用 bundle 中录制的响应回答"""
+
+    replaying = True
+
+    def __init__(self, path):
+        self.bundle = FixtureBundle.load(path)
+        self.hits = 0
+        self.misses = 0
+
+    async def attach(self, page):
+        await page.setRequestInterception(True)
+        page.on("request", lambda request: asyncio.ensure_future(self._handle(request)))
+
+    async def _handle(self, request):
+        entry = self.bundle.get(request.url)
+        try:
+            if entry is None:
+                self.misses += 1
+                await request.abort()
+            elif "location" in entry:
+                self.hits += 1
+                await request.respond({"status": entry["status"], "headers": {"location": entry["location"]}})
+            else:
+                self.hits += 1
+                await request.respond({"status": entry["status"], "contentType": entry["content_type"],
+                                       "body": entry["body"]})
+        except Exception as e:
+            logger.debug("回放 %s 出错: %s", request.url, e)
+
+    async def finish(self):
+        logger.info("回放: 命中 %s 个请求, %s 个请求不在录制文件中", self.hits, self.misses)
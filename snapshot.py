@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+任务数据的二进制快照格式
+
+文件结构(小端):
+    MAGIC(8字节) | 版本(H) | 标志(H) | 任务数(I) | 正文
+正文(标志含 FLAG_ZLIB 时整体 zlib 压缩):
+    列数(H), 然后每列: 名称长度(H) 名称 | 类型(1字节) | 数据长度(I) 数据
+
+列类型:
+    D  字典编码: JSON 值表 + 每行一个下标(array 'H' 或 'I'), 用于类别、优先级、日期等取值有限的字段
+    S  文本: 以 \\0 分隔的 UTF-8 文本, 外加为 None 的行号
+    J  每行一个 JSON 值, 用于无法字典编码的字段
+    X  稀疏字段: JSON [行号列表, 值列表], 用于不是所有任务都有的字段
+"""
+
+import json
+import struct
+import sys
+import zlib
+from array import array
+from operator import itemgetter
+
+MAGIC = b"SCHSNAP\x00"
+VERSION = 1
+FLAG_ZLIB = 1
+
+_HEADER = struct.Struct("<8sHHI")
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+
+TEXT_FIELDS = ("id", "title", "description", "created_at")
+DICT_FIELDS = ("category", "priority", "due_date", "start_time", "end_time",
+               "repeat", "reminder_time", "completed")
+FIELD_ORDER = ("id", "title", "description", "category", "priority", "due_date",
+               "start_time", "end_time", "repeat", "reminder_time", "completed", "created_at")
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def is_snapshot(head):
+    return head[:len(MAGIC)] == MAGIC
+
+
+def _encode_text(values):
+    if None in values:
+        nulls = array("I", (i for i, v in enumerate(values) if v is None))
+        values = ["" if v is None else v for v in values]
+    else:
+        nulls = array("I")
+    body = "\0".join(values)
+    if body.count("\0") != len(values) - 1:
+        raise ValueError
+    body = body.encode("utf-8")
+    return _U32.pack(len(nulls)) + nulls.tobytes() + body
+
+
+def _decode_text(data, count):
+    (null_count,) = _U32.unpack_from(data)
+    offset = _U32.size + null_count * 4
+    nulls = array("I")
+    nulls.frombytes(data[_U32.size:offset])
+    values = data[offset:].decode("utf-8").split("\0") if count else []
+    for i in nulls:
+        values[i] = None
+    return values
+
+
+def _encode_dict(values):
+    # True、1 和 1.0 在字典里是同一个键, 必须在去重之前按原始值检查类型
+    numeric = set(map(type, values)) & {bool, int, float}
+    if len(numeric) > 1:
+        # 这种少见情况改用 (类型, 值) 区分
+        table = {}
+        keys = []
+        indexes = []
+        for value in values:
+            key = (type(value), value)
+            index = table.get(key)
+            if index is None:
+                index = table[key] = len(keys)
+                keys.append(value)
+            indexes.append(index)
+    else:
+        keys = list(dict.fromkeys(values))
+        table = {key: i for i, key in enumerate(keys)}
+        indexes = map(table.__getitem__, values)
+    typecode = "H" if len(keys) <= 0xFFFF else "I"
+    table_bytes = json.dumps(keys, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return (_U32.pack(len(table_bytes)) + table_bytes + typecode.encode("ascii")
+            + array(typecode, indexes).tobytes())
+
+
+def _decode_dict(data, count):
+    (table_len,) = _U32.unpack_from(data)
+    start = _U32.size
+    keys = json.loads(data[start:start + table_len].decode("utf-8"))
+    typecode = chr(data[start + table_len])
+    indexes = array(typecode)
+    indexes.frombytes(data[start + table_len + 1:])
+    return list(map(keys.__getitem__, indexes))
+
+
+def _encode_json(values):
+    return json.dumps(values, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _decode_json(data, count):
+    return json.loads(data.decode("utf-8"))
+
+
+_DECODERS = {b"S": _decode_text, b"D": _decode_dict, b"J": _decode_json, b"X": _decode_json}
+
+
+def dumps(tasks, compress=True):
+    """把任务列表编码为快照字节串"""
+    count = len(tasks)
+    columns = []
+    seen = set().union(*tasks)
+
+    # 所有任务都有的标准字段按列保存
+    common = [key for key in FIELD_ORDER if key in seen]
+    try:
+        rows = list(map(itemgetter(*common), tasks)) if common else []
+    except KeyError:
+        common = [key for key in common if all(key in task for task in tasks)]
+        rows = list(map(itemgetter(*common), tasks)) if common else []
+    if len(common) == 1:
+        rows = [(value,) for value in rows]
+    column_values = list(zip(*rows)) if rows else [() for _ in common]
+
+    for key, values in zip(common, column_values):
+        seen.discard(key)
+        try:
+            if key in TEXT_FIELDS:
+                columns.append((key, b"S", _encode_text(values)))
+            else:
+                columns.append((key, b"D", _encode_dict(values)))
+        except (ValueError, TypeError):
+            columns.append((key, b"J", _encode_json(values)))
+
+    # 其余字段(包括部分任务缺失的标准字段)按行保存, 缺失的记为不存在
+    for key in sorted(seen):
+        rows = {i: task[key] for i, task in enumerate(tasks) if key in task}
+        columns.append((key, b"X", _encode_json([list(rows), list(rows.values())])))
+
+    parts = [_U16.pack(len(columns))]
+    for name, kind, data in columns:
+        name_bytes = name.encode("utf-8")
+        parts.append(_U16.pack(len(name_bytes)) + name_bytes + kind + _U32.pack(len(data)))
+        parts.append(data)
+    body = b"".join(parts)
+    flags = 0
+    if compress:
+        body = zlib.compress(body, 1)
+        flags |= FLAG_ZLIB
+    return _HEADER.pack(MAGIC, VERSION, flags, count) + body
+
+
+def _row_builder(names):
+    """
+    生成把一行各列的值组装成任务字典的函数
+
+    字典字面量由解释器一次建好, 比 dict(zip(names, row)) 快约一半, 是读取大文件时的
+    主要开销。生成的代码中只有编号, 列名作为变量传入。
+    """
+    params = ", ".join(f"v{i}" for i in range(len(names)))
+    items = ", ".join(f"k{i}: v{i}" for i in range(len(names)))
+    namespace = {f"k{i}": name for i, name in enumerate(names)}
+    return eval(f"lambda {params}: {{{items}}}", namespace)
+
+
+def loads(data):
+    """把快照字节串解码为任务列表"""
+    if len(data) < _HEADER.size or not is_snapshot(data):
+        raise SnapshotError("不是有效的任务快照文件")
+    _, version, flags, count = _HEADER.unpack_from(data)
+    if version > VERSION:
+        raise SnapshotError(f"不支持的快照版本: {version}")
+    body = data[_HEADER.size:]
+    if flags & FLAG_ZLIB:
+        body = zlib.decompress(body)
+    body = memoryview(body)
+
+    (column_count,) = _U16.unpack_from(body)
+    offset = _U16.size
+    names = []
+    values = []
+    sparse = []
+    for _ in range(column_count):
+        (name_len,) = _U16.unpack_from(body, offset)
+        offset += _U16.size
+        name = bytes(body[offset:offset + name_len]).decode("utf-8")
+        offset += name_len
+        kind = bytes(body[offset:offset + 1])
+        offset += 1
+        (data_len,) = _U32.unpack_from(body, offset)
+        offset += _U32.size
+        chunk = bytes(body[offset:offset + data_len])
+        offset += data_len
+        decoder = _DECODERS.get(kind)
+        if decoder is None:
+            raise SnapshotError(f"未知的列类型: {kind!r}")
+        column = decoder(chunk, count)
+        if kind == b"X":
+            sparse.append((name, column))
+        else:
+            names.append(name)
+            values.append(column)
+
+    if values:
+        tasks = list(map(_row_builder(names), *values))
+    else:
+        tasks = [{} for _ in range(count)]
+    for name, (rows, row_values) in sparse:
+        for i, value in zip(rows, row_values):
+            tasks[i][name] = value
+    return tasks
+
+
+def load_file(filename):
+    """读取任务文件, 根据文件头自动识别快照或JSON"""
+    with open(filename, "rb") as f:
+        data = f.read()
+    if is_snapshot(data):
+        return loads(data)
+    return json.loads(data.decode("utf-8"))
+
+
+def json_to_snapshot(src, dst, compress=True):
+    tasks = load_file(src)
+    with open(dst, "wb") as f:
+        f.write(dumps(tasks, compress=compress))
+    return len(tasks)
+
+
+def snapshot_to_json(src, dst):
+    tasks = load_file(src)
+    with open(dst, "w", encoding="utf-8") as f:
+        json.dump(tasks, f, ensure_ascii=False, indent=2)
+    return len(tasks)
+
+
+if __name__ == "__main__":
+    # python snapshot.py to-snapshot data/tasks.json data/tasks.snap
+    # python snapshot.py to-json data/tasks.snap data/tasks.json
+    if len(sys.argv) != 4 or sys.argv[1] not in ("to-snapshot", "to-json"):
+        print("用法: python snapshot.py to-snapshot|to-json 源文件 目标文件")
+        sys.exit(1)
+    convert = json_to_snapshot if sys.argv[1] == "to-snapshot" else snapshot_to_json
+    print(f"已转换 {convert(sys.argv[2], sys.argv[3])} 个任务")
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+任务列表的排序索引
+
+每个任务在加入索引时计算一次各列的排序键(都是整数, 标题除外), 排序时不再解析日期和
+时间, 也不按字符串比较"高/中/低"。每一列的有序任务列表在第一次按该列排序时建立, 之后
+随任务增删用二分查找插入或删除, 不需要整体重新排序。大批量导入等操作后索引标记为
+过期, 下次排序时只为替换过的任务重新计算排序键, 新任务在用到某一列时才合并进这一列
+的有序列表。相同的键再按截止时间、创建时间、任务ID排列, 结果是确定的。
+"""
+
+from bisect import bisect_left, bisect_right
+from datetime import date
+
+from timeline import parse_minutes, MINUTES_PER_DAY
+
+SORT_COLUMNS = ("title", "category", "priority", "due", "status", "created")
+_COLUMN_INDEX = {column: i for i, column in enumerate(SORT_COLUMNS)}
+_DUE = _COLUMN_INDEX["due"]
+_CREATED = _COLUMN_INDEX["created"]
+
+# 日期无效的任务排在最后
+INVALID_DUE = date.max.toordinal() * MINUTES_PER_DAY + MINUTES_PER_DAY
+
+_TIME_SEPARATORS = str.maketrans("", "", "-: ")
+
+
+def due_key(task):
+    """截止日期和开始时间折算成分钟数, 没有时间的任务排在当天定时任务之后"""
+    try:
+        day = date.fromisoformat(task["due_date"]).toordinal()
+    except (KeyError, TypeError, ValueError):
+        return INVALID_DUE
+    minutes = parse_minutes(task.get("start_time"))
+    return day * MINUTES_PER_DAY + (MINUTES_PER_DAY if minutes is None else minutes)
+
+
+def created_key(task):
+    """创建时间转成整数, 如 "2025-04-16 09:00:00" -> 20250416090000"""
+    try:
+        return int((task.get("created_at") or "").translate(_TIME_SEPARATORS))
+    except ValueError:
+        return 0
+
+
+class _ColumnOrder:
+    """
+    一列的有序列表: entries 为 (键, 截止时间, 创建时间, 任务ID), tasks 为对应的任务
+
+    索引重建后的变化先记在 added/dropped 中, 下次按这一列排序时再合并。
+    """
+
+    __slots__ = ("entries", "tasks", "added", "dropped")
+
+    def __init__(self, entries, tasks):
+        self.entries = entries
+        self.tasks = tasks
+        # 待合并的 (任务, 排序键), 合并时跳过已被替换或删除的
+        self.added = []
+        # entries 中需要去掉的任务ID
+        self.dropped = set()
+
+
+class TaskSortIndex:
+
+    # 待合并的任务不超过这么多时逐个二分插入, 否则整体合并
+    INSORT_LIMIT = 64
+
+    def __init__(self, priority_rank, categories):
+        self.priority_rank = priority_rank
+        self.category_rank = {category: i for i, category in enumerate(categories)}
+        # 任务ID -> (任务, 按 SORT_COLUMNS 顺序的排序键)
+        self.keys = {}
+        # 列名 -> _ColumnOrder, 按需建立
+        self._orders = {}
+        self._stale = True
+
+    @property
+    def ready(self):
+        return not self._stale
+
+    def __len__(self):
+        return len(self.keys)
+
+    def sort_keys(self, task):
+        return (
+            (task.get("title") or "").casefold(),
+            self.category_rank.get(task.get("category"), len(self.category_rank)),
+            # 高优先级排在前面
+            -self.priority_rank.get(task.get("priority"), 0),
+            due_key(task),
+            1 if task.get("completed") else 0,
+            created_key(task),
+        )
+
+    @staticmethod
+    def _entry(column, task_id, keys):
+        return (keys[_COLUMN_INDEX[column]], keys[_DUE], keys[_CREATED], task_id)
+
+    def invalidate(self):
+        """任务大批量变化, 下次排序前调用 rebuild"""
+        self._stale = True
+
+    def rebuild(self, tasks):
+        """按当前任务列表更新索引, 任务字典没有替换过的任务沿用原来的排序键"""
+        old_keys = self.keys
+        keys = {}
+        added = []
+        for task in tasks:
+            cached = old_keys.get(task["id"])
+            if cached is None or cached[0] is not task:
+                cached = (task, self.sort_keys(task))
+                added.append(cached)
+            keys[task["id"]] = cached
+        if len(keys) - len(added) == len(old_keys):
+            dropped = set()
+        else:
+            dropped = {task_id for task_id, cached in old_keys.items() if keys.get(task_id) is not cached}
+        self.keys = keys
+        self._stale = False
+        for column, order in list(self._orders.items()):
+            if len(order.added) + len(added) > len(keys) // 2:
+                # 变化太多, 下次用到时重新排序
+                del self._orders[column]
+                continue
+            order.added.extend(added)
+            order.dropped |= dropped
+
+    def add(self, task):
+        if self._stale:
+            return
+        task_id = task["id"]
+        if task_id in self.keys:
+            self.remove(task_id)
+        cached = self.keys[task_id] = (task, self.sort_keys(task))
+        for column, order in self._orders.items():
+            if order.added or order.dropped:
+                order.added.append(cached)
+                continue
+            entry = self._entry(column, task_id, cached[1])
+            i = bisect_right(order.entries, entry)
+            order.entries.insert(i, entry)
+            order.tasks.insert(i, task)
+
+    def remove(self, task_id):
+        if self._stale:
+            return
+        cached = self.keys.pop(task_id, None)
+        if cached is None:
+            return
+        for column, order in self._orders.items():
+            if order.added or order.dropped:
+                order.dropped.add(task_id)
+                continue
+            entry = self._entry(column, task_id, cached[1])
+            i = bisect_left(order.entries, entry)
+            if i < len(order.entries) and order.entries[i] == entry:
+                del order.entries[i]
+                del order.tasks[i]
+
+    def _merge(self, column, order):
+        keys = self.keys
+        added = [self._entry(column, task["id"], task_keys) for task, task_keys in
+                 (cached for cached in order.added if keys.get(cached[0]["id"]) is cached)]
+        entries = order.entries
+        if order.dropped:
+            dropped = order.dropped
+            entries = [entry for entry in entries if entry[-1] not in dropped]
+        if len(added) <= self.INSORT_LIMIT and entries is order.entries:
+            for entry in added:
+                i = bisect_right(entries, entry)
+                entries.insert(i, entry)
+                order.tasks.insert(i, keys[entry[-1]][0])
+        else:
+            # 原有部分已经有序, Timsort 合并两段有序序列只需线性时间
+            added.sort()
+            entries.extend(added)
+            entries.sort()
+            order.entries = entries
+            order.tasks = [keys[entry[-1]][0] for entry in entries]
+        order.added = []
+        order.dropped = set()
+
+    def ordered(self, column):
+        """按 column 升序排列的任务, 调用方不能修改返回的列表; 需要先 rebuild"""
+        order = self._orders.get(column)
+        if order is None:
+            keys = self.keys
+            entries = sorted(self._entry(column, task_id, task_keys) for task_id, (_, task_keys) in keys.items())
+            order = self._orders[column] = _ColumnOrder(entries, [keys[entry[-1]][0] for entry in entries])
+        elif order.added or order.dropped:
+            self._merge(column, order)
+        return order.tasks
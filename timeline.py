@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import heapq
+from datetime import date
+
+MINUTES_PER_DAY = 24 * 60
+DEFAULT_DURATION = 60
+
+
+def parse_minutes(value):
+    """把 "HH:MM" 转成当天的分钟数, 格式不对时返回None"""
+    if not value or len(value) != 5 or value[2] != ":":
+        return None
+    try:
+        hour = int(value[:2])
+        minute = int(value[3:])
+    except ValueError:
+        return None
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        return None
+    return hour * 60 + minute
+
+
+def task_day(task):
+    """返回任务截止日期的序数(date.toordinal), 日期无效时返回None"""
+    try:
+        return date.fromisoformat(task["due_date"]).toordinal()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def task_interval(task):
+    """
+    计算任务在当天占用的时间段
+
+    Returns:
+        (start, end) 分钟数; 没有开始时间的任务返回None
+    """
+    start = parse_minutes(task.get("start_time"))
+    if start is None:
+        return None
+    end = parse_minutes(task.get("end_time"))
+    if end is None:
+        end = min(start + DEFAULT_DURATION, MINUTES_PER_DAY)
+    elif end <= start:
+        end = MINUTES_PER_DAY
+    return start, end
+
+
+class TimelineBlock:
+
+    __slots__ = ("task_id", "start", "end", "column", "columns")
+
+    def __init__(self, task_id, start, end, column=0, columns=1):
+        self.task_id = task_id
+        self.start = start
+        self.end = end
+        self.column = column
+        self.columns = columns
+
+
+def pack_intervals(intervals):
+    """
+    扫描线算法: 把互相重叠的时间段分配到不同的列
+
+    Args:
+        intervals: [(start, end, task_id), ...]
+
+    Returns:
+        list: 簇列表, 每个簇是一组连续重叠的 TimelineBlock, 簇内所有块的 columns 相同
+    """
+    clusters = []
+    cluster = []
+    cluster_end = -1
+    active = []
+    free_columns = []
+    next_column = 0
+
+    for start, end, task_id in sorted(intervals):
+        if cluster and start >= cluster_end:
+            for block in cluster:
+                block.columns = next_column
+            clusters.append(cluster)
+            cluster, active, free_columns, next_column = [], [], [], 0
+
+        while active and active[0][0] <= start:
+            heapq.heappush(free_columns, heapq.heappop(active)[1])
+
+        if free_columns:
+            column = heapq.heappop(free_columns)
+        else:
+            column = next_column
+            next_column += 1
+
+        heapq.heappush(active, (end, column))
+        cluster_end = max(cluster_end, end) if cluster else end
+        cluster.append(TimelineBlock(task_id, start, end, column))
+
+    if cluster:
+        for block in cluster:
+            block.columns = next_column
+        clusters.append(cluster)
+    return clusters
+
+
+class DayLayout:
+    """
+    某一天的时间轴布局
+
+    任务变化时只重新排布与其新旧时间段相交的簇, 其余簇保持不变。
+    """
+
+    def __init__(self, tasks=()):
+        self.intervals = {}
+        self.clusters = []
+        self.all_day = []
+        intervals = []
+        for task in tasks:
+            interval = task_interval(task)
+            if interval is None:
+                self.all_day.append(task["id"])
+            else:
+                self.intervals[task["id"]] = interval
+                intervals.append((interval[0], interval[1], task["id"]))
+        self.clusters = pack_intervals(intervals)
+
+    def blocks(self):
+        for cluster in self.clusters:
+            yield from cluster
+
+    def update_task(self, task_id, task=None):
+        """
+        更新单个任务的位置
+
+        Args:
+            task_id: 任务ID
+            task: 任务数据, 为None表示该任务已不在这一天
+        """
+        if task_id in self.all_day:
+            self.all_day.remove(task_id)
+        old = self.intervals.pop(task_id, None)
+        new = task_interval(task) if task is not None else None
+        if task is not None and new is None:
+            self.all_day.append(task_id)
+        if old is None and new is None:
+            return
+
+        touched = set()
+        for index, cluster in enumerate(self.clusters):
+            first = cluster[0].start
+            last = max(block.end for block in cluster)
+            for interval in (old, new):
+                if interval and interval[0] < last and first < interval[1]:
+                    touched.add(index)
+                    break
+
+        intervals = []
+        for index in touched:
+            for block in self.clusters[index]:
+                if block.task_id != task_id:
+                    intervals.append((block.start, block.end, block.task_id))
+        if new is not None:
+            self.intervals[task_id] = new
+            intervals.append((new[0], new[1], task_id))
+
+        kept = [cluster for index, cluster in enumerate(self.clusters) if index not in touched]
+        self.clusters = sorted(kept + pack_intervals(intervals), key=lambda c: c[0].start)
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+运行在 Qt 事件循环上的统一定时服务
+
+所有定时任务(提醒检查、跨天处理、宠物掉血等)共用一个 QTimer, 每次只等待到最早的
+任务到期, 回调都在主线程执行, 与界面对任务数据的修改不会并发。
+
+两类任务:
+    every(seconds, ...)   按单调时钟计时的周期任务, 不受系统时间调整影响
+    at(when, ...)/daily() 按墙上时间触发的任务, 每次唤醒时与当前时间比较
+
+单次等待不超过 MAX_SLEEP 秒。每次唤醒比较墙上时间与单调时钟的流逝, 相差超过
+JUMP_THRESHOLD 秒时视为系统时间被调整或从休眠中恢复: 发出 clock_changed,
+周期任务立即执行一次; 时间向前跳过的墙上时间任务只补执行一次; 每日任务按新的时间
+重新计算下一次到期时间, 时间往回调时不会等到原来那个已经推迟了的时刻。
+"""
+
+import logging
+import time
+from datetime import datetime, timedelta
+
+from PySide6.QtCore import QObject, Qt, QTimer, Signal
+
+logger = logging.getLogger(__name__)
+
+MAX_SLEEP = 60
+JUMP_THRESHOLD = 10
+
+
+class TimerJob:
+
+    __slots__ = ("name", "callback", "interval", "due", "wall_due", "daily_time")
+
+    def __init__(self, name, callback, interval=None, due=None, wall_due=None, daily_time=None):
+        self.name = name
+        self.callback = callback
+        self.interval = interval
+        # 周期任务的到期时间(time.monotonic)
+        self.due = due
+        # 墙上时间任务的到期时间(datetime)
+        self.wall_due = wall_due
+        self.daily_time = daily_time
+
+
+def next_daily(daily_time, now):
+    """now 之后下一次到达 daily_time(datetime.time) 的时间"""
+    candidate = datetime.combine(now.date(), daily_time)
+    if candidate <= now:
+        candidate = datetime.combine(now.date() + timedelta(days=1), daily_time)
+    return candidate
+
+
+class TimerService(QObject):
+    # 墙上时间相对单调时钟的跳变(秒), 包括系统时间调整和休眠恢复
+    clock_changed = Signal(float)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._jobs = []
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(Qt.PreciseTimer)
+        self._timer.timeout.connect(self._wake)
+        self._last_wall = datetime.now()
+        self._last_monotonic = time.monotonic()
+
+    def every(self, seconds, callback, name=None, delay=None):
+        """每隔 seconds 秒执行一次, 第一次在 delay 秒后(默认 seconds 秒后)"""
+        job = TimerJob(name or callback.__name__, callback, interval=seconds,
+                       due=time.monotonic() + (seconds if delay is None else delay))
+        return self._add(job)
+
+    def at(self, when, callback, name=None):
+        """在墙上时间 when 执行一次"""
+        return self._add(TimerJob(name or callback.__name__, callback, wall_due=when))
+
+    def daily(self, daily_time, callback, name=None):
+        """每天在 daily_time(datetime.time 或 "HH:MM")执行"""
+        if isinstance(daily_time, str):
+            daily_time = datetime.strptime(daily_time, "%H:%M").time()
+        job = TimerJob(name or callback.__name__, callback,
+                       wall_due=next_daily(daily_time, datetime.now()), daily_time=daily_time)
+        return self._add(job)
+
+    def cancel(self, job):
+        if job in self._jobs:
+            self._jobs.remove(job)
+            self._arm()
+
+    def _add(self, job):
+        self._jobs.append(job)
+        self._arm()
+        return job
+
+    def _arm(self):
+        if not self._jobs:
+            self._timer.stop()
+            return
+        now = datetime.now()
+        monotonic = time.monotonic()
+        delay = MAX_SLEEP
+        for job in self._jobs:
+            if job.due is not None:
+                delay = min(delay, job.due - monotonic)
+            else:
+                delay = min(delay, (job.wall_due - now).total_seconds())
+        self._timer.start(max(0, int(delay * 1000)))
+
+    def _check_clock(self, now, monotonic):
+        drift = (now - self._last_wall).total_seconds() - (monotonic - self._last_monotonic)
+        self._last_wall = now
+        self._last_monotonic = monotonic
+        if abs(drift) < JUMP_THRESHOLD:
+            return False
+        logger.info("检测到系统时间变化或休眠恢复, 偏移 %.0f 秒", drift)
+        for job in self._jobs:
+            if job.due is not None:
+                job.due = monotonic
+            elif job.daily_time is not None and job.wall_due > now:
+                # 已错过的留给本次唤醒补执行, 执行后再计算下一次
+                job.wall_due = next_daily(job.daily_time, now)
+        self.clock_changed.emit(drift)
+        return True
+
+    def _wake(self):
+        now = datetime.now()
+        monotonic = time.monotonic()
+        self._check_clock(now, monotonic)
+
+        for job in list(self._jobs):
+            if job.due is not None:
+                if job.due > monotonic:
+                    continue
+                # 不补执行错过的周期, 从现在开始重新计时
+                job.due = monotonic + job.interval
+            else:
+                if job.wall_due > now:
+                    continue
+                if job.daily_time is not None:
+                    job.wall_due = next_daily(job.daily_time, now)
+                else:
+                    self._jobs.remove(job)
+            try:
+                job.callback()
+            except Exception as e:
+                logger.error("定时任务%s出错: %s", job.name, e)
+        self._arm()
+
+
+_service = None
+
+
+def get_timer_service():
+    """全局定时服务, 需在创建 QApplication 之后调用"""
+    global _service
+    if _service is None:
+        _service = TimerService()
+    return _service
@@ -2,9 +2,9 @@
 # -*- coding: utf-8 -*-
 
 import os
+import html
 import logging
 import sys
-import logging
 from datetime import datetime, timedelta
 from PySide6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
@@ -12,27 +12,57 @@ from PySide6.QtWidgets import (
     QMessageBox, QTabWidget, QScrollArea, QCalendarWidget, QDialog,
     QGridLayout, QSpinBox, QCheckBox, QTableWidget, QTableWidgetItem,
     QHeaderView, QSplitter, QFrame, QApplication, QStyle, QMenu,
-    QInputDialog, QFileDialog, QToolBar, QSizePolicy
+    QInputDialog, QFileDialog, QToolBar, QSizePolicy, QToolTip, QTreeWidget, QTreeWidgetItem
 )
-from PySide6.QtCore import Qt, QDate, QTime, QDateTime, Slot, QSize, QRect, Signal
-from PySide6.QtGui import QIcon, QColor, QPalette, QFont, QAction, QPainter, QPen, QBrush
-from my_schedule import Schedule
+from PySide6.QtCore import Qt, QDate, QTime, QDateTime, Slot, QSize, QRect, Signal, QTimer, QEvent
+from PySide6.QtGui import QIcon, QColor, QPalette, QFont, QAction, QPainter, QPen, QBrush, QShortcut, QKeySequence
+from my_schedule import Schedule, task_day
 from reminder import Reminder
 from pet_engine import PetState, DesktopPet
+from profiler import perf
 
 import pandas as pd
 from openpyxl import Workbook
 from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-import json
+from collections import OrderedDict
+from timeline import DayLayout
+from view_cache import PeriodCache
+from app_config import load_config, save_config
+from notifications import NotificationCenter, NotificationPanel
+from reminder_ledger import ReminderLedger
+from timer_service import get_timer_service
+from course_catalog import CourseCatalog
+import ics_io
+
+logger = logging.getLogger(__name__)
+
+
+# QDate.toJulianDay() 与 date.toordinal() 之差
+JULIAN_DAY_OFFSET = 1721425
+
+
+def shortcut_text(key):
+    """标准快捷键在当前平台上的写法, 如重做在 Windows 上是 Ctrl+Y, 在 Linux 上是 Ctrl+Shift+Z"""
+    return QKeySequence(key).toString(QKeySequence.NativeText)
 
 
 class CustomCalendarWidget(QCalendarWidget):
+
+    # 按未完成任务的最高优先级着色, 0 表示当天任务都已完成
+    HEAT_COLORS = {
+        3: QColor(239, 83, 80),
+        2: QColor(255, 167, 38),
+        1: QColor(66, 165, 245),
+        0: QColor(102, 187, 106)
+    }
+    OVERDUE_COLOR = QColor(198, 40, 40)
     
     def __init__(self, parent=None, schedule_manager=None):
         super().__init__(parent)
         self.schedule_manager = schedule_manager
-        self.dates_with_tasks = set()  
         self.initUI()
+        if self.schedule_manager:
+            self.schedule_manager.add_listener(self.on_schedule_changed)
         
     def initUI(self):
         
@@ -75,54 +105,50 @@ class CustomCalendarWidget(QCalendarWidget):
         self.setWeekdayTextFormat(Qt.Saturday, self.weekdayTextFormat(Qt.Monday))
         self.setWeekdayTextFormat(Qt.Sunday, self.weekdayTextFormat(Qt.Monday))
         
-    def update_dates_with_tasks(self):
+    def on_schedule_changed(self, event):
         
-        if not self.schedule_manager:
+        if not event.days:
+            self.updateCells()
             return
-            
-        year = self.yearShown()
-        month = self.monthShown()
-        first_day = QDate(year, month, 1)
-        last_day = QDate(year, month, first_day.daysInMonth())
-        
-        from_date = first_day.toString("yyyy-MM-dd")
-        to_date = last_day.toString("yyyy-MM-dd")
-        tasks = self.schedule_manager.get_tasks(from_date=from_date, to_date=to_date)
-        
-        self.dates_with_tasks.clear()
-        for task in tasks:
-            try:
-                task_date = QDate.fromString(task["due_date"], "yyyy-MM-dd")
-                self.dates_with_tasks.add(task_date.toString("yyyy-MM-dd"))
-            except Exception:
-                continue
-                
-        self.updateCells()
-        
+        for day in event.days:
+            self.updateCell(QDate.fromJulianDay(day + JULIAN_DAY_OFFSET))
+
+    @perf.timed("view.calendar_cell")
     def paintCell(self, painter, rect, date):
         
         super().paintCell(painter, rect, date)
         
-        if date.toString("yyyy-MM-dd") in self.dates_with_tasks:
-            painter.save()
-            painter.setPen(Qt.NoPen)
-            painter.setBrush(QColor(217, 232, 252))  
-            painter.setOpacity(0.6)  
-            painter.drawRect(rect)
-            painter.restore()
+        if not self.schedule_manager:
+            return
+        stats = self.schedule_manager.day_stats.get(date.toJulianDay() - JULIAN_DAY_OFFSET)
+        if stats is None:
+            return
+
+        painter.save()
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(self.HEAT_COLORS[stats.max_priority])
+        painter.setOpacity(0.15 + 0.1 * min(stats.total, 5))
+        painter.drawRect(rect)
+        if stats.overdue:
+            painter.setOpacity(1.0)
+            painter.setBrush(self.OVERDUE_COLOR)
+            painter.drawEllipse(rect.right() - 9, rect.top() + 3, 6, 6)
+        painter.restore()
 
 class TaskDialog(QDialog):
     
-    def __init__(self, parent=None, task=None):
+    def __init__(self, parent=None, task=None, schedule_manager=None):
         """
         初始化任务对话框
         
         Args:
             parent: 父窗口
             task: 如果是编辑现有任务，传入任务数据
+            schedule_manager: 传入时会在编辑时间时提示冲突和空闲时段
         """
         super().__init__(parent)
         self.task = task
+        self.schedule_manager = schedule_manager
         self.init_ui()
         
     def init_ui(self):
@@ -178,6 +204,12 @@ class TaskDialog(QDialog):
         self.end_time_input.setTime(QTime(10, 0))
         form_layout.addWidget(self.end_time_label, 6, 0)
         form_layout.addWidget(self.end_time_input, 6, 1)
+
+        self.slot_hint_label = QLabel()
+        self.slot_hint_label.setWordWrap(True)
+        self.slot_hint_label.setTextFormat(Qt.RichText)
+        self.slot_hint_label.linkActivated.connect(self.apply_free_slot)
+        form_layout.addWidget(self.slot_hint_label, 9, 0, 1, 2)
         
         self.repeat_label = QLabel("重复:")
         self.repeat_input = QComboBox()
@@ -216,6 +248,57 @@ class TaskDialog(QDialog):
         
         if self.task:
             self.fill_form_data()
+
+        if self.schedule_manager:
+            self.due_date_input.dateChanged.connect(self.update_slot_hint)
+            self.start_time_input.timeChanged.connect(self.update_slot_hint)
+            self.end_time_input.timeChanged.connect(self.update_slot_hint)
+            self.update_slot_hint()
+        else:
+            self.slot_hint_label.setVisible(False)
+
+    def update_slot_hint(self):
+        
+        due_date = self.due_date_input.date().toString("yyyy-MM-dd")
+        start_time = self.start_time_input.time()
+        end_time = self.end_time_input.time()
+        exclude_id = self.task["id"] if self.task else None
+
+        conflicts = self.schedule_manager.find_conflicts(
+            due_date, start_time.toString("HH:mm"), end_time.toString("HH:mm"), exclude_id=exclude_id
+        )
+        if not conflicts:
+            self.slot_hint_label.setText("<span style='color: green;'>该时间段没有冲突</span>")
+            return
+
+        names = "、".join(
+            f"{html.escape(task['title'])} ({task['start_time']}-{task.get('end_time') or ''})" for task in conflicts[:3]
+        )
+        if len(conflicts) > 3:
+            names += f" 等{len(conflicts)}个任务"
+        text = f"<span style='color: red;'>与 {names} 时间冲突</span>"
+
+        duration = start_time.secsTo(end_time) // 60
+        if duration <= 0:
+            duration = 60
+        not_before = datetime.now() if due_date == datetime.now().strftime("%Y-%m-%d") else None
+        slots = self.schedule_manager.find_free_slots(
+            duration, due_date, count=3, exclude_id=exclude_id, not_before=not_before
+        )
+        if slots:
+            links = "  ".join(
+                f"<a href='{day} {start} {end}'>{day[5:]} {start}-{end}</a>" for day, start, end in slots
+            )
+            text += f"<br>可选空闲时段: {links}"
+        self.slot_hint_label.setText(text)
+
+    def apply_free_slot(self, link):
+        
+        day, start, end = link.split()
+        self.due_date_input.setDate(QDate.fromString(day, "yyyy-MM-dd"))
+        self.start_time_input.setTime(QTime.fromString(start, "HH:mm"))
+        if end != "24:00":
+            self.end_time_input.setTime(QTime.fromString(end, "HH:mm"))
     
     def fill_form_data(self):
         
@@ -267,9 +350,16 @@ class TaskDialog(QDialog):
 
 
 class TaskTableWidget(QTableWidget):
+
+    # 各列的排序键(见 sort_index.SORT_COLUMNS), "日期"和"时间"两列都按截止时间排序
+    SORT_KEYS = ("title", "category", "priority", "due", "due", "status")
+
+    sort_changed = Signal()
     
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.sort_section = -1
+        self.sort_order = Qt.AscendingOrder
         self.init_ui()
     
     def init_ui(self):
@@ -280,7 +370,7 @@ class TaskTableWidget(QTableWidget):
         self.setAlternatingRowColors(True)
         self.setEditTriggers(QTableWidget.NoEditTriggers)  
         self.setSelectionBehavior(QTableWidget.SelectRows)  
-        self.setSelectionMode(QTableWidget.SingleSelection)  
+        self.setSelectionMode(QTableWidget.ExtendedSelection)
         self.verticalHeader().setVisible(False)  
         
         self.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
@@ -289,6 +379,32 @@ class TaskTableWidget(QTableWidget):
         self.horizontalHeader().setSectionResizeMode(3, QHeaderView.ResizeToContents)
         self.horizontalHeader().setSectionResizeMode(4, QHeaderView.ResizeToContents)
         self.horizontalHeader().setSectionResizeMode(5, QHeaderView.ResizeToContents)
+
+    def enable_sorting(self):
+        """点击表头按列排序, 同一列点击第三次恢复按创建时间排列"""
+        header = self.horizontalHeader()
+        header.setSectionsClickable(True)
+        header.setSortIndicatorShown(True)
+        header.setSortIndicator(-1, Qt.AscendingOrder)
+        header.sectionClicked.connect(self.on_header_clicked)
+
+    def on_header_clicked(self, section):
+        if section != self.sort_section:
+            self.sort_section = section
+            self.sort_order = Qt.AscendingOrder
+        elif self.sort_order == Qt.AscendingOrder:
+            self.sort_order = Qt.DescendingOrder
+        else:
+            self.sort_section = -1
+            self.sort_order = Qt.AscendingOrder
+        self.horizontalHeader().setSortIndicator(self.sort_section, self.sort_order)
+        self.sort_changed.emit()
+
+    def sort_key(self):
+        """返回 (排序列名, 是否降序), 没有选择列时按创建时间"""
+        if self.sort_section < 0:
+            return "created", False
+        return self.SORT_KEYS[self.sort_section], self.sort_order == Qt.DescendingOrder
     
     def update_tasks(self, tasks):
         
@@ -330,6 +446,11 @@ class TaskTableWidget(QTableWidget):
                 item = self.item(row_position, col)
                 item.setData(Qt.UserRole, task["id"])
 
+    def selected_task_ids(self):
+        """按行顺序返回选中的任务ID"""
+        rows = sorted({index.row() for index in self.selectionModel().selectedRows()})
+        return [self.item(row, 0).data(Qt.UserRole) for row in rows]
+
 
 class CalendarViewWidget(QWidget):
     
@@ -337,6 +458,7 @@ class CalendarViewWidget(QWidget):
         super().__init__(parent)
         self.schedule_manager = schedule_manager
         self.main_window = main_window
+        self.period_cache = PeriodCache(schedule_manager, max_periods=6)
         self.init_ui()
     
     def init_ui(self):
@@ -385,8 +507,7 @@ class CalendarViewWidget(QWidget):
         self.setLayout(main_layout)
         
         self.update_day_tasks()
-        
-        self.calendar.update_dates_with_tasks()
+        self.prefetch_adjacent_months(self.calendar.yearShown(), self.calendar.monthShown())
 
     def edit_task(self, item):
         
@@ -399,7 +520,7 @@ class CalendarViewWidget(QWidget):
             QMessageBox.warning(self, "错误", "无法找到该任务")
             return
         
-        dialog = TaskDialog(self, task)
+        dialog = TaskDialog(self, task, schedule_manager=self.schedule_manager)
         result = dialog.exec_()
         
         if result == QDialog.Accepted:
@@ -418,10 +539,25 @@ class CalendarViewWidget(QWidget):
                        "七月", "八月", "九月", "十月", "十一月", "十二月"]
         self.month_title.setText(f"{current_year}年 {month_names[current_month-1]}")
     
+    def month_period(self, year, month):
+        
+        first_day = QDate(year, month, 1)
+        return first_day.toJulianDay() - JULIAN_DAY_OFFSET, first_day.daysInMonth()
+
     def on_month_changed(self, year, month):
         
         self.update_month_title()
-        self.calendar.update_dates_with_tasks()
+        self.prefetch_adjacent_months(year, month)
+
+    def prefetch_adjacent_months(self, year, month):
+        
+        prev_month = QDate(year, month, 1).addMonths(-1)
+        next_month = QDate(year, month, 1).addMonths(1)
+        self.period_cache.prefetch(
+            self.month_period(year, month),
+            self.month_period(prev_month.year(), prev_month.month()),
+            self.month_period(next_month.year(), next_month.month())
+        )
     
     def show_prev_month(self):
         
@@ -435,14 +571,17 @@ class CalendarViewWidget(QWidget):
         
         self.update_day_tasks()
     
+    @perf.timed("view.calendar_day_tasks")
     def update_day_tasks(self):
         
         if not self.schedule_manager:
             return
         
-        selected_date = self.calendar.selectedDate().toString("yyyy-MM-dd")
+        selected = self.calendar.selectedDate()
+        selected_date = selected.toString("yyyy-MM-dd")
         
-        tasks = self.schedule_manager.get_tasks(from_date=selected_date, to_date=selected_date)
+        start_day, length = self.month_period(selected.year(), selected.month())
+        tasks = self.period_cache.get(start_day, length)[selected.day() - 1]
         
         self.task_label.setText(f"{selected_date} 任务清单 ({len(tasks)})")
         
@@ -458,6 +597,7 @@ class WeekViewWidget(QWidget):
             now.year, now.month, now.day, 0, 0, 0
         ) - timedelta(days=now.weekday())
         self.main_window = main_window
+        self.period_cache = PeriodCache(schedule_manager, max_periods=12)
         self.init_ui()
     
     def init_ui(self):
@@ -485,46 +625,15 @@ class WeekViewWidget(QWidget):
         
         main_layout.addLayout(nav_layout)
         
-        self.week_grid = QGridLayout()
-        self.week_grid.setSpacing(10)
-        
-        day_labels = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
-        for i, day in enumerate(day_labels):
-            label = QLabel(day)
-            label.setAlignment(Qt.AlignCenter)
-            label.setStyleSheet("font-weight: bold; padding: 5px; background-color: #E3F2FD; border-radius: 4px;")
-            self.week_grid.addWidget(label, 0, i)
-        
-        self.day_task_lists = []
-        
-        for i in range(7):
-            date_label = QLabel()
-            date_label.setAlignment(Qt.AlignCenter)
-            date_label.setStyleSheet("padding: 3px; font-weight: bold;")
-            self.week_grid.addWidget(date_label, 1, i)
-            
-            task_list = QTableWidget()
-            task_list.setColumnCount(1)
-            task_list.setHorizontalHeaderLabels(["任务"])
-            
-            task_list.setSelectionBehavior(QTableWidget.SelectRows)
-            task_list.setEditTriggers(QTableWidget.NoEditTriggers)
-            task_list.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
-            task_list.verticalHeader().setVisible(False)
-            task_list.setStyleSheet("QTableWidget { border: 1px solid #E0E0E0; }")
-            
-            task_list.setContextMenuPolicy(Qt.CustomContextMenu)
-            task_list.customContextMenuRequested.connect(self.show_context_menu)
-            
-            task_list.itemDoubleClicked.connect(self.edit_task)
-            
-            self.week_grid.addWidget(task_list, 2, i)
-            
-            self.day_task_lists.append((date_label, task_list))
-        
-        self.week_grid.setRowStretch(2, 1)  
-        
-        main_layout.addLayout(self.week_grid)
+        self.timeline = WeekTimelineWidget()
+        self.timeline.task_clicked.connect(self.show_task_detail)
+        self.timeline.task_double_clicked.connect(self.edit_task_by_id)
+        self.timeline.customContextMenuRequested.connect(self.show_context_menu)
+
+        self.timeline_scroll = QScrollArea()
+        self.timeline_scroll.setWidgetResizable(True)
+        self.timeline_scroll.setWidget(self.timeline)
+        main_layout.addWidget(self.timeline_scroll, 1)
         
         task_detail_layout = QVBoxLayout()
         
@@ -544,10 +653,8 @@ class WeekViewWidget(QWidget):
         self.setLayout(main_layout)
         
         self.update_week_view()
-        
-        for _, task_list in self.day_task_lists:
-            task_list.itemClicked.connect(self.show_task_detail)
 
+    @perf.timed("view.week")
     def update_week_view(self):
         
         week_end = self.current_week_start + timedelta(days=6)
@@ -555,76 +662,18 @@ class WeekViewWidget(QWidget):
             f"{self.current_week_start.strftime('%Y.%m.%d')} - {week_end.strftime('%Y.%m.%d')}"
         )
         
-        start_date = self.current_week_start.strftime("%Y-%m-%d")
-        end_date = week_end.strftime("%Y-%m-%d")
+        start_day = self.current_week_start.toordinal()
+        self.timeline.set_week(start_day, self.period_cache.get(start_day, 7))
+        self.period_cache.prefetch((start_day - 7, 7), (start_day + 7, 7))
         
-        tasks = self.schedule_manager.get_tasks(from_date=start_date, to_date=end_date)
+    def edit_task_by_id(self, task_id):
         
-        daily_tasks = {i: [] for i in range(7)}
-        
-        for task in tasks:
-            try:
-                task_date = datetime.strptime(task["due_date"], "%Y-%m-%d")
-                
-                task_date_only = task_date.date()
-                current_week_start_date_only = self.current_week_start.date()
-                delta_days = (task_date_only - current_week_start_date_only).days
-                
-                if 0 <= delta_days < 7:
-                    daily_tasks[delta_days].append(task)
-            except Exception as e:
-                logging.error(f"在周视图中处理任务时出错: {e}")
-        
-        for day, (date_label, task_list) in enumerate(self.day_task_lists):
-            day_date = self.current_week_start + timedelta(days=day)
-            date_label.setText(day_date.strftime("%m-%d"))
-            
-            task_list.setRowCount(0)
-            day_tasks = daily_tasks[day]
-            
-            for task in day_tasks:
-                row = task_list.rowCount()
-                task_list.insertRow(row)
-                
-                title_item = QTableWidgetItem(task["title"])
-                
-                if task["completed"]:
-                    title_item.setForeground(QColor("green"))
-                else:
-                    if task["priority"] == Schedule.HIGH:
-                        title_item.setForeground(QColor("red"))
-                    elif task["priority"] == Schedule.MEDIUM:
-                        title_item.setForeground(QColor("orange"))
-                    else:
-                        title_item.setForeground(QColor("blue"))
-                
-                if task.get("start_time"):
-                    time_info = task["start_time"]
-                    if task.get("end_time"):
-                        time_info += f" - {task['end_time']}"
-                    title_item.setToolTip(f"{time_info}\n{task.get('description', '')}")
-                
-                title_item.setData(Qt.UserRole, task["id"])
-                
-                task_list.setItem(row, 0, title_item)
-            
-            for row in range(task_list.rowCount()):
-                task_list.setRowHeight(row, 25)
-        
-        self.repaint()
-        
-    def edit_task(self, item):
-        
-        task_id = item.data(Qt.UserRole)
-        if not task_id:
-            return
-            
         task = self.schedule_manager.get_task(task_id)
         if not task:
             QMessageBox.warning(self, "错误", "无法找到该任务")
             return
         
-        dialog = TaskDialog(self, task)
+        dialog = TaskDialog(self, task, schedule_manager=self.schedule_manager)
         result = dialog.exec_()
         
         if result == QDialog.Accepted:
@@ -646,13 +695,7 @@ class WeekViewWidget(QWidget):
     
     def show_context_menu(self, position):
         
-        sender = self.sender()
-        item = sender.itemAt(position)
-        
-        if not item or not item.text():
-            return
-            
-        task_id = item.data(Qt.UserRole)
+        task_id = self.timeline.task_at(position) or self.timeline.pick_hidden_task(position)
         if not task_id:
             return
             
@@ -663,22 +706,21 @@ class WeekViewWidget(QWidget):
         context_menu = QMenu(self)
         
         view_action = context_menu.addAction("查看任务详情")
+        edit_action = context_menu.addAction("编辑任务")
         mark_action = context_menu.addAction("标记为" + ("未完成" if task["completed"] else "已完成"))
         
-        action = context_menu.exec_(sender.mapToGlobal(position))
+        action = context_menu.exec_(self.timeline.mapToGlobal(position))
         
         if action == view_action:
             self.show_task_details(task)
+        elif action == edit_action:
+            self.edit_task_by_id(task_id)
         elif action == mark_action:
             self.schedule_manager.mark_completed(task_id, not task["completed"])
             self.update_week_view()
     
-    def show_task_detail(self, item):
+    def show_task_detail(self, task_id):
         
-        task_id = item.data(Qt.UserRole)
-        if not task_id:
-            return
-            
         task = self.schedule_manager.get_task(task_id)
         if not task:
             return
@@ -713,13 +755,366 @@ class WeekViewWidget(QWidget):
         msg.setText(details)
         msg.exec_()
 
+class DayTimelineWidget(QWidget):
+    """日视图的时间轴, 按 DayLayout 的分列结果绘制任务块"""
+
+    task_double_clicked = Signal(str)
+
+    HOUR_HEIGHT = 48
+    LABEL_WIDTH = 52
+    HOUR_LABELS = [f"{hour:02d}:00" for hour in range(24)]
+
+    BLOCK_COLORS = {
+        Schedule.HIGH: (QColor(255, 205, 210), QColor("red")),
+        Schedule.MEDIUM: (QColor(255, 224, 178), QColor("orange")),
+        Schedule.LOW: (QColor(187, 222, 251), QColor("blue"))
+    }
+    COMPLETED_COLORS = (QColor(200, 230, 201), QColor("green"))
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.day_layout = None
+        self.tasks_by_id = {}
+        self.setMinimumHeight(24 * self.HOUR_HEIGHT)
+        self.setMinimumWidth(240)
+
+    def set_layout(self, day_layout, tasks_by_id):
+        self.day_layout = day_layout
+        self.tasks_by_id = tasks_by_id
+        self.update()
+
+    def block_rect(self, block):
+        
+        column_width = (self.width() - self.LABEL_WIDTH - 4) / block.columns
+        x = self.LABEL_WIDTH + column_width * block.column
+        y = block.start * self.HOUR_HEIGHT / 60
+        height = max((block.end - block.start) * self.HOUR_HEIGHT / 60, 14)
+        return QRect(int(x) + 1, int(y) + 1, int(column_width) - 2, int(height) - 2)
+
+    def block_at(self, pos):
+        
+        if self.day_layout is None:
+            return None
+        for block in self.day_layout.blocks():
+            if self.block_rect(block).contains(pos):
+                return block
+        return None
+
+    @perf.timed("view.day_timeline_paint")
+    def paintEvent(self, event):
+        
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor(255, 255, 255))
+
+        painter.setPen(QColor(224, 224, 224))
+        for hour in range(24):
+            y = hour * self.HOUR_HEIGHT
+            painter.drawLine(self.LABEL_WIDTH, y, self.width(), y)
+        painter.setPen(QColor(117, 117, 117))
+        for hour, label in enumerate(self.HOUR_LABELS):
+            painter.drawText(QRect(0, hour * self.HOUR_HEIGHT, self.LABEL_WIDTH - 6, 16),
+                             Qt.AlignRight | Qt.AlignTop, label)
+
+        if self.day_layout is None:
+            return
+
+        for block in self.day_layout.blocks():
+            task = self.tasks_by_id.get(block.task_id)
+            if task is None:
+                continue
+            if task["completed"]:
+                fill, border = self.COMPLETED_COLORS
+            else:
+                fill, border = self.BLOCK_COLORS.get(task["priority"], self.BLOCK_COLORS[Schedule.LOW])
+            rect = self.block_rect(block)
+            painter.setBrush(fill)
+            painter.setPen(border)
+            painter.drawRoundedRect(rect, 3, 3)
+            painter.setPen(QColor(33, 33, 33))
+            text_rect = rect.adjusted(4, 1, -2, -1)
+            painter.drawText(text_rect, Qt.AlignLeft | Qt.AlignTop,
+                             painter.fontMetrics().elidedText(task["title"], Qt.ElideRight, text_rect.width()))
+
+    def mouseDoubleClickEvent(self, event):
+        
+        block = self.block_at(event.position().toPoint())
+        if block is not None:
+            self.task_double_clicked.emit(block.task_id)
+
+    def event(self, event):
+        
+        if event.type() == QEvent.ToolTip:
+            block = self.block_at(event.pos())
+            task = self.tasks_by_id.get(block.task_id) if block else None
+            if task:
+                time_info = task["start_time"]
+                if task.get("end_time"):
+                    time_info += f" - {task['end_time']}"
+                QToolTip.showText(event.globalPos(), f"{task['title']}\n{time_info}", self)
+            else:
+                QToolTip.hideText()
+            return True
+        return super().event(event)
+
+
+class WeekTimelineWidget(QWidget):
+    """
+    周视图的时间网格, 7 天 × 24 小时, 顶部是日期和全天任务
+
+    每天的 DayLayout 和任务块位置按 PeriodCache 的分桶缓存, 分桶对象不变的日期
+    不重新计算; 绘制时直接使用缓存的位置, 点击/双击/右键通过 task_at() 找到任务。
+    全天任务超过 MAX_ALL_DAY_ROWS 行时显示"还有 N 个", 点击后从菜单中选择被隐藏的任务。
+    """
+
+    task_clicked = Signal(str)
+    task_double_clicked = Signal(str)
+
+    LABEL_WIDTH = 44
+    HEADER_HEIGHT = 36
+    ALL_DAY_ROW_HEIGHT = 18
+    MAX_ALL_DAY_ROWS = 4
+    MIN_HOUR_HEIGHT = 20
+    MIN_COLUMN_WIDTH = 60
+    DAY_NAMES = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.start_day = None
+        self.buckets = [None] * 7
+        self.layouts = [None] * 7
+        self.day_tasks = [{} for _ in range(7)]
+        self.all_day_rows = 0
+        self.selected_task_id = None
+        # 每天的 [(QRect, 任务ID, 文字), ...], None 表示需要重新计算
+        self._items = [None] * 7
+        # 每天的"还有 N 个": (QRect, [被隐藏的任务ID]), 与 _items 一起计算
+        self._overflow = [None] * 7
+        self.setMinimumHeight(self.HEADER_HEIGHT + 24 * self.MIN_HOUR_HEIGHT)
+        self.setMinimumWidth(self.LABEL_WIDTH + 7 * self.MIN_COLUMN_WIDTH)
+        self.setContextMenuPolicy(Qt.CustomContextMenu)
+
+    def set_week(self, start_day, buckets):
+        """
+        Args:
+            start_day: 周一的日期序数
+            buckets: 7 天的任务列表, 与上次相同的列表对象视为没有变化
+        """
+        if start_day != self.start_day:
+            self.start_day = start_day
+            self.buckets = [None] * 7
+        changed = False
+        for day, bucket in enumerate(buckets):
+            if self.buckets[day] is bucket:
+                continue
+            self.buckets[day] = bucket
+            self.layouts[day] = DayLayout(bucket)
+            self.day_tasks[day] = {task["id"]: task for task in bucket}
+            self._items[day] = None
+            changed = True
+        if not changed:
+            return
+        rows = min(max(len(layout.all_day) for layout in self.layouts), self.MAX_ALL_DAY_ROWS)
+        if rows != self.all_day_rows:
+            # 全天任务区的高度变化会移动所有时间块
+            self.all_day_rows = rows
+            self._items = [None] * 7
+        perf.count("view.week_days_rebuilt", sum(item is None for item in self._items))
+        self.update()
+
+    def body_top(self):
+        return self.HEADER_HEIGHT + self.all_day_rows * self.ALL_DAY_ROW_HEIGHT + (2 if self.all_day_rows else 0)
+
+    def hour_height(self):
+        return max(self.MIN_HOUR_HEIGHT, (self.height() - self.body_top()) / 24)
+
+    def column_width(self):
+        return (self.width() - self.LABEL_WIDTH) / 7
+
+    def day_items(self, day):
+        items = self._items[day]
+        if items is not None:
+            return items
+        items = []
+        self._overflow[day] = None
+        layout = self.layouts[day]
+        if layout is not None:
+            tasks = self.day_tasks[day]
+            column_width = self.column_width()
+            x = self.LABEL_WIDTH + column_width * day
+            all_day = layout.all_day
+            shown = all_day if len(all_day) <= self.all_day_rows else all_day[:self.all_day_rows - 1]
+            for row, task_id in enumerate(shown):
+                rect = QRect(int(x) + 2, self.HEADER_HEIGHT + row * self.ALL_DAY_ROW_HEIGHT + 1,
+                             int(column_width) - 4, self.ALL_DAY_ROW_HEIGHT - 2)
+                items.append((rect, task_id, tasks[task_id]["title"]))
+            if len(shown) < len(all_day):
+                rect = QRect(int(x) + 2, self.HEADER_HEIGHT + len(shown) * self.ALL_DAY_ROW_HEIGHT + 1,
+                             int(column_width) - 4, self.ALL_DAY_ROW_HEIGHT - 2)
+                items.append((rect, None, f"还有 {len(all_day) - len(shown)} 个"))
+                self._overflow[day] = (rect, all_day[len(shown):])
+
+            top = self.body_top()
+            hour_height = self.hour_height()
+            for block in layout.blocks():
+                block_width = (column_width - 4) / block.columns
+                y = top + block.start * hour_height / 60
+                height = max((block.end - block.start) * hour_height / 60, 14)
+                rect = QRect(int(x + 2 + block_width * block.column) + 1, int(y) + 1,
+                             int(block_width) - 2, int(height) - 2)
+                items.append((rect, block.task_id, tasks[block.task_id]["title"]))
+        self._items[day] = items
+        return items
+
+    def item_at(self, pos):
+        
+        column_width = self.column_width()
+        if pos.x() < self.LABEL_WIDTH or column_width <= 0:
+            return None, None
+        day = int((pos.x() - self.LABEL_WIDTH) / column_width)
+        if not 0 <= day < 7:
+            return None, None
+        # 后绘制的块在上面, 倒序查找
+        for rect, task_id, _ in reversed(self.day_items(day)):
+            if task_id is not None and rect.contains(pos):
+                return day, task_id
+        return day, None
+
+    def task_at(self, pos):
+        return self.item_at(pos)[1]
+
+    def hidden_tasks_at(self, pos):
+        """pos 落在"还有 N 个"上时返回被隐藏的任务, 否则返回空列表"""
+        day, task_id = self.item_at(pos)
+        if day is None or task_id is not None:
+            return []
+        self.day_items(day)
+        overflow = self._overflow[day]
+        if overflow is None or not overflow[0].contains(pos):
+            return []
+        tasks = self.day_tasks[day]
+        return [tasks[hidden_id] for hidden_id in overflow[1]]
+
+    def pick_hidden_task(self, pos):
+        """在"还有 N 个"处弹出被隐藏任务的菜单, 返回选中的任务ID"""
+        hidden = self.hidden_tasks_at(pos)
+        if not hidden:
+            return None
+        menu = QMenu(self)
+        for task in hidden:
+            action = menu.addAction(task["title"])
+            action.setData(task["id"])
+        action = menu.exec_(self.mapToGlobal(pos))
+        return action.data() if action is not None else None
+
+    def resizeEvent(self, event):
+        self._items = [None] * 7
+        super().resizeEvent(event)
+
+    @perf.timed("view.week_paint")
+    def paintEvent(self, event):
+        
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor(255, 255, 255))
+        column_width = self.column_width()
+        top = self.body_top()
+        hour_height = self.hour_height()
+        today = datetime.now().toordinal()
+
+        # 日期表头
+        for day in range(7):
+            x = int(self.LABEL_WIDTH + column_width * day)
+            header = QRect(x + 1, 1, int(column_width) - 2, self.HEADER_HEIGHT - 2)
+            is_today = self.start_day is not None and self.start_day + day == today
+            painter.fillRect(header, QColor(187, 222, 251) if is_today else QColor(227, 242, 253))
+            painter.setPen(QColor(33, 33, 33))
+            label = self.DAY_NAMES[day]
+            if self.start_day is not None:
+                label += " " + datetime.fromordinal(self.start_day + day).strftime("%m-%d")
+            painter.drawText(header, Qt.AlignCenter, label)
+
+        # 时间网格
+        painter.setPen(QColor(224, 224, 224))
+        for hour in range(25):
+            y = int(top + hour * hour_height)
+            painter.drawLine(self.LABEL_WIDTH, y, self.width(), y)
+        for day in range(8):
+            x = int(self.LABEL_WIDTH + column_width * day)
+            painter.drawLine(x, self.HEADER_HEIGHT, x, self.height())
+        painter.setPen(QColor(117, 117, 117))
+        for hour, label in enumerate(DayTimelineWidget.HOUR_LABELS):
+            painter.drawText(QRect(0, int(top + hour * hour_height), self.LABEL_WIDTH - 6, 16),
+                             Qt.AlignRight | Qt.AlignTop, label)
+
+        metrics = painter.fontMetrics()
+        for day in range(7):
+            tasks = self.day_tasks[day]
+            for rect, task_id, text in self.day_items(day):
+                task = tasks.get(task_id)
+                if task is None:
+                    painter.setPen(QColor(117, 117, 117))
+                    painter.drawText(rect.adjusted(4, 0, -2, 0), Qt.AlignLeft | Qt.AlignVCenter, text)
+                    continue
+                if task["completed"]:
+                    fill, border = DayTimelineWidget.COMPLETED_COLORS
+                else:
+                    fill, border = DayTimelineWidget.BLOCK_COLORS.get(
+                        task["priority"], DayTimelineWidget.BLOCK_COLORS[Schedule.LOW])
+                painter.setBrush(fill)
+                painter.setPen(QPen(border, 2 if task_id == self.selected_task_id else 1))
+                painter.drawRoundedRect(rect, 3, 3)
+                painter.setPen(QColor(33, 33, 33))
+                text_rect = rect.adjusted(4, 1, -2, -1)
+                painter.drawText(text_rect, Qt.AlignLeft | Qt.AlignTop,
+                                 metrics.elidedText(text, Qt.ElideRight, text_rect.width()))
+
+    def mousePressEvent(self, event):
+        
+        if event.button() == Qt.LeftButton:
+            pos = event.position().toPoint()
+            task_id = self.task_at(pos) or self.pick_hidden_task(pos)
+            if task_id != self.selected_task_id:
+                self.selected_task_id = task_id
+                self.update()
+            if task_id is not None:
+                self.task_clicked.emit(task_id)
+        super().mousePressEvent(event)
+
+    def mouseDoubleClickEvent(self, event):
+        
+        task_id = self.task_at(event.position().toPoint())
+        if task_id is not None:
+            self.task_double_clicked.emit(task_id)
+
+    def event(self, event):
+        
+        if event.type() == QEvent.ToolTip:
+            day, task_id = self.item_at(event.pos())
+            task = self.day_tasks[day].get(task_id) if task_id else None
+            hidden = self.hidden_tasks_at(event.pos()) if task is None else []
+            if hidden:
+                QToolTip.showText(event.globalPos(), "\n".join(task["title"] for task in hidden), self)
+            elif task:
+                time_info = task.get("start_time") or "全天"
+                if task.get("end_time"):
+                    time_info += f" - {task['end_time']}"
+                QToolTip.showText(event.globalPos(), f"{task['title']}\n{time_info}\n{task.get('description') or ''}", self)
+            else:
+                QToolTip.hideText()
+            return True
+        return super().event(event)
+
+
 class DayViewWidget(QWidget):
+
+    LAYOUT_CACHE_SIZE = 31
     
     def __init__(self, parent=None, schedule_manager=None,main_window=None):
         super().__init__(parent)
         self.schedule_manager = schedule_manager
         self.current_date = datetime.now()
         self.main_window = main_window
+        self.layout_cache = OrderedDict()
+        self.schedule_manager.add_listener(self.on_schedule_changed)
         self.init_ui()
     
     def init_ui(self):
@@ -777,23 +1172,19 @@ class DayViewWidget(QWidget):
         time_slots_label.setStyleSheet("font-weight: bold; font-size: 11pt;")
         time_slots_layout.addWidget(time_slots_label)
         
-        self.time_slots_table = QTableWidget()
-        self.time_slots_table.setColumnCount(2)  
-        self.time_slots_table.setHorizontalHeaderLabels(["时间", "任务"])
-        
-        self.time_slots_table.setRowCount(24)
-        for hour in range(24):
-            time_item = QTableWidgetItem(f"{hour:02d}:00")
-            time_item.setTextAlignment(Qt.AlignCenter)
-            self.time_slots_table.setItem(hour, 0, time_item)
-        
-        self.time_slots_table.setEditTriggers(QTableWidget.NoEditTriggers)  
-        self.time_slots_table.setSelectionBehavior(QTableWidget.SelectRows)  
-        self.time_slots_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeToContents)
-        self.time_slots_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
-        self.time_slots_table.setShowGrid(True)
-        
-        time_slots_layout.addWidget(self.time_slots_table)
+        self.all_day_label = QLabel()
+        self.all_day_label.setWordWrap(True)
+        self.all_day_label.setVisible(False)
+        time_slots_layout.addWidget(self.all_day_label)
+
+        self.timeline = DayTimelineWidget()
+        self.timeline.task_double_clicked.connect(self.edit_task_by_id)
+
+        self.timeline_scroll = QScrollArea()
+        self.timeline_scroll.setWidgetResizable(True)
+        self.timeline_scroll.setWidget(self.timeline)
+        self.timeline_scroll.verticalScrollBar().setValue(8 * DayTimelineWidget.HOUR_HEIGHT)
+        time_slots_layout.addWidget(self.timeline_scroll)
         
         tasks_frame = QFrame()
         tasks_frame.setFrameShape(QFrame.StyledPanel)
@@ -821,7 +1212,10 @@ class DayViewWidget(QWidget):
 
     def edit_task(self, item):
         
-        task_id = item.data(Qt.UserRole)
+        self.edit_task_by_id(item.data(Qt.UserRole))
+
+    def edit_task_by_id(self, task_id):
+        
         if not task_id:
             return
             
@@ -830,7 +1224,7 @@ class DayViewWidget(QWidget):
             QMessageBox.warning(self, "错误", "无法找到该任务")
             return
         
-        dialog = TaskDialog(self, task)
+        dialog = TaskDialog(self, task, schedule_manager=self.schedule_manager)
         result = dialog.exec_()
         
         if result == QDialog.Accepted:
@@ -848,6 +1242,34 @@ class DayViewWidget(QWidget):
         self.current_date = selected_date
         self.update_day_view()
     
+    def on_schedule_changed(self, event):
+        
+        if not event.days:
+            self.layout_cache.clear()
+            return
+        for day in event.days:
+            layout = self.layout_cache.get(day)
+            if layout is None:
+                continue
+            for task_id in event.task_ids:
+                task = self.schedule_manager.get_task(task_id)
+                if task is not None and task_day(task) != day:
+                    task = None
+                layout.update_task(task_id, task)
+
+    def get_day_layout(self, day, tasks):
+        
+        layout = self.layout_cache.get(day)
+        if layout is None:
+            layout = DayLayout(tasks)
+            self.layout_cache[day] = layout
+            if len(self.layout_cache) > self.LAYOUT_CACHE_SIZE:
+                self.layout_cache.popitem(last=False)
+        else:
+            self.layout_cache.move_to_end(day)
+        return layout
+
+    @perf.timed("view.day")
     def update_day_view(self):
         
         self.date_selector.setDate(QDate(self.current_date.year, self.current_date.month, self.current_date.day))
@@ -860,98 +1282,16 @@ class DayViewWidget(QWidget):
             f"{self.current_date.strftime('%Y年%m月%d日')} {weekday_name}"
         )
         
-        for hour in range(24):
-            self.time_slots_table.setItem(hour, 1, QTableWidgetItem(""))
-            for col in range(2):
-                item = self.time_slots_table.item(hour, col)
-                if item:
-                    item.setBackground(QColor(255, 255, 255))
-        
         date_str = self.current_date.strftime("%Y-%m-%d")
-        tasks = self.schedule_manager.get_tasks(from_date=date_str, to_date=date_str)
-        
-        time_slots_with_tasks = set()
-        
-        for task in tasks:
-            if task.get("start_time") and task.get("end_time"):
-                try:
-                    start_hour = int(task["start_time"].split(":")[0])
-                    end_hour = int(task["end_time"].split(":")[0])
-                    
-                    if end_hour < start_hour:
-                        end_hour = 23
-                    
-                    if 0 <= start_hour < 24:
-                        time_slots_with_tasks.add(start_hour)
-                        
-                        current_item = self.time_slots_table.item(start_hour, 1)
-                        current_text = current_item.text() if current_item and current_item.text() else ""
-                        
-                        if current_text:
-                            new_text = f"{current_text}\n{task['title']}"
-                        else:
-                            new_text = task['title']
-                        
-                        task_item = QTableWidgetItem(new_text)
-                        
-                        if task["completed"]:
-                            task_item.setForeground(QColor("green"))
-                        else:
-                            if task["priority"] == Schedule.HIGH:
-                                task_item.setForeground(QColor("red"))
-                            elif task["priority"] == Schedule.MEDIUM:
-                                task_item.setForeground(QColor("orange"))
-                            else:
-                                task_item.setForeground(QColor("blue"))
-                        
-                        task_item.setData(Qt.UserRole, task["id"])
-                        
-                        self.time_slots_table.setItem(start_hour, 1, task_item)
-                    
-                    for hour in range(start_hour + 1, end_hour + 1):
-                        if 0 <= hour < 24:
-                            time_slots_with_tasks.add(hour)
-                            
-                except Exception as e:
-                    logging.error(f"在日视图中显示任务时出错: {e}")
-            elif task.get("start_time"):
-                try:
-                    start_hour = int(task["start_time"].split(":")[0])
-                    
-                    if 0 <= start_hour < 24:
-                        time_slots_with_tasks.add(start_hour)
-                        
-                        current_item = self.time_slots_table.item(start_hour, 1)
-                        current_text = current_item.text() if current_item and current_item.text() else ""
-                        
-                        if current_text:
-                            new_text = f"{current_text}\n{task['title']}"
-                        else:
-                            new_text = task['title']
-                        
-                        task_item = QTableWidgetItem(new_text)
-                        
-                        if task["completed"]:
-                            task_item.setForeground(QColor("green"))
-                        else:
-                            if task["priority"] == Schedule.HIGH:
-                                task_item.setForeground(QColor("red"))
-                            elif task["priority"] == Schedule.MEDIUM:
-                                task_item.setForeground(QColor("orange"))
-                            else:
-                                task_item.setForeground(QColor("blue"))
-                        
-                        task_item.setData(Qt.UserRole, task["id"])
-                        
-                        self.time_slots_table.setItem(start_hour, 1, task_item)
-                except Exception as e:
-                    logging.error(f"在日视图中显示任务时出错: {e}")
-
-        for hour in time_slots_with_tasks:
-            for col in range(2):
-                item = self.time_slots_table.item(hour, col)
-                if item:
-                    item.setBackground(QColor(217, 232, 252))  
+        tasks = self.schedule_manager.get_tasks(from_date=date_str, to_date=date_str, include_archive=True)
+        tasks_by_id = {task["id"]: task for task in tasks}
+
+        layout = self.get_day_layout(self.current_date.toordinal(), tasks)
+        self.timeline.set_layout(layout, tasks_by_id)
+
+        all_day_titles = [tasks_by_id[task_id]["title"] for task_id in layout.all_day if task_id in tasks_by_id]
+        self.all_day_label.setText("全天: " + "、".join(all_day_titles) if all_day_titles else "")
+        self.all_day_label.setVisible(bool(all_day_titles))
         
         self.task_table.update_tasks(tasks)
     
@@ -1035,7 +1375,7 @@ class ExcelExporter:
             return True
             
         except Exception as e:
-            logging.error(f"导出Excel时出错: {e}")
+            logger.error("导出Excel时出错: %s", e)
             return False
 
 
@@ -1068,6 +1408,29 @@ class SettingsDialog(QDialog):
         layout.addWidget(self.chrome_path_label)
         layout.addWidget(self.chrome_path_input)
 
+        # 导入的课程: 勾选整个学期时该学期以后新增的课程也会导入
+        self.catalog = CourseCatalog()
+        self.course_label = QLabel("导入的课程(不勾选时导入最新学期):")
+        self.course_tree = QTreeWidget()
+        self.course_tree.setHeaderHidden(True)
+        self.course_tree.setMinimumHeight(200)
+        layout.addWidget(self.course_label)
+        layout.addWidget(self.course_tree)
+
+        catalog_layout = QHBoxLayout()
+        if self.catalog.refreshed_at is not None:
+            refreshed = self.catalog.refreshed_at.strftime("%Y-%m-%d %H:%M")
+            self.catalog_info = QLabel(f"课程列表更新于 {refreshed}")
+        else:
+            self.catalog_info = QLabel("从网页导入一次后可以选择课程")
+        self.refresh_catalog_btn = QPushButton("下次导入时刷新课程列表")
+        self.refresh_catalog_btn.setEnabled(bool(self.catalog.courses) and not self.catalog.stale)
+        self.refresh_catalog_btn.clicked.connect(self.refresh_catalog)
+        catalog_layout.addWidget(self.catalog_info)
+        catalog_layout.addStretch()
+        catalog_layout.addWidget(self.refresh_catalog_btn)
+        layout.addLayout(catalog_layout)
+
         button_layout = QHBoxLayout()
         self.save_btn = QPushButton("保存")
         self.cancel_btn = QPushButton("取消")
@@ -1084,26 +1447,181 @@ class SettingsDialog(QDialog):
 
     def load_settings(self):
         
-        config_path = "config.json"
-        if os.path.exists(config_path):
-            with open(config_path, "r", encoding="utf-8") as f:
-                config = json.load(f)
-                self.student_id_input.setText(config.get("student_id", ""))
-                self.password_input.setText(config.get("password", ""))
-                self.chrome_path_input.setText(config.get("chrome_path", ""))
+        config = load_config()
+        self.student_id_input.setText(config.get("student_id", ""))
+        self.password_input.setText(config.get("password", ""))
+        self.chrome_path_input.setText(config.get("chrome_path", ""))
+        scraper_config = config.get("scraper", {})
+        self.load_courses(set(scraper_config.get("terms", [])), set(scraper_config.get("courses", [])))
+
+    def load_courses(self, terms, course_ids):
+        self.course_tree.clear()
+        for term in self.catalog.terms() + [None]:
+            courses = [course for course in self.catalog.courses if course["term"] == term]
+            if not courses:
+                continue
+            term_item = QTreeWidgetItem(self.course_tree, [term or "其他"])
+            term_item.setFlags(term_item.flags() | Qt.ItemIsUserCheckable | Qt.ItemIsAutoTristate)
+            for course in courses:
+                item = QTreeWidgetItem(term_item, [course["name"]])
+                item.setToolTip(0, course["full_name"])
+                item.setData(0, Qt.UserRole, course["id"])
+                item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+                checked = term in terms or course["id"] in course_ids
+                item.setCheckState(0, Qt.Checked if checked else Qt.Unchecked)
+            term_item.setData(0, Qt.UserRole, term)
+            term_item.setExpanded(term_item.checkState(0) == Qt.PartiallyChecked)
+
+    def selected_courses(self):
+        """
+        Returns:
+            (terms, course_ids): 整个勾选的学期, 以及部分勾选的学期中勾选的课程
+        """
+        terms, course_ids = [], []
+        for i in range(self.course_tree.topLevelItemCount()):
+            term_item = self.course_tree.topLevelItem(i)
+            term = term_item.data(0, Qt.UserRole)
+            if term_item.checkState(0) == Qt.Checked and term is not None:
+                terms.append(term)
+                continue
+            for j in range(term_item.childCount()):
+                item = term_item.child(j)
+                if item.checkState(0) == Qt.Checked:
+                    course_ids.append(item.data(0, Qt.UserRole))
+        return terms, course_ids
+
+    def refresh_catalog(self):
+        self.catalog.invalidate()
+        self.refresh_catalog_btn.setEnabled(False)
+        self.catalog_info.setText("下次导入时刷新课程列表")
 
     def save_settings(self):
         
-        config = {
+        terms, course_ids = self.selected_courses()
+        scraper_config = load_config().get("scraper", {})
+        scraper_config.update({"terms": terms, "courses": course_ids})
+        save_config({
             "student_id": self.student_id_input.text(),
             "password": self.password_input.text(),
             "chrome_path": self.chrome_path_input.text(),
-        }
-        with open("config.json", "w", encoding="utf-8") as f:
-            json.dump(config, f, ensure_ascii=False, indent=4)
+            "scraper": scraper_config,
+        })
         self.accept()
 
 
+class DiagnosticsDialog(QDialog):
+    """性能诊断面板, 在主窗口中按 Ctrl+Shift+D 打开"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("性能诊断")
+        self.setMinimumSize(560, 400)
+        self.init_ui()
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(1000)
+        self.refresh_timer.timeout.connect(self.refresh_stats)
+
+    def showEvent(self, event):
+        # 只在面板可见时刷新, 关闭后不再在界面线程上计算分位数
+        self.refresh_stats()
+        self.refresh_timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+
+    def init_ui(self):
+
+        layout = QVBoxLayout()
+
+        self.enable_check = QCheckBox("启用统计")
+        self.enable_check.setChecked(perf.enabled)
+        self.enable_check.toggled.connect(self.toggle_enabled)
+        layout.addWidget(self.enable_check)
+
+        self.stats_table = QTableWidget()
+        self.stats_table.setColumnCount(5)
+        self.stats_table.setHorizontalHeaderLabels(["名称", "调用次数", "p50 (ms)", "p95 (ms)", "最大 (ms)"])
+        self.stats_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.stats_table.verticalHeader().setVisible(False)
+        self.stats_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        layout.addWidget(self.stats_table)
+
+        button_layout = QHBoxLayout()
+        self.reset_btn = QPushButton("清空")
+        self.reset_btn.clicked.connect(self.reset_stats)
+        self.dump_btn = QPushButton("导出到文件")
+        self.dump_btn.clicked.connect(self.dump_stats)
+        self.profile_btn = QPushButton()
+        self.profile_btn.clicked.connect(self.toggle_profile)
+        self.update_profile_button()
+        button_layout.addWidget(self.reset_btn)
+        button_layout.addWidget(self.dump_btn)
+        button_layout.addWidget(self.profile_btn)
+        button_layout.addStretch()
+        layout.addLayout(button_layout)
+
+        self.setLayout(layout)
+        self.refresh_stats()
+
+    def toggle_enabled(self, checked):
+        perf.enabled = checked
+
+    def refresh_stats(self):
+
+        stats = perf.stats()
+        self.stats_table.setRowCount(len(stats))
+
+        def fmt(value):
+            return "-" if value is None else f"{value:.2f}"
+
+        for row, name in enumerate(sorted(stats)):
+            entry = stats[name]
+            values = [name, str(entry["count"]), fmt(entry["p50"]), fmt(entry["p95"]), fmt(entry["max"])]
+            for col, value in enumerate(values):
+                self.stats_table.setItem(row, col, QTableWidgetItem(value))
+
+    def reset_stats(self):
+        perf.reset()
+        self.refresh_stats()
+
+    def dump_stats(self):
+
+        filename, _ = QFileDialog.getSaveFileName(
+            self, "导出诊断数据",
+            f"perf_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+            "JSON 文件 (*.json)"
+        )
+        if not filename:
+            return
+        try:
+            perf.dump(filename)
+            QMessageBox.information(self, "导出成功", f"已导出到 {filename}")
+        except Exception as e:
+            logger.error("导出诊断数据时出错: %s", e)
+            QMessageBox.warning(self, "导出失败", f"导出过程中发生错误: {e}")
+
+    def toggle_profile(self):
+
+        if not perf.profiling:
+            perf.start_profile()
+        else:
+            filename, _ = QFileDialog.getSaveFileName(
+                self, "保存cProfile结果",
+                f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.prof",
+                "Profile 文件 (*.prof)"
+            )
+            if filename:
+                perf.stop_profile(filename)
+                QMessageBox.information(self, "已保存", f"cProfile结果已保存到 {filename}")
+        self.update_profile_button()
+
+    def update_profile_button(self):
+        self.profile_btn.setText("停止cProfile并保存" if perf.profiling else "开始cProfile")
+
+
 class MainWindow(QMainWindow):
     
     def __init__(self, pet_state, pet, parent=None):
@@ -1114,11 +1632,28 @@ class MainWindow(QMainWindow):
         self.init_pet_connection()
 
         self.schedule_manager = Schedule()
+        QApplication.instance().aboutToQuit.connect(self.schedule_manager.flush)
         self.reminder = Reminder(self.schedule_manager)
+        self.reminder_ledger = ReminderLedger(
+            os.path.join(os.path.dirname(self.schedule_manager.data_file), "reminders.json")
+        )
+        QApplication.instance().aboutToQuit.connect(self.reminder_ledger.touch)
+        self.notifications = NotificationCenter(
+            getattr(self.pet, "tray", None), load_config().get("notifications", {}), self,
+            ledger=self.reminder_ledger
+        )
+        self.notifications.panel_requested.connect(self.show_notification_panel)
+        self.diagnostics_dialog = None
         
         self.reminder.reminder_signal.connect(self.show_reminder)
         
         self.init_ui()
+        self.notifications.catch_up(self.schedule_manager)
+
+        # 跨天处理与提醒共用定时服务; 系统时间调整或休眠恢复后立即检查日期
+        self.timers = get_timer_service()
+        self.rollover_job = self.timers.daily("00:00", self.roll_over_day, "schedule.rollover")
+        self.timers.clock_changed.connect(self.roll_over_day)
         
         self.reminder.start()
     
@@ -1158,19 +1693,41 @@ class MainWindow(QMainWindow):
         self.import_web_btn = QPushButton("从网页导入任务")
         self.import_web_btn.clicked.connect(self.import_from_web)
 
+        self.ics_btn = QPushButton("日历文件")
+        ics_menu = QMenu(self.ics_btn)
+        ics_menu.addAction("导入 .ics ...").triggered.connect(self.import_ics)
+        ics_menu.addAction("导出为 .ics ...").triggered.connect(self.export_ics)
+        self.ics_btn.setMenu(ics_menu)
+
         self.settings_btn = QPushButton("设置")  
         self.settings_btn.clicked.connect(self.open_settings_dialog)
 
+        self.undo_btn = QPushButton("撤销")
+        self.undo_btn.clicked.connect(self.undo)
+        self.redo_btn = QPushButton("重做")
+        self.redo_btn.clicked.connect(self.redo)
+
         button_layout.addWidget(self.add_task_btn)
         button_layout.addWidget(self.export_btn)
         button_layout.addWidget(self.import_web_btn)
+        button_layout.addWidget(self.ics_btn)
         button_layout.addWidget(self.settings_btn)  
         button_layout.addStretch()
+        button_layout.addWidget(self.undo_btn)
+        button_layout.addWidget(self.redo_btn)
+        self.update_history_buttons()
 
         main_layout.addWidget(self.tabs)
         main_layout.addLayout(button_layout)
 
         self.statusBar().showMessage("日程管理与提醒工具已启动")
+
+        self.diagnostics_shortcut = QShortcut(QKeySequence("Ctrl+Shift+D"), self)
+        self.diagnostics_shortcut.activated.connect(self.open_diagnostics_dialog)
+        self.undo_shortcut = QShortcut(QKeySequence.Undo, self)
+        self.undo_shortcut.activated.connect(self.undo)
+        self.redo_shortcut = QShortcut(QKeySequence.Redo, self)
+        self.redo_shortcut.activated.connect(self.redo)
         
         self.show()
     
@@ -1181,6 +1738,44 @@ class MainWindow(QMainWindow):
         if result == QDialog.Accepted:
             QMessageBox.information(self, "成功", "设置已保存")
 
+    def roll_over_day(self):
+        """日期变化后处理逾期任务并刷新视图"""
+        if self.schedule_manager.roll_over_day():
+            self.schedule_manager.check_overdue_tasks()
+            self.update_all_views()
+
+    def undo(self):
+        label = self.schedule_manager.undo()
+        if label is None:
+            self.statusBar().showMessage("没有可以撤销的操作")
+            return
+        self.update_all_views()
+        self.statusBar().showMessage(f"已撤销: {label}")
+
+    def redo(self):
+        label = self.schedule_manager.redo()
+        if label is None:
+            self.statusBar().showMessage("没有可以重做的操作")
+            return
+        self.update_all_views()
+        self.statusBar().showMessage(f"已重做: {label}")
+
+    def update_history_buttons(self):
+        history = self.schedule_manager.history
+        self.undo_btn.setEnabled(history.can_undo())
+        self.undo_btn.setToolTip(f"撤销: {history.undo_label()} ({shortcut_text(QKeySequence.Undo)})"
+                                 if history.can_undo() else "")
+        self.redo_btn.setEnabled(history.can_redo())
+        self.redo_btn.setToolTip(f"重做: {history.redo_label()} ({shortcut_text(QKeySequence.Redo)})"
+                                 if history.can_redo() else "")
+
+    def open_diagnostics_dialog(self):
+
+        if self.diagnostics_dialog is None:
+            self.diagnostics_dialog = DiagnosticsDialog(self)
+        self.diagnostics_dialog.show()
+        self.diagnostics_dialog.raise_()
+
     def add_task_tab(self):
         
         task_tab = QWidget()
@@ -1209,6 +1804,8 @@ class MainWindow(QMainWindow):
         
         self.task_table = TaskTableWidget()
         self.task_table.itemDoubleClicked.connect(self.edit_task)
+        self.task_table.enable_sorting()
+        self.task_table.sort_changed.connect(self.update_task_list)
         
         self.task_table.setContextMenuPolicy(Qt.CustomContextMenu)
         self.task_table.customContextMenuRequested.connect(self.show_task_context_menu)
@@ -1236,6 +1833,7 @@ class MainWindow(QMainWindow):
         self.day_widget = DayViewWidget(schedule_manager=self.schedule_manager,main_window=self)
         self.tabs.addTab(self.day_widget, "日视图")
     
+    @perf.timed("view.task_list")
     def update_task_list(self):
         
         category = None if self.category_filter.currentText() == "全部" else self.category_filter.currentText()
@@ -1247,7 +1845,9 @@ class MainWindow(QMainWindow):
         elif self.status_filter.currentText() == "已完成":
             completed = True
         
-        tasks = self.schedule_manager.get_tasks(category=category, priority=priority, completed=completed)
+        column, descending = self.task_table.sort_key()
+        tasks = self.schedule_manager.get_sorted_tasks(column, descending, category=category,
+                                                       priority=priority, completed=completed)
         
         self.task_table.update_tasks(tasks)
         
@@ -1259,7 +1859,7 @@ class MainWindow(QMainWindow):
     
     def add_task(self):
         
-        dialog = TaskDialog(self)
+        dialog = TaskDialog(self, schedule_manager=self.schedule_manager)
         result = dialog.exec_()
         
         if result == QDialog.Accepted:
@@ -1290,7 +1890,7 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "错误", "无法找到该任务")
             return
         
-        dialog = TaskDialog(self, task)
+        dialog = TaskDialog(self, task, schedule_manager=self.schedule_manager)
         result = dialog.exec_()
         
         if result == QDialog.Accepted:
@@ -1309,6 +1909,10 @@ class MainWindow(QMainWindow):
             return
         
         task_id = item.data(Qt.UserRole)
+        selected_ids = self.task_table.selected_task_ids()
+        if len(selected_ids) > 1 and task_id in selected_ids:
+            self.show_bulk_context_menu(position, selected_ids)
+            return
         task = self.schedule_manager.get_task(task_id)
         
         if not task:
@@ -1343,6 +1947,87 @@ class MainWindow(QMainWindow):
         elif action == reminder_action:
             self.toggle_task_reminder(task_id)
     
+    def show_bulk_context_menu(self, position, task_ids):
+        """多选时的右键菜单, 所有操作只保存一次、刷新一次视图"""
+        count = len(task_ids)
+        context_menu = QMenu(self)
+
+        complete_action = context_menu.addAction(f"将 {count} 个任务标记为已完成")
+        uncomplete_action = context_menu.addAction(f"将 {count} 个任务标记为未完成")
+        context_menu.addSeparator()
+
+        category_menu = context_menu.addMenu("修改分类")
+        category_actions = {category_menu.addAction(category): category
+                            for category in (Schedule.WORK, Schedule.STUDY, Schedule.LIFE, Schedule.OTHER)}
+        priority_menu = context_menu.addMenu("修改优先级")
+        priority_actions = {priority_menu.addAction(priority): priority
+                            for priority in (Schedule.HIGH, Schedule.MEDIUM, Schedule.LOW)}
+        context_menu.addSeparator()
+
+        reminder_action = context_menu.addAction("设置提醒...")
+        remove_reminder_action = context_menu.addAction("移除提醒")
+        context_menu.addSeparator()
+        delete_action = context_menu.addAction(f"删除 {count} 个任务")
+
+        action = context_menu.exec_(self.task_table.mapToGlobal(position))
+        if action is None:
+            return
+
+        if action in (complete_action, uncomplete_action):
+            message = self.set_tasks_completed(task_ids, action == complete_action)
+        elif action in category_actions:
+            changed = self.schedule_manager.update_tasks(task_ids, category=category_actions[action])
+            message = f"已修改 {len(changed)} 个任务的分类"
+        elif action in priority_actions:
+            changed = self.schedule_manager.update_tasks(task_ids, priority=priority_actions[action])
+            message = f"已修改 {len(changed)} 个任务的优先级"
+        elif action == reminder_action:
+            minutes_before, ok = QInputDialog.getInt(
+                self, "设置提醒",
+                f"为 {count} 个任务设置提醒, 提前多少分钟？", 15, 1, 1440, 1
+            )
+            if not ok:
+                return
+            changed = self.reminder.set_reminders(task_ids, minutes_before)
+            message = f"已为 {len(changed)} 个任务设置提醒"
+        elif action == remove_reminder_action:
+            changed = self.reminder.set_reminders(task_ids, None)
+            message = f"已移除 {len(changed)} 个任务的提醒"
+        elif action == delete_action:
+            reply = QMessageBox.question(
+                self, "确认删除",
+                f"确定要删除选中的 {count} 个任务吗？",
+                QMessageBox.Yes | QMessageBox.No,
+                QMessageBox.No
+            )
+            if reply != QMessageBox.Yes:
+                return
+            deleted = self.schedule_manager.delete_tasks(task_ids)
+            message = f"已删除 {len(deleted)} 个任务"
+        else:
+            return
+
+        self.update_all_views()
+        self.statusBar().showMessage(message)
+
+    def set_tasks_completed(self, task_ids, completed):
+        """批量修改完成状态, 返回状态栏提示"""
+        changed = self.schedule_manager.update_tasks(task_ids, completed=completed)
+        if completed:
+            self.apply_completion_effects(completed=len(changed))
+        else:
+            self.apply_completion_effects(reopened=len(changed))
+        return f"已修改 {len(changed)} 个任务的完成状态"
+
+    def apply_completion_effects(self, completed=0, reopened=0):
+        """按完成/取消完成的任务数一次性更新宠物状态, 只触发一次信号"""
+        if not completed and not reopened:
+            return
+        state = self.pet_state
+        state.hp = max(0, min(100, state.hp + 10 * completed) - 5 * reopened)
+        state.food = max(0, min(100, state.food + 15 * completed) - 5 * reopened)
+        state.mood = "happy" if completed >= reopened else "angry"
+
     def delete_task(self, task_id):
         
         task = self.schedule_manager.get_task(task_id)
@@ -1373,13 +2058,9 @@ class MainWindow(QMainWindow):
     
         if self.schedule_manager.mark_completed(task_id, new_status):
             if new_status:
-                self.pet_state.hp = min(100, self.pet_state.hp + 10)
-                self.pet_state.food = min(100, self.pet_state.food + 15)
-                self.pet_state.mood = "happy"
+                self.apply_completion_effects(completed=1)
             else:
-                self.pet_state.hp = max(0, self.pet_state.hp - 5)
-                self.pet_state.food = max(0, self.pet_state.food - 5)
-                self.pet_state.mood = "angry"
+                self.apply_completion_effects(reopened=1)
 
         self.update_all_views()
     
@@ -1403,11 +2084,15 @@ class MainWindow(QMainWindow):
         self.update_all_views()
     
     def show_reminder(self, task):
-        """显示任务提醒"""
-        title = "任务提醒"
-        message = f"任务：{task['title']}\n时间：{task.get('start_time', '全天')}\n描述：{task['description']}"
-        
-        QMessageBox.information(self, title, message)
+        """任务提醒交给通知队列, 重复的提醒会被忽略, 不会阻塞界面"""
+        self.notifications.notify(task)
+
+    def show_notification_panel(self):
+        if not hasattr(self, "notification_panel"):
+            self.notification_panel = NotificationPanel(self.notifications, self)
+        self.notification_panel.refresh()
+        self.notification_panel.show()
+        self.notification_panel.raise_()
     
     def export_to_excel(self):
         """导出任务到Excel文件"""
@@ -1420,7 +2105,8 @@ class MainWindow(QMainWindow):
         elif self.status_filter.currentText() == "已完成":
             completed = True
         
-        tasks = self.schedule_manager.get_tasks(category=category, priority=priority, completed=completed)
+        tasks = self.schedule_manager.get_tasks(category=category, priority=priority, completed=completed,
+                                                include_archive=True)
         
         if not tasks:
             QMessageBox.warning(self, "导出失败", "没有找到符合条件的任务")
@@ -1440,6 +2126,55 @@ class MainWindow(QMainWindow):
         else:
             QMessageBox.warning(self, "导出失败", "导出过程中发生错误")
     
+    def import_ics(self):
+        """从 iCalendar 文件导入任务, 文件逐条读取, 一次写入"""
+        filename, _ = QFileDialog.getOpenFileName(self, "导入日历文件", "", "iCalendar 文件 (*.ics)")
+        if not filename:
+            return
+        try:
+            added = self.schedule_manager.import_tasks(
+                ics_io.read_file(filename), f"导入 {os.path.basename(filename)}"
+            )
+        except Exception as e:
+            logger.error("导入日历文件出错: %s", e)
+            QMessageBox.warning(self, "导入失败", f"导入过程中发生错误: {e}")
+            return
+        self.update_all_views()
+        QMessageBox.information(self, "导入成功", f"已从 {filename} 导入 {len(added)} 个任务")
+
+    def export_ics(self):
+        """按当前筛选条件把任务导出为 iCalendar 文件"""
+        category = None if self.category_filter.currentText() == "全部" else self.category_filter.currentText()
+        priority = None if self.priority_filter.currentText() == "全部" else self.priority_filter.currentText()
+
+        completed = None
+        if self.status_filter.currentText() == "未完成":
+            completed = False
+        elif self.status_filter.currentText() == "已完成":
+            completed = True
+
+        tasks = self.schedule_manager.get_tasks(category=category, priority=priority, completed=completed,
+                                                include_archive=True)
+        if not tasks:
+            QMessageBox.warning(self, "导出失败", "没有找到符合条件的任务")
+            return
+
+        filename, _ = QFileDialog.getSaveFileName(
+            self, "导出为日历文件",
+            f"任务列表_{datetime.now().strftime('%Y%m%d_%H%M%S')}.ics",
+            "iCalendar 文件 (*.ics)"
+        )
+        if not filename:
+            return
+
+        try:
+            count = ics_io.write_file(tasks, filename)
+        except Exception as e:
+            logger.error("导出日历文件出错: %s", e)
+            QMessageBox.warning(self, "导出失败", "导出过程中发生错误")
+            return
+        QMessageBox.information(self, "导出成功", f"已成功导出 {count} 个任务到 {filename}")
+
     def closeEvent(self, event):
         
         if QApplication.instance().closingDown():
@@ -1448,6 +2183,7 @@ class MainWindow(QMainWindow):
             self.hide()
             event.ignore()
 
+    @perf.timed("view.update_all")
     def update_all_views(self):
         
         try:
@@ -1455,17 +2191,19 @@ class MainWindow(QMainWindow):
             
             if hasattr(self, 'calendar_widget'):
                 self.calendar_widget.update_day_tasks()
-                self.calendar_widget.calendar.update_dates_with_tasks()
             
             if hasattr(self, 'week_widget'):
                 self.week_widget.update_week_view()
             
             if hasattr(self, 'day_widget'):
                 self.day_widget.update_day_view()
+
+            if hasattr(self, 'undo_btn'):
+                self.update_history_buttons()
             
             self.statusBar().showMessage("所有视图已更新")
         except Exception as e:
-            logging.error(f"更新视图时出错: {e}")
+            logger.error("更新视图时出错: %s", e)
             self.statusBar().showMessage(f"更新视图时出错: {e}")
 
     def init_pet_connection(self):
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from collections import OrderedDict
+from PySide6.QtCore import QTimer
+from my_schedule import task_day
+from profiler import perf
+
+
+def _sort_key(task):
+    return (task.get("start_time") or "", task.get("end_time") or "")
+
+
+class PeriodCache:
+    """
+    周/月视图的按天任务分桶缓存
+
+    以 (起始日期序数, 天数) 为键保存每天的任务列表(按开始时间排序), 最多保留
+    max_periods 个时间段, 超出时淘汰最久未使用的。日程变化时只重新计算受影响
+    日期的分桶, 未变化日期的列表对象保持不变, 视图可以据此跳过重绘。
+    """
+
+    def __init__(self, schedule_manager, max_periods=12):
+        self.schedule_manager = schedule_manager
+        self.max_periods = max_periods
+        self._periods = OrderedDict()
+        self._pending = []
+        self.schedule_manager.add_listener(self.on_schedule_changed)
+
+    def _build_bucket(self, day):
+        tasks = self.schedule_manager.tasks_on_day(day) + self.schedule_manager.archived_tasks(day, day)
+        return sorted(tasks, key=_sort_key)
+
+    @perf.timed("view_cache.build")
+    def _build(self, start_day, length):
+        
+        buckets = [self.schedule_manager.tasks_on_day(day) for day in range(start_day, start_day + length)]
+        for task in self.schedule_manager.archived_tasks(start_day, start_day + length - 1):
+            buckets[task_day(task) - start_day].append(task)
+        for bucket in buckets:
+            bucket.sort(key=_sort_key)
+        return buckets
+
+    def get(self, start_day, length):
+        """
+        取一个时间段的分桶
+
+        Returns:
+            list: 长度为 length 的列表, 第 i 项是 start_day + i 当天的任务
+        """
+        key = (start_day, length)
+        buckets = self._periods.get(key)
+        if buckets is None:
+            perf.count("view_cache.miss")
+            buckets = self._periods[key] = self._build(start_day, length)
+            self._evict()
+        else:
+            perf.count("view_cache.hit")
+            self._periods.move_to_end(key)
+        return buckets
+
+    def prefetch(self, *periods):
+        """
+        在事件循环空闲时预先计算若干时间段
+
+        Args:
+            periods: (start_day, length) 元组
+        """
+        for key in periods:
+            if key not in self._periods and key not in self._pending:
+                self._pending.append(key)
+        if self._pending:
+            QTimer.singleShot(0, self._run_prefetch)
+
+    def _run_prefetch(self):
+        while self._pending:
+            key = self._pending.pop(0)
+            if key not in self._periods:
+                self._periods[key] = self._build(*key)
+                self._evict()
+            # 每次只算一个, 让用户输入优先得到处理
+            if self._pending:
+                QTimer.singleShot(0, self._run_prefetch)
+                return
+
+    def _evict(self):
+        while len(self._periods) > self.max_periods:
+            self._periods.popitem(last=False)
+
+    def invalidate(self):
+        self._periods.clear()
+
+    def on_schedule_changed(self, event):
+        
+        if not event.days:
+            self.invalidate()
+            return
+        for (start_day, length), buckets in self._periods.items():
+            for day in event.days:
+                if start_day <= day < start_day + length:
+                    buckets[day - start_day] = self._build_bucket(day)